@@ -0,0 +1,38 @@
+"""Moves old weekly sheets into yearly archive tabs.
+
+    python -m app.archive [--keep-weeks 13] [--backend google|fake]
+
+Weekly sheets older than --keep-weeks weeks are copied into one archive_YYYY
+tab per year and deleted, which keeps the spreadsheet's sheet list (and the
+metadata behind every worksheet lookup) small. History, report and export
+reads still cover archived weeks. Safe to re-run; also available as
+POST /api/admin/archive.
+"""
+import argparse
+import sys
+
+import app.services.sheet_service as sheet_service
+from app.services.sheets_backend import get_connector
+from app.services.week_archive import ARCHIVE_KEEP_WEEKS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keep-weeks', type=int, default=ARCHIVE_KEEP_WEEKS, help="recent weeks kept as weekly sheets")
+    parser.add_argument('--backend', default=None, help="google (default) or fake")
+    args = parser.parse_args()
+    if args.keep_weeks < sheet_service.HISTORY_DEFAULT_WEEKS:
+        parser.error(f"--keep-weeks must be at least {sheet_service.HISTORY_DEFAULT_WEEKS}")
+
+    spreadsheet = get_connector(args.backend)()
+    if not spreadsheet:
+        print("Failed to connect to Google Sheets. Exiting.")
+        sys.exit(1)
+    result = sheet_service.archive_old_weeks(spreadsheet, args.keep_weeks)
+    if result is None:
+        sys.exit(1)
+    print(f"완료: 주차 {len(result['weeks'])}개, 기록 {result['records']}건을 보관 시트로 옮겼습니다.")
+
+
+if __name__ == '__main__':
+    main()
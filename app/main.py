@@ -1,43 +1,152 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Depends, Query, Header
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from app.models import LoginRequest, CheckInRequest, CheckOutRequest, UpdateRecordRequest, DeleteRecordRequest
+from app.models import BulkCheckInRequest, BulkCheckOutRequest, BulkRecordsRequest
 import app.services.sheet_service as sheet_service
+import app.services.export as export
+import app.services.reports as reports
+from app.services.spreadsheet_pool import SpreadsheetPool
+from app.services import sheets_backend
+from app.services.repository import open_repository, StorageUnavailable
+from app.services.async_sheets import SheetExecutor
+from app.services.write_queue import WriteBehindQueue, WriteJournal
+from app.services.local_store import LocalStore, LocalStoreSync
+from app.services.log_broadcaster import LogBroadcaster
+from app.services.request_governor import governor, CircuitOpenError, ThrottledError
+from app.services.snapshot_cache import SnapshotCache
+from app.services.sheet_provisioner import WeeklySheetProvisioner
+from app.services.record_changes import change_log
+from app.services.idempotency import IdempotencyStore, KeyReuseError, request_fingerprint
+from app.services.week_archive import ARCHIVE_KEEP_WEEKS
+from app.services.cluster import EventBus, LeaderLock, SharedRecordLocks
+from app.services import metrics
+from contextlib import asynccontextmanager
 import uvicorn
 import os
 import asyncio
-import queue
+import time
+import datetime
 
-app = FastAPI()
+# KADA_BACKEND=fake runs the app on the in-memory demo spreadsheet
+spreadsheet_pool = SpreadsheetPool(connect=sheets_backend.get_connector())
 
-# Log Manager
-class LogManager:
-    def __init__(self):
-        self.listeners = []
+def get_spreadsheet():
+    """The pooled spreadsheet, looked up on each call so benchmarks can swap spreadsheet_pool."""
+    return spreadsheet_pool.get()
 
-    def log(self, message: str):
-        print(message) # Keep terminal output
-        for q in self.listeners:
-            q.put_nowait(message)
+sheet_service.set_error_callback(lambda e: spreadsheet_pool.report_error(e))
+sheet_executor = SheetExecutor()
 
-    async def stream_log(self):
-        q = queue.Queue()
-        self.listeners.append(q)
-        try:
-            while True:
-                # Check for new messages
-                try:
-                    msg = q.get_nowait()
-                    yield f"data: {msg}\n\n"
-                    # Small delay to batch sending or yield back control
-                except queue.Empty:
-                    await asyncio.sleep(0.1)
-        except asyncio.CancelledError:
-            self.listeners.remove(q)
-
-log_manager = LogManager()
+# KADA_STORAGE=sqlite keeps attendance in an indexed database instead of the spreadsheet
+STORAGE = os.environ.get('KADA_STORAGE', 'sheets')
+SHEETS_STORAGE = STORAGE == 'sheets'
+repository = open_repository(get_spreadsheet, STORAGE)
+
+# KADA_WORKERS > 1: several worker processes keep their caches coherent through a shared event log
+WORKERS = max(1, int(os.environ.get('KADA_WORKERS', 1)))
+event_bus = None
+leader_lock = None
+if WORKERS > 1:
+    cluster_db = os.environ.get('KADA_CLUSTER_DB', 'cluster.db')
+    event_bus = EventBus(cluster_db)
+    leader_lock = LeaderLock(cluster_db + '.leader')
+    sheet_service.set_record_locks(SharedRecordLocks(cluster_db + '.records', event_bus))
+    sheet_service.set_event_publisher(event_bus.publish)
+    for topic in sheet_service.CACHE_EVENTS:
+        # Our own changes are already applied
+        event_bus.subscribe(topic, lambda seq, payload, own, topic=topic: own or sheet_service.apply_event(topic, payload))
+    event_bus.on_reset(lambda: sheet_service.invalidate_sheet(None))
+    change_log.attach(event_bus)
+
+# Optional write-behind mode: acknowledge check-ins/outs once journaled locally.
+# The journal belongs to one process, so it is off with several workers.
+WRITE_BEHIND = os.environ.get('KADA_WRITE_BEHIND') == '1' and WORKERS == 1
+write_queue = None
+if WRITE_BEHIND and SHEETS_STORAGE:
+    write_queue = WriteBehindQueue(
+        get_spreadsheet,
+        WriteJournal(os.environ.get('KADA_WRITE_JOURNAL', 'write_journal.jsonl')))
+
+# Closed weekly sheets are cached in memory and, unless KADA_SNAPSHOT_DIR is empty, on disk
+sheet_service.set_snapshot_cache(SnapshotCache(os.environ.get('KADA_SNAPSHOT_DIR', 'snapshot_cache') or None))
+
+# Archiving reads and rewrites up to a year of weekly sheets, far more than one ordinary call
+ARCHIVE_TIMEOUT = 300 # seconds
+
+# Responses of writes sent with an Idempotency-Key; persisted unless KADA_IDEMPOTENCY_DB is empty
+idempotency_store = IdempotencyStore(os.environ.get('KADA_IDEMPOTENCY_DB', 'idempotency.db') or None)
+
+# Weekly sheets are created ahead of time so the first check-in of a week finds its sheet warm
+sheet_provisioner = WeeklySheetProvisioner(
+    get_spreadsheet, weeks_ahead=int(os.environ.get('KADA_PROVISION_WEEKS_AHEAD', 1)))
+
+# Optional local SQLite mirror serving reads (history, row lookups)
+LOCAL_STORE_PATH = os.environ.get('KADA_LOCAL_STORE')
+local_store_sync = None
+if LOCAL_STORE_PATH and SHEETS_STORAGE:
+    local_store = LocalStore(LOCAL_STORE_PATH)
+    sheet_service.set_local_store(local_store)
+    local_store_sync = LocalStoreSync(local_store, get_spreadsheet)
+
+def start_background_jobs():
+    """Weekly sheet provisioning and the local store sync; with several workers only the leader runs them."""
+    if SHEETS_STORAGE:
+        if get_spreadsheet():
+            try:
+                sheet_provisioner.run_once()
+            except Exception as e:
+                sheet_service.log(f"주차 시트 준비 실패: {e}")
+        sheet_provisioner.start(sheet_service.log)
+    if local_store_sync:
+        local_store_sync.start(sheet_service.log)
+
+@asynccontextmanager
+async def lifespan(app):
+    log_manager.bind_loop()
+    if event_bus:
+        event_bus.start(sheet_service.log)
+        if os.environ.get('KADA_WRITE_BEHIND') == '1':
+            sheet_service.log("쓰기 지연 모드는 워커가 1개일 때만 사용할 수 있어 꺼 두었습니다.")
+    if SHEETS_STORAGE:
+        # Authorize and open the spreadsheet once, before the first request
+        spreadsheet = await asyncio.to_thread(get_spreadsheet)
+        if spreadsheet:
+            await asyncio.to_thread(sheet_service.reload_employees, spreadsheet)
+        sheet_service.employee_directory.start(get_spreadsheet, sheet_service.log)
+    if leader_lock:
+        await asyncio.to_thread(leader_lock.start, start_background_jobs, sheet_service.log)
+    else:
+        await asyncio.to_thread(start_background_jobs)
+    if write_queue:
+        write_queue.start()
+    yield
+    if local_store_sync:
+        await asyncio.to_thread(local_store_sync.stop)
+    if write_queue:
+        await asyncio.to_thread(write_queue.stop)
+    if SHEETS_STORAGE:
+        await asyncio.to_thread(sheet_service.employee_directory.stop)
+        await asyncio.to_thread(sheet_provisioner.stop)
+    sheet_executor.shutdown()
+    if leader_lock:
+        await asyncio.to_thread(leader_lock.release)
+    if event_bus:
+        await asyncio.to_thread(event_bus.close)
+
+app = FastAPI(lifespan=lifespan)
+
+# Log stream (SSE fan-out)
+log_manager = LogBroadcaster()
 sheet_service.set_log_callback(log_manager.log)
+if event_bus:
+    # Lines go through the event log so every worker's stream shows them, under the same ids
+    def relay_log(message):
+        if event_bus.publish('log', {'message': message}) is None:
+            log_manager.log(message)
+    event_bus.subscribe('log', lambda seq, payload, own: log_manager.log(payload['message'], seq=seq, echo=own))
+    sheet_service.set_log_callback(relay_log)
 
 # Allow CORS for development
 app.add_middleware(
@@ -48,6 +157,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms (skipped entirely with KADA_METRICS=0)
+if metrics.registry.enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Existing stats snapshots, read when /metrics is scraped
+metrics.registry.register_snapshot('kada_governor', "Request governor lane counters.", governor.snapshot, label='lane')
+metrics.registry.register_snapshot('kada_snapshot_cache', "Closed-week snapshot cache.",
+                                   lambda: sheet_service.snapshot_cache.snapshot())
+metrics.registry.register_snapshot('kada_report_cache', "Report week cache.", reports.report_cache.snapshot)
+metrics.registry.register_snapshot('kada_worksheet_cache', "Worksheet handle cache.", lambda: {
+    'hits': sheet_service.worksheet_cache.hits, 'misses': sheet_service.worksheet_cache.misses})
+metrics.registry.register_snapshot('kada_idempotency', "Idempotency-Key store.", idempotency_store.snapshot)
+metrics.registry.register_snapshot('kada_log_stream', "Log stream subscribers and drops.", log_manager.snapshot)
+if event_bus:
+    metrics.registry.register_snapshot('kada_cluster_events', "Worker event log (this worker).", event_bus.snapshot)
+if write_queue:
+    metrics.registry.register_snapshot('kada_write_queue', "Write-behind queue.", write_queue.snapshot)
+
 # Static files (HTML, CSS, JS)
 # Ensure the 'app/static' directory exists before running
 static_dir = os.path.join(os.path.dirname(__file__), "static")
@@ -56,98 +183,373 @@ if not os.path.exists(static_dir):
 
 app.mount("/static", StaticFiles(directory=static_dir, html=True), name="static")
 
+async def get_repository():
+    """Dependency handing the configured attendance repository to routes."""
+    if event_bus:
+        # Catch up on other workers' writes first, so no request sees older data than a response already sent;
+        # off the event loop, since applying events reads SQLite and takes the caches' locks
+        await asyncio.to_thread(event_bus.poll)
+    return repository
+
+async def run_sheets(func, *args, **kwargs):
+    """Runs a blocking repository call on the sheet executor."""
+    try:
+        return await sheet_executor.run(func, *args, **kwargs)
+    except StorageUnavailable:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Google Sheets request timed out")
+    except (CircuitOpenError, ThrottledError) as e:
+        raise HTTPException(status_code=503, detail=f"Google Sheets unavailable: {e}")
+
+# Requests with the same Idempotency-Key run one at a time
+# Same-key requests of this worker queue on a lock; the store's reservation covers the other workers
+idempotency_locks = {} # key -> [asyncio.Lock, requests holding or awaiting it]
+IDEMPOTENCY_WAIT = 30 # seconds a repeat waits for the first request with its key to finish
+IDEMPOTENCY_POLL = 0.1 # seconds between checks while another worker holds the key
+
+async def idempotent(key, scope, payload, write):
+    """Runs write() once per Idempotency-Key; a repeat gets the first successful response back."""
+    if not key:
+        return await write()
+    fingerprint = request_fingerprint(scope, payload)
+    entry = idempotency_locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            return await run_idempotent(key, fingerprint, write)
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del idempotency_locks[key]
+
+async def run_idempotent(key, fingerprint, write):
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    while True:
+        try:
+            state, stored = await asyncio.to_thread(idempotency_store.reserve, key, fingerprint)
+        except KeyReuseError:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if state == 'stored':
+            return JSONResponse(stored, headers={"Idempotent-Replayed": "true"})
+        if state == 'reserved':
+            break
+        if time.monotonic() > deadline:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        await asyncio.sleep(IDEMPOTENCY_POLL)
+    try:
+        response = await write()
+    except BaseException:
+        # Failures are not stored; free the key for a retry (synchronously: we may be cancelled)
+        idempotency_store.release(key)
+        raise
+    await asyncio.to_thread(idempotency_store.put, key, fingerprint, response)
+    return response
+
 # Routes
 @app.get("/")
 async def root():
     return {"message": "Kada Commute API Running"}
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    if not metrics.registry.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    # Rendered off the event loop; snapshot callbacks take their own locks
+    text = await asyncio.to_thread(metrics.registry.render)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
 @app.get("/api/stream-logs")
-async def stream_logs():
-    return StreamingResponse(log_manager.stream_log(), media_type="text/event-stream")
+async def stream_logs(last_event_id: int | None = Header(default=None)):
+    # EventSource resends the last id it saw on reconnect; only the missed lines are replayed
+    return StreamingResponse(
+        log_manager.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/stream-logs/stats")
+async def stream_logs_stats():
+    return log_manager.snapshot()
 
 @app.post("/api/login")
-async def login(request: LoginRequest):
-    spreadsheet = sheet_service.connect_to_spreadsheet()
-    if not spreadsheet:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    employee = sheet_service.find_employee(spreadsheet, request.name)
+async def login(request: LoginRequest, repository=Depends(get_repository)):
+    employee = await run_sheets(repository.find_employee, request.name)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     
     return employee
 
 @app.post("/api/check-in")
-async def check_in(request: CheckInRequest):
-    spreadsheet = sheet_service.connect_to_spreadsheet()
-    if not spreadsheet:
-         raise HTTPException(status_code=500, detail="Database connection failed")
-    
+async def check_in(request: CheckInRequest, repository=Depends(get_repository),
+                   idempotency_key: str | None = Header(default=None)):
     # Construct employee dict as expected by sheet_service
     employee = {
         'name': request.name,
         'location': request.location,
         'id': request.employee_id
     }
-    
-    success = sheet_service.check_in(spreadsheet, employee, specific_time=request.time, specific_date=request.date)
-    if not success:
-        raise HTTPException(status_code=400, detail="Check-in failed")
-    
-    return {"status": "success", "message": "Check-in successful"}
 
-@app.post("/api/check-out")
-async def check_out(request: CheckOutRequest):
-    spreadsheet = sheet_service.connect_to_spreadsheet()
-    if not spreadsheet:
-         raise HTTPException(status_code=500, detail="Database connection failed")
+    async def write():
+        if write_queue:
+            record = await asyncio.to_thread(write_queue.submit_check_in, employee, request.time, request.date)
+            if not record:
+                raise HTTPException(status_code=400, detail="Check-in failed")
+            return {"status": "queued", "message": "Check-in accepted", "record": record, "version": change_log.record(record)}
+
+        record = await run_sheets(repository.check_in, employee, specific_time=request.time, specific_date=request.date)
+        if not record:
+            raise HTTPException(status_code=400, detail="Check-in failed")
 
+        return {"status": "success", "message": "Check-in successful", "record": record, "version": change_log.record(record)}
+
+    return await idempotent(idempotency_key, "check-in", request.model_dump(), write)
+
+@app.post("/api/check-out")
+async def check_out(request: CheckOutRequest, repository=Depends(get_repository),
+                    idempotency_key: str | None = Header(default=None)):
     employee = {
         'name': request.name,
         'id': request.employee_id
     }
 
-    success = sheet_service.check_out(spreadsheet, employee, specific_time=request.time, specific_date=request.date)
-    if not success:
-        raise HTTPException(status_code=400, detail="Check-out failed (maybe no record for today?)")
-    
-    return {"status": "success", "message": "Check-out successful"}
+    async def write():
+        if write_queue:
+            record = await asyncio.to_thread(write_queue.submit_check_out, employee, request.time, request.date)
+            if not record:
+                raise HTTPException(status_code=400, detail="Check-out failed")
+            return {"status": "queued", "message": "Check-out accepted", "record": record, "version": change_log.record(record)}
+
+        record = await run_sheets(repository.check_out, employee, specific_time=request.time, specific_date=request.date)
+        if not record:
+            raise HTTPException(status_code=400, detail="Check-out failed (maybe no record for today?)")
+
+        return {"status": "success", "message": "Check-out successful", "record": record, "version": change_log.record(record)}
+
+    return await idempotent(idempotency_key, "check-out", request.model_dump(), write)
+
+def bulk_response(results):
+    counts = {}
+    for item in results:
+        counts[item['status']] = counts.get(item['status'], 0) + 1
+        # Written fields are not returned per entry; history deltas re-read these employees
+        if item['status'] in ('created', 'updated'):
+            change_log.invalidate(item['employee_id'])
+    return {"status": "success", "counts": counts, "results": results, "version": change_log.version()}
+
+@app.post("/api/bulk/check-in")
+async def bulk_check_in(request: BulkCheckInRequest, repository=Depends(get_repository)):
+    """Checks in many employees with one append per weekly sheet. Per-entry results in input order."""
+    entries = [{'id': e.employee_id, 'name': e.name, 'location': e.location, 'time': e.time, 'date': e.date}
+               for e in request.entries]
+    results = await run_sheets(repository.bulk_check_in, entries)
+    return bulk_response(results)
+
+@app.post("/api/bulk/check-out")
+async def bulk_check_out(request: BulkCheckOutRequest, repository=Depends(get_repository)):
+    """Checks out many employees with one batch update per weekly sheet."""
+    entries = [{'id': e.employee_id, 'name': e.name, 'time': e.time, 'date': e.date} for e in request.entries]
+    results = await run_sheets(repository.bulk_check_out, entries)
+    return bulk_response(results)
+
+@app.post("/api/bulk/records")
+async def bulk_records(request: BulkRecordsRequest, repository=Depends(get_repository)):
+    """Creates or overwrites full records (reconciliation imports)."""
+    entries = [r.model_dump() for r in request.records]
+    results = await run_sheets(repository.bulk_upsert_records, entries)
+    return bulk_response(results)
+
+@app.post("/api/admin/employees/reload")
+async def reload_employees(repository=Depends(get_repository)):
+    """Forces the employee directory to re-read the Employees sheet (SQLite: returns the count)."""
+    count = await run_sheets(repository.reload_employees)
+    if count is None:
+        raise HTTPException(status_code=500, detail="Employee reload failed")
+    return {"status": "success", "employees": count}
+
+@app.post("/api/admin/compact/{week}")
+async def compact_week(week: str, repository=Depends(get_repository)):
+    """Removes the blank rows that deletes left in a closed weekly sheet (done hourly in the background)."""
+    if not SHEETS_STORAGE:
+        raise HTTPException(status_code=404, detail="Only the sheets storage leaves blank rows")
+    if not sheet_service.is_weekly_sheet(week) or week >= sheet_service.get_current_week_sheet_name():
+        raise HTTPException(status_code=400, detail="Only closed weeks (YYYY_WW) can be compacted")
+    removed = await run_sheets(lambda: sheet_service.compact_week(repository.spreadsheet, week))
+    if removed is None:
+        raise HTTPException(status_code=500, detail="Compaction failed")
+    return {"status": "success", "week": week, "removed_rows": removed}
+
+@app.post("/api/admin/archive")
+async def archive_weeks(keep_weeks: int = Query(default=ARCHIVE_KEEP_WEEKS), repository=Depends(get_repository)):
+    """Moves weekly sheets older than keep_weeks weeks into yearly archive tabs, which reads still cover."""
+    if not SHEETS_STORAGE:
+        raise HTTPException(status_code=404, detail="Only the sheets storage has weekly sheets")
+    if keep_weeks < sheet_service.HISTORY_DEFAULT_WEEKS:
+        raise HTTPException(status_code=400, detail=f"keep_weeks must be at least {sheet_service.HISTORY_DEFAULT_WEEKS}")
+    result = await run_sheets(lambda: sheet_service.archive_old_weeks(repository.spreadsheet, keep_weeks),
+                              timeout=ARCHIVE_TIMEOUT)
+    if result is None:
+        raise HTTPException(status_code=500, detail="Archiving failed")
+    return {"status": "success", "archived_weeks": result['weeks'], "records": result['records']}
+
+@app.get("/api/write-queue")
+async def write_queue_stats():
+    """Pending depth and flush latency of the write-behind queue."""
+    if not write_queue:
+        return {"enabled": False}
+    return {"enabled": True, **write_queue.snapshot()}
+
+@app.get("/api/weekly-sheets")
+async def weekly_sheets_stats():
+    """Weekly sheets created ahead of time and the week whose caches are warm."""
+    return sheet_provisioner.snapshot()
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Hit/miss counters of the worksheet, closed-week snapshot and report caches."""
+    return {
+        "worksheets": {"hits": sheet_service.worksheet_cache.hits, "misses": sheet_service.worksheet_cache.misses},
+        "snapshots": sheet_service.snapshot_cache.snapshot(),
+        "reports": reports.report_cache.snapshot(),
+    }
+
+@app.get("/api/sheets-quota")
+async def sheets_quota_stats():
+    """Per-lane throttle, retry and circuit-breaker counters of the request governor."""
+    return governor.snapshot()
+
+def parse_date_param(value, name):
+    """Parses an optional YYYY-MM-DD query parameter."""
+    if value is None:
+        return None
+    date = sheet_service.parse_date(value)
+    if date is None:
+        raise HTTPException(status_code=400, detail=f"Invalid '{name}' date (YYYY-MM-DD)")
+    return date
+
+def in_range(date_str, start, end):
+    return (not start or date_str >= f"{start:%Y-%m-%d}") and (not end or date_str <= f"{end:%Y-%m-%d}")
 
 @app.get("/api/history/{employee_id}")
-async def get_history(employee_id: str):
-    spreadsheet = sheet_service.connect_to_spreadsheet()
-    if not spreadsheet:
-         raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    records = sheet_service.get_all_employee_records(spreadsheet, employee_id)
-    return records
+async def get_history(
+    employee_id: str,
+    date_from: str | None = Query(None, alias="from"),
+    date_to: str | None = Query(None, alias="to"),
+    since: str | None = None,
+    if_none_match: str | None = Header(default=None),
+    repository=Depends(get_repository),
+):
+    """The employee's records, with the version as ETag.
+
+    With ?since=<version> the answer is {'version', 'changes': [...]} (the
+    changes made since, oldest first), or {'version', 'records': [...]} when
+    the version is too old to list them. On ?since requests If-None-Match
+    answers 304 when nothing changed for the employee. Full loads are never
+    answered from the change log: they are the only way direct spreadsheet
+    edits reach the client, so they are sent with no-store.
+    """
+    start = parse_date_param(date_from, "from")
+    end = parse_date_param(date_to, "to")
+    # Taken before reading, so changes made during the read are sent again next time
+    version = change_log.version()
+    headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache" if since else "no-store"}
+    def changes_since(token):
+        changes = change_log.since(token, employee_id)
+        return None if changes is None else [c for c in changes if in_range(c['date'], start, end)]
+
+    if since and if_none_match and changes_since(if_none_match) == []:
+        return Response(status_code=304, headers=headers)
+    changes = changes_since(since) if since else None
+    if changes is not None:
+        return JSONResponse({"version": version, "changes": changes}, headers=headers)
+
+    records = await run_sheets(repository.employee_records, employee_id, start, end)
+    if records is None:
+        raise HTTPException(status_code=503, detail="Could not read attendance records")
+    if since:
+        return JSONResponse({"version": version, "records": records}, headers=headers)
+    return JSONResponse(records, headers=headers)
+
+@app.get("/api/export")
+async def export_records(
+    date_from: str = Query(..., alias="from"),
+    date_to: str | None = Query(None, alias="to"),
+    fmt: str = Query("csv", alias="format"),
+    repository=Depends(get_repository),
+):
+    """Streams every record in the range as CSV or NDJSON, a few weeks at a time."""
+    if fmt not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    start = parse_date_param(date_from, "from")
+    end = parse_date_param(date_to, "to") or datetime.date.today()
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (end - start).days > export.EXPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {export.EXPORT_MAX_DAYS} days")
+
+    titles = await run_sheets(repository.week_titles, start, end)
+    # Read before the status line goes out, so a failure here is still a 5xx
+    first_records = await export.read_first_batch(run_sheets, repository, titles, start, end)
+    filename = f"attendance_{start:%Y%m%d}_{end:%Y%m%d}.{fmt}"
+    return StreamingResponse(
+        export.stream_export(run_sheets, repository, titles, start, end, fmt, first_records),
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/api/reports/hours")
+async def hours_report(
+    date_from: str = Query(..., alias="from"),
+    date_to: str | None = Query(None, alias="to"),
+    employee_id: str | None = None,
+    late_after: str = reports.LATE_AFTER,
+    daily: bool = False,
+    refresh: bool = False,
+    repository=Depends(get_repository),
+):
+    """Worked minutes, late arrivals and missing check-outs per employee, by week and month."""
+    start = parse_date_param(date_from, "from")
+    end = parse_date_param(date_to, "to") or datetime.date.today()
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if reports.parse_seconds(late_after) == reports.MISSING:
+        raise HTTPException(status_code=400, detail="Invalid 'late_after' time (HH:MM[:SS])")
+
+    report = await run_sheets(reports.hours_report, repository, start, end,
+                              employee_id=employee_id, late_after=late_after, daily=daily, refresh=refresh)
+    if report is None:
+        raise HTTPException(status_code=503, detail="Could not read attendance records")
+    return report
 
 @app.put("/api/record")
-async def update_record(request: UpdateRecordRequest):
-    spreadsheet = sheet_service.connect_to_spreadsheet()
-    if not spreadsheet:
-         raise HTTPException(status_code=500, detail="Database connection failed")
-    
+async def update_record(request: UpdateRecordRequest, repository=Depends(get_repository),
+                        idempotency_key: str | None = Header(default=None)):
     checkin_val = request.value if request.field == 'checkin' else None
     checkout_val = request.value if request.field == 'checkout' else None
 
-    success = sheet_service.update_record(spreadsheet, request.employee_id, request.date, checkin=checkin_val, checkout=checkout_val)
-    if not success:
-         raise HTTPException(status_code=400, detail="Update failed")
-    
-    return {"status": "success", "message": "Record updated"}
+    async def write():
+        record = await run_sheets(repository.update_record, request.employee_id, request.date, checkin=checkin_val,
+                                  checkout=checkout_val, record_id=request.record_id)
+        if not record:
+             raise HTTPException(status_code=400, detail="Update failed")
+
+        return {"status": "success", "message": "Record updated", "record": record, "version": change_log.record(record)}
+
+    return await idempotent(idempotency_key, "update-record", request.model_dump(), write)
 
 @app.delete("/api/record")
-async def delete_record(request: DeleteRecordRequest):
-    spreadsheet = sheet_service.connect_to_spreadsheet()
-    if not spreadsheet:
-         raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    success = sheet_service.delete_record(spreadsheet, request.employee_id, request.date)
-    if not success:
-         raise HTTPException(status_code=400, detail="Delete failed")
-    
-    return {"status": "success", "message": "Record deleted"}
+async def delete_record(request: DeleteRecordRequest, repository=Depends(get_repository),
+                        idempotency_key: str | None = Header(default=None)):
+    async def write():
+        success = await run_sheets(repository.delete_record, request.employee_id, request.date,
+                                   record_id=request.record_id)
+        if not success:
+             raise HTTPException(status_code=400, detail="Delete failed")
+
+        record = {'date': request.date, 'employee_id': str(request.employee_id)}
+        return {"status": "success", "message": "Record deleted", "record": record, "deleted": True,
+                "version": change_log.record(record, deleted=True)}
+
+    return await idempotent(idempotency_key, "delete-record", request.model_dump(), write)
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    # Auto-reload only works with a single worker
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, workers=WORKERS, reload=WORKERS == 1)
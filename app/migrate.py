@@ -0,0 +1,73 @@
+"""Copies the spreadsheet into the SQLite attendance database.
+
+    python -m app.migrate [--db attendance.db] [--backend google|fake]
+
+Reads the Employees sheet, the archive_YYYY tabs and every YYYY_WW sheet
+(BATCH_GET_MAX_RANGES weeks per values.batchGet) and replaces the matching
+tables/weeks in the database, so the tool can be re-run until the switch to
+KADA_STORAGE=sqlite. Duplicate
+(date, employee_id) rows keep their first occurrence and are counted as skipped.
+"""
+import argparse
+import os
+import sys
+
+import app.services.sheet_service as sheet_service
+from app.services.sheets_backend import get_connector
+from app.services.sqlite_repository import SqliteRepository
+
+
+def migrate(spreadsheet, repository, log=print):
+    """Copies employees, archived weeks and weekly sheets. Returns {'employees', 'weeks', 'records', 'skipped'}."""
+    employees = spreadsheet.worksheet('Employees').get_all_records()
+    repository.replace_employees(employees)
+    log(f"직원 {len(employees)}명을 옮겼습니다.")
+
+    totals = {'employees': len(employees), 'weeks': 0, 'records': 0, 'skipped': 0}
+    titles = sorted(sheet_service.list_weekly_sheets(spreadsheet, refresh=True))
+    # Archived weeks; one still present as a weekly sheet (an interrupted archive run) is copied from the sheet
+    for title in sheet_service.list_archive_sheets(spreadsheet):
+        tab = sheet_service.load_archive(spreadsheet, title, use_cache=False)
+        weeks = sorted(set(tab.weeks) - set(titles))
+        for week in weeks:
+            loaded, skipped = repository.replace_week(week, tab.week_rows(week))
+            totals['weeks'] += 1
+            totals['records'] += loaded
+            totals['skipped'] += skipped
+        log(f"'{title}' 보관 시트의 주차 {len(weeks)}개를 옮겼습니다.")
+
+    step = sheet_service.BATCH_GET_MAX_RANGES
+    for i in range(0, len(titles), step):
+        chunk = titles[i:i + step]
+        sheet_rows = sheet_service.batch_get_sheets(spreadsheet, chunk, use_cache=False)
+        for title in chunk:
+            loaded, skipped = repository.replace_week(title, sheet_rows.get(title) or [])
+            totals['weeks'] += 1
+            totals['records'] += loaded
+            totals['skipped'] += skipped
+        log(f"{chunk[0]}~{chunk[-1]} 주차를 옮겼습니다. ({i + len(chunk)}/{len(titles)})")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=os.environ.get('KADA_DB_PATH', 'attendance.db'), help="SQLite file")
+    parser.add_argument('--backend', default=None, help="google (default) or fake")
+    args = parser.parse_args()
+
+    sheet_service.set_log_callback(None)
+    spreadsheet = get_connector(args.backend)()
+    if not spreadsheet:
+        print("Failed to connect to Google Sheets. Exiting.")
+        sys.exit(1)
+    repository = SqliteRepository(args.db)
+    try:
+        totals = migrate(spreadsheet, repository)
+    finally:
+        repository.close()
+    print(f"완료: 직원 {totals['employees']}명, 주차 {totals['weeks']}개, "
+          f"기록 {totals['records']}건 (중복 {totals['skipped']}건 제외) → {args.db}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class LoginRequest(BaseModel):
     name: str
@@ -22,7 +22,29 @@ class UpdateRecordRequest(BaseModel):
     date: str
     field: str # 'checkin' or 'checkout'
     value: str
+    record_id: Optional[str] = None # Refuses the change if the row now holds another record
 
 class DeleteRecordRequest(BaseModel):
     employee_id: str
     date: str
+    record_id: Optional[str] = None # Refuses the delete if the row now holds another record
+
+BULK_MAX_ENTRIES = 1000
+
+class BulkCheckInRequest(BaseModel):
+    entries: List[CheckInRequest] = Field(max_length=BULK_MAX_ENTRIES)
+
+class BulkCheckOutRequest(BaseModel):
+    entries: List[CheckOutRequest] = Field(max_length=BULK_MAX_ENTRIES)
+
+class RecordEntry(BaseModel):
+    employee_id: str
+    date: str # YYYY-MM-DD
+    name: Optional[str] = None
+    location: Optional[str] = None
+    checkin_time: Optional[str] = None
+    checkout_time: Optional[str] = None
+    reason: Optional[str] = None
+
+class BulkRecordsRequest(BaseModel):
+    records: List[RecordEntry] = Field(max_length=BULK_MAX_ENTRIES)
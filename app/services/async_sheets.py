@@ -0,0 +1,52 @@
+"""Runs blocking sheet_service calls off the event loop.
+
+gspread is synchronous, so calling it straight from an async route stalls
+every other request and SSE client until Google answers. SheetExecutor hands
+each call to a bounded thread pool, caps how many run at once and gives up
+on calls that wait too long for a worker thread. A call that has started is
+always awaited to the end: it may already have written to the sheet, so
+reporting it as failed would invite a retry that writes twice.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 16
+MAX_CONCURRENCY = 32 # Calls admitted at once (running + waiting for a worker)
+CALL_TIMEOUT = 30 # seconds a call may wait for a worker thread
+
+
+class SheetExecutor:
+    """Bounded thread-pool executor for sheet_service functions."""
+
+    def __init__(self, max_workers=MAX_WORKERS, max_concurrency=MAX_CONCURRENCY, timeout=CALL_TIMEOUT):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sheets')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, func, *args, timeout=None, **kwargs):
+        """Awaits func(*args, **kwargs) on a worker thread.
+
+        Raises asyncio.TimeoutError if no worker picked the call up within the timeout;
+        the call is then cancelled and never runs. Once started it is not timed out
+        (sheet_service's HTTP_TIMEOUT bounds each of its requests).
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def call():
+            loop.call_soon_threadsafe(lambda: started.done() or started.set_result(None))
+            return func(*args, **kwargs)
+
+        async with self._semaphore:
+            future = self._executor.submit(call)
+            try:
+                await asyncio.wait_for(started, timeout or self.timeout)
+            except asyncio.TimeoutError:
+                if future.cancel():
+                    raise
+                # It started just as the timeout fired: let it finish
+            return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,316 @@
+"""Cache coherence between uvicorn worker processes on one host.
+
+With KADA_WORKERS > 1 every worker keeps its own worksheet handles, row
+indexes, snapshots, report cache, change log and log ring. A check-out
+served by worker A must not leave worker B answering from a stale row index,
+so the workers share a small SQLite database (WAL mode) used as an
+append-only event log:
+
+- publish() appends (origin, topic, JSON payload) and gets a sequence number
+- every worker polls for rows past the last one it applied, from a
+  background thread every POLL_INTERVAL and before each request, and hands
+  them to the subscribed handlers in sequence order
+- sequence numbers are shared, so change-log version tokens and log stream
+  ids mean the same thing on every worker
+
+Events older than EVENT_RETENTION are pruned. A worker that fell further
+behind than that (a long stall) cannot replay what it missed and calls the
+reset handlers instead, which drop its caches.
+
+LeaderLock picks the one worker that runs the background jobs that must not
+run twice (weekly sheet provisioning and compaction, the local store sync).
+SharedRecordLocks extends the per-record check-in locks across the workers.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from app.services.row_index import RecordLocks
+
+try:
+    import fcntl
+except ImportError: # Windows: no flock, every worker runs the jobs
+    fcntl = None
+
+POLL_INTERVAL = 0.05 # seconds between background polls
+EVENT_RETENTION = 600 # seconds events are kept for workers to catch up
+PRUNE_INTERVAL = 60 # seconds between deletes of old events
+LEADER_RETRY = 30 # seconds between attempts to take over the leader lock
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        origin TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS events_created ON events (created_at)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+
+
+class EventBus:
+    """Cross-process publish/subscribe over a shared SQLite file."""
+
+    def __init__(self, path, poll_interval=POLL_INTERVAL, retention=EVENT_RETENTION):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = f"{os.getpid()}-{os.urandom(4).hex()}"
+        self._handlers = {} # topic -> [handler(seq, payload, own)]
+        self._reset_handlers = []
+        self._db_lock = threading.Lock()
+        self._apply_lock = threading.RLock()
+        self._applying = threading.local()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_prune = 0.0
+        self.stats = {'published': 0, 'applied': 0, 'resets': 0, 'handler_errors': 0}
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._db_lock, self._transaction():
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+            # The first worker to open the file picks the epoch the others share
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)",
+                               (format(int(time.time() * 1000), 'x'),))
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('pruned_through', '0')")
+            self.epoch = self._meta('epoch')
+            # Events from before this process started are history, not news
+            self.start_seq = max(self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0],
+                                 int(self._meta('pruned_through')))
+        self.last_seq = self.start_seq
+
+    def subscribe(self, topic, handler):
+        """handler(seq, payload, own) runs for every event on topic, own ones included."""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def on_reset(self, callback):
+        """callback() runs when events were pruned before this worker applied them."""
+        self._reset_handlers.append(callback)
+
+    def publish(self, topic, payload, wait=False):
+        """Appends an event. Returns its sequence number, or None if not published.
+
+        Events are not published from inside a handler (applying a remote change must
+        not echo it back). With wait=True the event, and everything before it, is
+        applied locally before returning.
+        """
+        if getattr(self._applying, 'active', False):
+            return None
+        data = json.dumps(payload, ensure_ascii=False)
+        with self._db_lock:
+            if self._conn is None:
+                return None
+            seq = self._conn.execute(
+                "INSERT INTO events (origin, topic, payload, created_at) VALUES (?, ?, ?, ?)",
+                (self.origin, topic, data, time.time())).lastrowid
+            self.stats['published'] += 1
+        if wait:
+            self.poll()
+        return seq
+
+    def poll(self):
+        """Applies the events published since the last poll. Returns how many were applied."""
+        with self._apply_lock:
+            with self._db_lock:
+                if self._conn is None:
+                    return 0
+                with self._transaction(immediate=False):
+                    pruned_through = int(self._meta('pruned_through'))
+                    rows = self._conn.execute(
+                        "SELECT seq, origin, topic, payload FROM events WHERE seq > ? ORDER BY seq",
+                        (self.last_seq,)).fetchall()
+            self._applying.active = True
+            try:
+                if self.last_seq < pruned_through:
+                    self._reset(pruned_through)
+                for seq, origin, topic, data in rows:
+                    self.last_seq = seq
+                    handlers = self._handlers.get(topic)
+                    if not handlers:
+                        continue
+                    payload = json.loads(data)
+                    for handler in handlers:
+                        try:
+                            handler(seq, payload, origin == self.origin)
+                        except Exception:
+                            # One bad handler must not stall the stream for the others
+                            self.stats['handler_errors'] += 1
+                    self.stats['applied'] += 1
+            finally:
+                self._applying.active = False
+            return len(rows)
+
+    def prune(self, now=None):
+        """Deletes events older than the retention window. Returns how many were deleted."""
+        cutoff = (now or time.time()) - self.retention
+        with self._db_lock:
+            if self._conn is None:
+                return 0
+            with self._transaction():
+                newest = self._conn.execute(
+                    "SELECT MAX(seq) FROM events WHERE created_at < ?", (cutoff,)).fetchone()[0]
+                if newest is None:
+                    return 0
+                deleted = self._conn.execute("DELETE FROM events WHERE seq <= ?", (newest,)).rowcount
+                self._conn.execute(
+                    "UPDATE meta SET value = MAX(CAST(value AS INTEGER), ?) WHERE key = 'pruned_through'", (newest,))
+            return deleted
+
+    def start(self, log=print):
+        """Starts the background poll (and prune) thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.poll_interval):
+                try:
+                    self.poll()
+                    if time.monotonic() - self._last_prune > PRUNE_INTERVAL:
+                        self._last_prune = time.monotonic()
+                        self.prune()
+                except Exception as e:
+                    log(f"워커 간 이벤트 처리 실패: {e}")
+
+        self._thread = threading.Thread(target=run, name='cluster-events', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        with self._db_lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    def snapshot(self):
+        return {'last_seq': self.last_seq, **self.stats}
+
+    def _reset(self, pruned_through):
+        # Caller holds the apply lock and has set the applying flag
+        self.stats['resets'] += 1
+        self.last_seq = pruned_through
+        for callback in self._reset_handlers:
+            try:
+                callback()
+            except Exception:
+                self.stats['handler_errors'] += 1
+
+    def _meta(self, key):
+        return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _transaction(self, immediate=True):
+        return _Transaction(self._conn, immediate)
+
+
+class _Transaction:
+    """BEGIN [IMMEDIATE] ... COMMIT on an autocommit connection; caller holds the db lock."""
+
+    def __init__(self, conn, immediate):
+        self._conn = conn
+        self._begin = "BEGIN IMMEDIATE" if immediate else "BEGIN"
+
+    def __enter__(self):
+        self._conn.execute(self._begin)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class LeaderLock:
+    """Non-blocking exclusive lock file; the holder runs the once-per-host background jobs."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self):
+        """Takes the lock if no other worker holds it. Returns True if this worker is the leader."""
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            self._file = True
+            return True
+        handle = open(self.path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._file = handle
+        return True
+
+    def start(self, on_elected, log=print):
+        """Calls on_elected() once this worker holds the lock, retrying every LEADER_RETRY seconds
+        (the leader process may exit and be replaced)."""
+        if self.acquire():
+            on_elected()
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(LEADER_RETRY):
+                if self.acquire():
+                    log("이 워커가 백그라운드 작업을 맡습니다.")
+                    on_elected()
+                    return
+
+        self._thread = threading.Thread(target=run, name='cluster-leader', daemon=True)
+        self._thread.start()
+
+    def release(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._file not in (None, True):
+            self._file.close() # closing the file drops the flock
+        self._file = None
+
+
+class SharedRecordLocks(RecordLocks):
+    """RecordLocks that also hold the stripes' bytes of a shared lock file (fcntl.lockf).
+
+    Once the locks are held the event bus is polled, so an append another worker made
+    under the same lock is in our row index before we look for the record.
+    """
+
+    def __init__(self, path, bus, **kwargs):
+        super().__init__(**kwargs)
+        self._bus = bus
+        # One descriptor for the process's lifetime: closing any descriptor of the file drops its locks
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644) if fcntl else None
+
+    @contextmanager
+    def hold_stripes(self, stripes):
+        stripes = list(stripes)
+        with super().hold_stripes(stripes):
+            for stripe in stripes:
+                if self._fd is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                self._bus.poll()
+                yield
+            finally:
+                for stripe in reversed(stripes):
+                    if self._fd is not None:
+                        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
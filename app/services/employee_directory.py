@@ -0,0 +1,125 @@
+"""In-process copy of the 'Employees' sheet with O(1) lookups.
+
+find_employee() used to download the whole Employees sheet on every login.
+The directory loads it once, indexes it by name and id, and reloads it in the
+background every REFRESH_INTERVAL seconds or on demand. Each entry keeps the
+full sheet row next to its indexed fields, so login still returns every
+column of the Employees sheet.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+
+REFRESH_INTERVAL = 300 # seconds
+MISS_RELOAD_INTERVAL = 60 # at most one on-demand reload per minute for unknown names
+
+
+@dataclass(frozen=True, slots=True)
+class Employee:
+    id: str
+    name: str
+    location: str
+    created_at: str = ''
+    row: dict = field(default_factory=dict, compare=False, repr=False) # the Employees row as read
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(
+            id=str(record.get('id', '')),
+            name=str(record.get('name', '')),
+            location=str(record.get('location', '')),
+            created_at=str(record.get('created_at', '')),
+            row=dict(record),
+        )
+
+    def to_dict(self):
+        if self.row:
+            return dict(self.row)
+        return {'id': self.id, 'name': self.name, 'location': self.location, 'created_at': self.created_at}
+
+
+class EmployeeDirectory:
+    """Thread-safe name/id index of the Employees sheet."""
+
+    def __init__(self, worksheet_name='Employees', refresh_interval=REFRESH_INTERVAL):
+        self.worksheet_name = worksheet_name
+        self.refresh_interval = refresh_interval
+        self._by_name = {}
+        self._by_id = {}
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._last_miss_reload = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def load(self, spreadsheet):
+        """Reads the Employees sheet once and swaps in fresh indexes. Returns the employee count."""
+        sheet = spreadsheet.worksheet(self.worksheet_name)
+        return self.load_records(sheet.get_all_records())
+
+    def load_records(self, records):
+        """Swaps in indexes built from Employees rows (dicts). Returns the employee count."""
+        employees = [Employee.from_record(r) for r in records]
+
+        by_name, by_id = {}, {}
+        for employee in employees:
+            # Keep the first row for duplicate names, as the linear scan did
+            by_name.setdefault(employee.name, employee)
+            by_id.setdefault(employee.id, employee)
+
+        with self._lock:
+            self._by_name = by_name
+            self._by_id = by_id
+            self._loaded_at = time.monotonic()
+        return len(by_id)
+
+    def records(self):
+        """Employees rows (dicts) of the current index, e.g. to hand to another worker."""
+        return [employee.to_dict() for employee in self._by_id.values()]
+
+    def by_name(self, name):
+        return self._by_name.get(name)
+
+    def by_id(self, employee_id):
+        return self._by_id.get(str(employee_id))
+
+    def should_reload_on_miss(self):
+        """Rate-limits reloads triggered by unknown names (e.g. a new hire)."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_miss_reload < MISS_RELOAD_INTERVAL:
+                return False
+            self._last_miss_reload = now
+            return True
+
+    def start(self, get_spreadsheet, log=print):
+        """Starts the background refresh thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.refresh_interval):
+                spreadsheet = get_spreadsheet()
+                if spreadsheet is None:
+                    continue
+                try:
+                    self.load(spreadsheet)
+                except Exception as e:
+                    log(f"직원 목록 갱신 실패: {e}")
+
+        self._thread = threading.Thread(target=run, name='employee-directory', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
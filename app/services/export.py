@@ -0,0 +1,77 @@
+"""Streaming attendance export (CSV / NDJSON) over a date range.
+
+The weeks covering the range are read from the repository EXPORT_BATCH_SHEETS
+at a time (one values.batchGet each on the Sheets backend), turned into lines and dropped before the
+next batch is read. Memory use is bounded by one batch, however long the
+range is.
+
+The first batch is read before the response starts, so a failure there is an
+ordinary error status. A later failure cannot change the status any more:
+the body then ends with an error line (format_error) and the connection is
+aborted instead of closed cleanly, so the client cannot take the truncated
+file for a complete one.
+"""
+import csv
+import io
+import json
+
+import app.services.sheet_service as sheet_service
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = ('date', 'employee_id', 'name', 'location', 'checkin_time', 'checkout_time', 'reason')
+EXPORT_BATCH_SHEETS = 4 # Weekly sheets held in memory at once
+EXPORT_MAX_DAYS = 3 * 366
+
+MEDIA_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+
+def read_batch_records(repository, titles, date_from, date_to):
+    """Reads one batch of weeks and returns its records in the range, oldest week first."""
+    sheet_rows = repository.week_rows(titles)
+    records = []
+    for title in titles:
+        records.extend(sheet_service.iter_employee_rows(sheet_rows.get(title), None, date_from, date_to))
+    return records
+
+
+def csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(values)
+    return buffer.getvalue()
+
+
+def format_header(fmt):
+    # The BOM lets Excel open the Korean names as UTF-8
+    return '\ufeff' + csv_line(EXPORT_COLUMNS) if fmt == 'csv' else ''
+
+
+def format_record(fmt, record):
+    if fmt == 'csv':
+        return csv_line([record.get(c, '') for c in EXPORT_COLUMNS])
+    return json.dumps({c: record.get(c, '') for c in EXPORT_COLUMNS}, ensure_ascii=False) + '\n'
+
+
+def format_error(fmt, message):
+    if fmt == 'csv':
+        return csv_line(['#error', message])
+    return json.dumps({'error': message}, ensure_ascii=False) + '\n'
+
+
+async def read_first_batch(run, repository, titles, date_from, date_to):
+    """Records of the first batch, read before the response starts (errors propagate to the route)."""
+    return await run(read_batch_records, repository, titles[:EXPORT_BATCH_SHEETS], date_from, date_to)
+
+
+async def stream_export(run, repository, titles, date_from, date_to, fmt, first_records):
+    """Async generator of export text. run(func, *args) runs a blocking call off the event loop;
+    first_records is read_first_batch()'s result."""
+    yield format_header(fmt)
+    yield ''.join(format_record(fmt, record) for record in first_records)
+    for i in range(EXPORT_BATCH_SHEETS, len(titles), EXPORT_BATCH_SHEETS):
+        chunk = titles[i:i + EXPORT_BATCH_SHEETS]
+        try:
+            records = await run(read_batch_records, repository, chunk, date_from, date_to)
+        except Exception as e:
+            yield format_error(fmt, f"export failed at {chunk[0]}: {getattr(e, 'detail', e)}")
+            raise # Aborts the connection: no clean end of the body
+        yield ''.join(format_record(fmt, record) for record in records)
@@ -0,0 +1,384 @@
+"""In-memory stand-in for the parts of gspread used by sheet_service.
+
+Used by the benchmarks so performance work can be measured without touching
+the live spreadsheet. Every call that would be an HTTP round-trip against
+Google sleeps for ``latency`` seconds and is counted in ``api_calls``; the
+number of cells returned by reads is added up in ``cells_read``.
+
+Quota injection: with ``quota_per_minute`` set, calls beyond that many per
+lane (read/write) in the last 60 seconds fail with a 429 APIError, as the
+Sheets API does. Passing a RequestGovernor runs every call through its
+throttling, retry and circuit-breaker policies, as GovernedHTTPClient does
+for the real client. Calls are recorded in the Sheets metrics under the
+operation the real client would send, so /metrics works with the fake too.
+"""
+import datetime
+import threading
+import time
+from collections import Counter, deque
+
+import gspread
+
+from app.services import metrics
+from app.services.request_governor import CircuitOpenError, ThrottledError
+
+
+def utc_timestamp():
+    """Current time in the Drive API's modifiedTime format."""
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class FakeClient:
+    """Mimics gspread.Client.open() with a configurable auth/open cost."""
+
+    def __init__(self, spreadsheet, auth_latency=0.0, open_latency=0.0):
+        self.spreadsheet = spreadsheet
+        self.auth_latency = auth_latency
+        self.open_latency = open_latency
+
+    def authorize(self):
+        time.sleep(self.auth_latency)
+        self.spreadsheet.api_calls['authorize'] += 1
+        return self
+
+    def open(self, title):
+        time.sleep(self.open_latency)
+        self.spreadsheet.api_calls['open'] += 1
+        if title != self.spreadsheet.title:
+            raise gspread.exceptions.SpreadsheetNotFound(title)
+        return self.spreadsheet
+
+
+class FakeErrorResponse:
+    """Just enough of a requests.Response for gspread's APIError."""
+
+    def __init__(self, code, message, status='INVALID_ARGUMENT', headers=None):
+        self.status_code = code
+        self.text = message
+        self.status = status
+        self.headers = headers or {}
+
+    def json(self):
+        return {'error': {'code': self.status_code, 'message': self.text, 'status': self.status}}
+
+
+# Fake operations that count against the read quota; everything else is a write
+READ_OPS = {'worksheet', 'worksheets', 'get_lastUpdateTime', 'values_batch_get',
+            'get_all_values', 'get_all_records', 'row_values', 'col_values'}
+
+# Google API operation (as labelled by metrics.api_operation) behind each fake call
+API_OPERATIONS = {
+    'worksheet': 'spreadsheets.get', 'worksheets': 'spreadsheets.get', 'get_lastUpdateTime': 'drive.get',
+    'add_worksheet': 'batchUpdate', 'batch_update': 'batchUpdate', 'values_batch_get': 'values.batchGet',
+}
+WORKSHEET_API_OPERATIONS = {
+    'get_all_values': 'values.get', 'get_all_records': 'values.get', 'row_values': 'values.get',
+    'col_values': 'values.get', 'append_row': 'values.append', 'append_rows': 'values.append',
+    'update': 'values.update', 'batch_update': 'values.batchUpdate',
+    'add_cols': 'batchUpdate', 'resize': 'batchUpdate', 'delete_rows': 'batchUpdate',
+}
+
+
+class FakeSpreadsheet:
+    """A spreadsheet made of FakeWorksheets, keyed by title."""
+
+    def __init__(self, title='kada_attendance', latency=0.0, quota_per_minute=None, governor=None):
+        self.title = title
+        self.id = f"fake-{title}"
+        self.latency = latency
+        self.quota_per_minute = quota_per_minute
+        self.governor = governor
+        self.api_calls = Counter()
+        self.rate_limited = 0
+        self.cells_read = 0
+        self._lock = threading.Lock()
+        self._recent = {'read': deque(), 'write': deque()} # call times in the quota window
+        self._worksheets = {}
+        self._next_gid = 0
+        self.modified_time = utc_timestamp()
+
+    def _call(self, op, operation=None, kind=''):
+        lane = 'read' if op in READ_OPS else 'write'
+        if not metrics.registry.enabled:
+            self._execute(lane, lambda: self._attempt(op, lane))
+            return
+
+        attempts = 0
+
+        def counted_attempt():
+            nonlocal attempts
+            attempts += 1
+            self._attempt(op, lane)
+
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            self._execute(lane, counted_attempt)
+            status = '200'
+        except gspread.exceptions.APIError as e:
+            status = str(e.code)
+            raise
+        except (CircuitOpenError, ThrottledError):
+            status = 'rejected'
+            raise
+        finally:
+            metrics.record_sheets_call(operation or API_OPERATIONS[op], kind, lane, time.perf_counter() - started,
+                                       attempts, status)
+
+    def _execute(self, lane, attempt):
+        if self.governor is None:
+            attempt()
+        else:
+            self.governor.execute(lane, attempt, idempotent=lane == 'read')
+
+    def _attempt(self, op, lane):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.api_calls[op] += 1
+            if self.quota_per_minute is None:
+                return
+            now = time.monotonic()
+            recent = self._recent[lane]
+            while recent and now - recent[0] >= 60:
+                recent.popleft()
+            if len(recent) >= self.quota_per_minute:
+                self.rate_limited += 1
+                retry_after = 60 - (now - recent[0])
+                raise gspread.exceptions.APIError(FakeErrorResponse(
+                    429, f"Quota exceeded for quota metric '{lane.title()} requests'", 'RESOURCE_EXHAUSTED',
+                    {'Retry-After': f"{retry_after:.1f}"}))
+            recent.append(now)
+
+    def touch(self):
+        """Bumps the Drive modifiedTime, as any edit to the spreadsheet does."""
+        self.modified_time = utc_timestamp()
+
+    def get_lastUpdateTime(self):
+        self._call('get_lastUpdateTime')
+        return self.modified_time
+
+    def add_fake_worksheet(self, title, rows=None, cols=None):
+        """Creates a worksheet without counting it as an API call."""
+        ws = FakeWorksheet(self, title, self._next_gid, rows or [], cols)
+        self._next_gid += 1
+        self._worksheets[title] = ws
+        return ws
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self._call('add_worksheet')
+        with self._lock:
+            if title in self._worksheets:
+                raise gspread.exceptions.APIError(FakeErrorResponse(
+                    400, f'A sheet with the name "{title}" already exists.'))
+        self.touch()
+        return self.add_fake_worksheet(title, cols=cols)
+
+    def batch_update(self, body):
+        """Spreadsheet-level batchUpdate; only deleteSheet requests are supported."""
+        self._call('batch_update')
+        gids = {request['deleteSheet']['sheetId'] for request in body.get('requests', [])}
+        with self._lock:
+            for title in [t for t, ws in self._worksheets.items() if ws.id in gids]:
+                del self._worksheets[title]
+        self.touch()
+        return {'spreadsheetId': self.id, 'replies': [{} for _ in gids]}
+
+    def worksheet(self, title):
+        self._call('worksheet')
+        try:
+            return self._worksheets[title]
+        except KeyError:
+            raise gspread.exceptions.WorksheetNotFound(title)
+
+    def worksheets(self, exclude_hidden=False):
+        self._call('worksheets')
+        return list(self._worksheets.values())
+
+    def count_cells(self, values):
+        with self._lock:
+            self.cells_read += sum(len(row) for row in values)
+
+    def values_batch_get(self, ranges, params=None):
+        self._call('values_batch_get', kind=metrics.request_sheet_kind('', {'ranges': ranges}))
+        columns = (params or {}).get('majorDimension') == 'COLUMNS'
+        value_ranges = []
+        for range_name in ranges:
+            title, _, cells = range_name.partition('!')
+            title = title.strip("'")
+            try:
+                rows = self._worksheets[title].rows
+            except KeyError:
+                raise gspread.exceptions.WorksheetNotFound(title)
+            values = slice_range(rows, cells, columns)
+            self.count_cells(values)
+            value_ranges.append({'range': range_name, 'values': values})
+        return {'spreadsheetId': self.id, 'valueRanges': value_ranges}
+
+
+def slice_range(rows, cells, columns=False):
+    """Values of an A1 range (whole sheet if empty), trimmed of trailing blanks like the API."""
+    grid = gspread.utils.a1_range_to_grid_range(cells) if cells else {}
+    row_start, row_end = grid.get('startRowIndex', 0), grid.get('endRowIndex', len(rows))
+    col_start = grid.get('startColumnIndex', 0)
+    values = []
+    for row in rows[row_start:row_end]:
+        part = row[col_start:grid.get('endColumnIndex', len(row))]
+        while part and part[-1] == '':
+            part = part[:-1]
+        values.append(list(part))
+    if columns:
+        width = max((len(v) for v in values), default=0)
+        values = [[v[c] if c < len(v) else '' for v in values] for c in range(width)]
+    while values and not any(values[-1]):
+        values.pop()
+    if columns:
+        for column in values:
+            while column and column[-1] == '':
+                column.pop()
+    return values
+
+
+class FakeWorksheet:
+    """Rows are stored as lists of strings; row 1 is the header."""
+
+    def __init__(self, spreadsheet, title, gid, rows, cols=None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = gid
+        self.rows = [list(map(str, row)) for row in rows]
+        # Grid width; not enforced on writes
+        self.col_count = cols or max((len(row) for row in self.rows), default=26)
+
+    def _call(self, op):
+        operation = WORKSHEET_API_OPERATIONS[op]
+        # Value calls name the sheet in their range; spreadsheet batchUpdates do not
+        kind = metrics.sheet_kind(self.title) if operation.startswith('values.') else ''
+        self.spreadsheet._call(op, operation, kind)
+
+    def get_all_values(self, **kwargs):
+        self._call('get_all_values')
+        values = [list(row) for row in self.rows]
+        # The API leaves out trailing blank rows
+        while values and not any(values[-1]):
+            values.pop()
+        self.spreadsheet.count_cells(values)
+        return values
+
+    def get_all_records(self, **kwargs):
+        self._call('get_all_records')
+        if not self.rows:
+            return []
+        headers = self.rows[0]
+        records = []
+        for row in self.rows[1:]:
+            padded = row + [''] * (len(headers) - len(row))
+            records.append(dict(zip(headers, padded)))
+        return records
+
+    def row_values(self, row, **kwargs):
+        self._call('row_values')
+        if row - 1 < len(self.rows):
+            self.spreadsheet.count_cells([self.rows[row - 1]])
+            return list(self.rows[row - 1])
+        return []
+
+    def col_values(self, col, **kwargs):
+        self._call('col_values')
+        values = [row[col - 1] if len(row) >= col else '' for row in self.rows]
+        while values and values[-1] == '':
+            values.pop()
+        self.spreadsheet.count_cells([values])
+        return values
+
+    def append_row(self, values, value_input_option=None, **kwargs):
+        self._call('append_row')
+        return self._append([values])
+
+    def append_rows(self, values, value_input_option=None, **kwargs):
+        self._call('append_rows')
+        return self._append(values)
+
+    def _append(self, rows):
+        with self.spreadsheet._lock:
+            # Like the API's table detection with INSERT_DATA_OPTION=OVERWRITE: the table ends at
+            # its first blank row, and the new rows are written from there over whatever lies below
+            first = next((i for i, row in enumerate(self.rows, start=1) if not any(row)), len(self.rows) + 1)
+            for offset, row in enumerate(rows):
+                position = first - 1 + offset
+                if position < len(self.rows):
+                    self.rows[position] = [str(v) for v in row]
+                else:
+                    self.rows.append([str(v) for v in row])
+            last = first + len(rows) - 1
+        self.spreadsheet.touch()
+        width = max(len(row) for row in rows)
+        return {'updates': {'updatedRange': f"'{self.title}'!A{first}:{gspread.utils.rowcol_to_a1(last, width)}"}}
+
+    def update(self, values=None, range_name=None, value_input_option=None, **kwargs):
+        self._call('update')
+        self._write_range(range_name, values)
+        self.spreadsheet.touch()
+        return {'updatedRange': f"'{self.title}'!{range_name}"}
+
+    def batch_update(self, data, value_input_option=None, **kwargs):
+        self._call('batch_update')
+        for item in data:
+            self._write_range(item['range'], item['values'])
+        self.spreadsheet.touch()
+        return {'totalUpdatedCells': sum(len(r) for item in data for r in item['values'])}
+
+    def add_cols(self, cols):
+        self._call('add_cols')
+        self.col_count += cols
+
+    def resize(self, rows=None, cols=None):
+        self._call('resize')
+        if rows is not None:
+            del self.rows[rows:]
+        if cols is not None:
+            self.col_count = cols
+        self.spreadsheet.touch()
+
+    def delete_rows(self, start_index, end_index=None):
+        self._call('delete_rows')
+        end_index = end_index or start_index
+        del self.rows[start_index - 1:end_index]
+        self.spreadsheet.touch()
+
+    def _write_range(self, range_name, values):
+        start = range_name.split(':')[0]
+        row, col = gspread.utils.a1_to_rowcol(start)
+        for r_offset, row_values in enumerate(values):
+            target = row - 1 + r_offset
+            while len(self.rows) <= target:
+                self.rows.append([])
+            current = self.rows[target]
+            for c_offset, value in enumerate(row_values):
+                idx = col - 1 + c_offset
+                while len(current) <= idx:
+                    current.append('')
+                current[idx] = str(value)
+
+
+ATTENDANCE_HEADERS = ['date', 'name', 'location', 'checkin_time', 'checkout_time', 'employee_id', 'reason']
+EMPLOYEE_HEADERS = ['id', 'name', 'location', 'created_at']
+
+
+def make_demo_spreadsheet(employees=50, weeks=3, latency=0.0, today=None, quota_per_minute=None, governor=None):
+    """Builds a FakeSpreadsheet with an Employees tab and `weeks` filled weekly tabs (5 rows per employee)."""
+    spreadsheet = FakeSpreadsheet(latency=latency, quota_per_minute=quota_per_minute, governor=governor)
+    staff = [[f"E{i:05d}", f"직원{i}", '신공 506', '2025-08-14 15:39:28'] for i in range(employees)]
+    spreadsheet.add_fake_worksheet('Employees', [EMPLOYEE_HEADERS] + staff)
+
+    today = today or datetime.date.today()
+    for w in range(weeks):
+        monday = today - datetime.timedelta(days=today.weekday(), weeks=w)
+        iso = monday.isocalendar()
+        rows = [ATTENDANCE_HEADERS]
+        for d in range(5):
+            day = (monday + datetime.timedelta(days=d)).strftime("%Y-%m-%d")
+            for emp_id, name, location, _ in staff:
+                rows.append([day, name, location, '09:12:00', '21:30:00', emp_id, '-'])
+        spreadsheet.add_fake_worksheet(f"{iso[0]}_{iso[1]:02d}", rows)
+    return spreadsheet
@@ -0,0 +1,196 @@
+"""Idempotency-Key store for the single-record write endpoints.
+
+A double-tapped button or a request retried after a timeout sends the same
+write twice. Clients put an Idempotency-Key header on check-in, check-out and
+record edits/deletes; the first successful response is stored under the key
+and a repeat gets it back without another Sheets call. Failed writes are not
+stored, so they can be retried with the same key.
+
+Keys live IDEMPOTENCY_TTL and at most IDEMPOTENCY_MAX_KEYS are kept in memory
+(oldest dropped first). With a path they are also written to a small SQLite
+file, so a retry that straddles a restart is still recognised.
+
+Before running the write, a request reserves its key (reserve()); a repeat
+that arrives while the write is still running sees the reservation and waits
+for the stored response instead of writing again. With the SQLite file the
+reservation is taken in one transaction, so it also holds across worker
+processes. A reservation whose owner died is taken over after PENDING_TIMEOUT.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+IDEMPOTENCY_TTL = 24 * 3600 # seconds a key is remembered
+IDEMPOTENCY_MAX_KEYS = 10000
+PRUNE_EVERY = 500 # stores between deletes of expired rows on disk
+PENDING_TIMEOUT = 120 # seconds a reservation holds its key without a stored response
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idempotency_keys_created ON idempotency_keys (created_at);
+CREATE TABLE IF NOT EXISTS idempotency_pending (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    reserved_at REAL NOT NULL
+);
+"""
+
+
+def request_fingerprint(scope, payload):
+    """Digest of the endpoint and request body a key was first used with."""
+    return hashlib.sha256(json.dumps([scope, payload], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class KeyReuseError(Exception):
+    """The key was already used for a different request."""
+
+
+class IdempotencyStore:
+    """Thread-safe key -> stored response map with TTL, a size bound and an optional SQLite tier."""
+
+    def __init__(self, path=None, ttl=IDEMPOTENCY_TTL, capacity=IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._memory = OrderedDict() # key -> (created_at, fingerprint, body)
+        self._pending = {} # key -> (reserved_at, fingerprint); without a database only
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stores = 0
+        self.stats = {'stored': 0, 'replayed': 0, 'conflicts': 0, 'disk_hits': 0, 'waits': 0}
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, key, fingerprint):
+        """The response stored for key, or None if the key is new or expired.
+
+        Raises KeyReuseError if the key was stored for a different request.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._conn:
+                row = self._conn.execute(
+                    "SELECT created_at, fingerprint, body FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+                if row:
+                    entry = (row[0], row[1], json.loads(row[2]))
+                    self.stats['disk_hits'] += 1
+            if entry is None or now - entry[0] >= self.ttl:
+                self._memory.pop(key, None)
+                return None
+            if entry[1] != fingerprint:
+                self.stats['conflicts'] += 1
+                raise KeyReuseError(key)
+            self.stats['replayed'] += 1
+            return entry[2]
+
+    def reserve(self, key, fingerprint):
+        """Claims key for a write about to run.
+
+        Returns ('stored', body) when a response is already stored, ('reserved', None)
+        when the caller should run the write and then put() or release(), or
+        ('pending', None) while another request holds the key. Raises KeyReuseError
+        if the key belongs to a different request.
+        """
+        stored = self.get(key, fingerprint)
+        if stored is not None:
+            return 'stored', stored
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                entry = self._pending.get(key)
+                if entry and now - entry[0] < PENDING_TIMEOUT:
+                    return self._pending_state(entry[1], fingerprint, key)
+                self._pending[key] = (now, fingerprint)
+                return 'reserved', None
+            # One write transaction: another worker cannot reserve or store the key in between
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT created_at, fingerprint, body FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+                if row and now - row[0] < self.ttl:
+                    self._conn.commit()
+                    if row[1] != fingerprint:
+                        self.stats['conflicts'] += 1
+                        raise KeyReuseError(key)
+                    self.stats['replayed'] += 1
+                    return 'stored', json.loads(row[2])
+                row = self._conn.execute(
+                    "SELECT reserved_at, fingerprint FROM idempotency_pending WHERE key = ?", (key,)).fetchone()
+                if row and now - row[0] < PENDING_TIMEOUT:
+                    self._conn.commit()
+                    return self._pending_state(row[1], fingerprint, key)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO idempotency_pending (key, fingerprint, reserved_at) VALUES (?, ?, ?)",
+                    (key, fingerprint, now))
+                self._conn.commit()
+                return 'reserved', None
+            except KeyReuseError:
+                raise
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def release(self, key):
+        """Drops a reservation whose write failed, so the key can be retried."""
+        with self._lock:
+            self._pending.pop(key, None)
+            if self._conn:
+                with self._conn:
+                    self._conn.execute("DELETE FROM idempotency_pending WHERE key = ?", (key,))
+
+    def put(self, key, fingerprint, body):
+        """Stores a successful response (a JSON-serialisable dict) under key, ending its reservation."""
+        now = time.time()
+        with self._lock:
+            self._memory[key] = (now, fingerprint, body)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
+            self._pending.pop(key, None)
+            self.stats['stored'] += 1
+            if self._conn:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, body, created_at) VALUES (?, ?, ?, ?)",
+                        (key, fingerprint, json.dumps(body, ensure_ascii=False), now))
+                    self._conn.execute("DELETE FROM idempotency_pending WHERE key = ?", (key,))
+                    self._stores += 1
+                    if self._stores % PRUNE_EVERY == 0:
+                        self._prune(now)
+
+    def snapshot(self):
+        with self._lock:
+            return {'keys': len(self._memory), **self.stats}
+
+    def _pending_state(self, pending_fingerprint, fingerprint, key):
+        # Caller holds the lock
+        if pending_fingerprint != fingerprint:
+            self.stats['conflicts'] += 1
+            raise KeyReuseError(key)
+        self.stats['waits'] += 1
+        return 'pending', None
+
+    def _prune(self, now):
+        # Expired keys, then anything past the newest `capacity` rows; caller holds the lock
+        self._conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (now - self.ttl,))
+        self._conn.execute("DELETE FROM idempotency_pending WHERE reserved_at < ?", (now - PENDING_TIMEOUT,))
+        self._conn.execute(
+            "DELETE FROM idempotency_keys WHERE key NOT IN "
+            "(SELECT key FROM idempotency_keys ORDER BY created_at DESC LIMIT ?)", (self.capacity,))
@@ -0,0 +1,278 @@
+"""Local SQLite mirror of the Employees sheet and the weekly YYYY_WW sheets.
+
+When enabled, history reads and row lookups are answered from this mirror
+instead of Google, so they keep working while Sheets is slow or throttling
+us. Writes still go to Sheets first and are then applied here (write-through).
+LocalStoreSync periodically re-reads the sheets and replaces any week whose
+content changed, which reconciles edits made directly in the spreadsheet.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import app.services.sheet_service as sheet_service
+
+ATTENDANCE_FIELDS = ('date', 'name', 'location', 'checkin_time', 'checkout_time', 'employee_id', 'reason', 'record_id')
+EMPLOYEE_FIELDS = ('id', 'name', 'location', 'created_at')
+
+SYNC_INTERVAL = 60 # seconds between delta syncs of the recent weeks
+FULL_SYNC_INTERVAL = 3600 # seconds between syncs of every weekly sheet
+HOT_WEEKS = 2 # Newest weeks re-read on every delta sync
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    location TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS employees_name ON employees (name);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    sheet TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    date TEXT,
+    name TEXT,
+    location TEXT,
+    checkin_time TEXT,
+    checkout_time TEXT,
+    employee_id TEXT,
+    reason TEXT,
+    record_id TEXT,
+    PRIMARY KEY (sheet, row)
+);
+CREATE INDEX IF NOT EXISTS attendance_employee_date ON attendance (employee_id, date);
+
+CREATE TABLE IF NOT EXISTS sheet_sync (
+    sheet TEXT PRIMARY KEY,
+    row_count INTEGER,
+    digest TEXT,
+    synced_at REAL
+);
+"""
+
+# Applied to databases created before the column existed
+MIGRATIONS = {
+    'record_id': "ALTER TABLE attendance ADD COLUMN record_id TEXT",
+}
+
+
+def rows_digest(rows):
+    return hashlib.sha1(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class LocalStore:
+    """Thread-safe wrapper around one SQLite connection (WAL mode)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(attendance)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(statement)
+                    # The stored digests would keep the next sync from filling the new column
+                    self._conn.execute("UPDATE sheet_sync SET digest = NULL")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Sync side
+    def sheet_digest(self, sheet):
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM sheet_sync WHERE sheet = ?", (sheet,)).fetchone()
+        return row['digest'] if row else None
+
+    def synced_sheets(self):
+        """Titles of the weekly sheets held locally, newest first."""
+        with self._lock:
+            rows = self._conn.execute("SELECT sheet FROM sheet_sync ORDER BY sheet DESC").fetchall()
+        return [r['sheet'] for r in rows]
+
+    def replace_sheet(self, sheet, rows):
+        """Replaces a week with the sheet's raw values (header first). Returns False if unchanged."""
+        digest = rows_digest(rows)
+        if digest == self.sheet_digest(sheet):
+            return False
+
+        headers = rows[0] if rows else []
+        positions = [headers.index(f) if f in headers else None for f in ATTENDANCE_FIELDS]
+        records = []
+        for row_number, row in enumerate(rows[1:], start=2):
+            values = [row[p] if p is not None and p < len(row) else '' for p in positions]
+            records.append((sheet, row_number, *values))
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM attendance WHERE sheet = ?", (sheet,))
+            self._conn.executemany(
+                f"INSERT INTO attendance (sheet, row, {', '.join(ATTENDANCE_FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(ATTENDANCE_FIELDS))})", records)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sheet_sync (sheet, row_count, digest, synced_at) VALUES (?, ?, ?, ?)",
+                (sheet, len(rows), digest, time.time()))
+        return True
+
+    def drop_sheet(self, sheet):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM attendance WHERE sheet = ?", (sheet,))
+            self._conn.execute("DELETE FROM sheet_sync WHERE sheet = ?", (sheet,))
+
+    def replace_employees(self, records):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM employees")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO employees (id, name, location, created_at) VALUES (?, ?, ?, ?)",
+                [tuple(str(r.get(f, '')) for f in EMPLOYEE_FIELDS) for r in records])
+
+    # Read side
+    def employees(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM employees ORDER BY rowid").fetchall()
+        return [dict(r) for r in rows]
+
+    def sheet_rows(self, sheet):
+        """(row, date, employee_id, record_id) of every record in a week, for rebuilding a row index."""
+        with self._lock:
+            meta = self._conn.execute("SELECT row_count FROM sheet_sync WHERE sheet = ?", (sheet,)).fetchone()
+            if meta is None:
+                return None, []
+            rows = self._conn.execute(
+                "SELECT row, date, employee_id, record_id FROM attendance WHERE sheet = ? ORDER BY row",
+                (sheet,)).fetchall()
+        return meta['row_count'], [(r['row'], r['date'], r['employee_id'], r['record_id']) for r in rows]
+
+    def employee_records(self, employee_id, sheets, date_from=None, date_to=None):
+        """Records of one employee in the given weeks, newest week first."""
+        if not sheets:
+            return []
+        query = (f"SELECT {', '.join(ATTENDANCE_FIELDS)} FROM attendance "
+                 f"WHERE employee_id = ? AND sheet IN ({', '.join('?' * len(sheets))})")
+        params = [str(employee_id), *sheets]
+        if date_from:
+            query += " AND date >= ?"
+            params.append(date_from.strftime("%Y-%m-%d"))
+        if date_to:
+            query += " AND date <= ?"
+            params.append(date_to.strftime("%Y-%m-%d"))
+        query += " ORDER BY sheet DESC, row"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(r) for r in rows]
+
+    # Write-through side
+    def record_append(self, sheet, first_row, records):
+        with self._lock, self._conn:
+            if not self._has_sheet(sheet):
+                return
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO attendance (sheet, row, {', '.join(ATTENDANCE_FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(ATTENDANCE_FIELDS))})",
+                [(sheet, first_row + i, *(str(r.get(f) or '') for f in ATTENDANCE_FIELDS))
+                 for i, r in enumerate(records)])
+            self._touch(sheet, row_delta=len(records))
+
+    def record_update(self, sheet, row, values):
+        values = {k: v for k, v in values.items() if k in ATTENDANCE_FIELDS}
+        if not values:
+            return
+        with self._lock, self._conn:
+            if not self._has_sheet(sheet):
+                return
+            assignments = ', '.join(f"{k} = ?" for k in values)
+            self._conn.execute(
+                f"UPDATE attendance SET {assignments} WHERE sheet = ? AND row = ?",
+                (*values.values(), sheet, row))
+            self._touch(sheet)
+
+    def record_delete(self, sheet, row):
+        with self._lock, self._conn:
+            if not self._has_sheet(sheet):
+                return
+            self._conn.execute("DELETE FROM attendance WHERE sheet = ? AND row = ?", (sheet, row))
+            # Shift the rows below up in two steps so the (sheet, row) key never collides
+            self._conn.execute("UPDATE attendance SET row = -(row - 1) WHERE sheet = ? AND row > ?", (sheet, row))
+            self._conn.execute("UPDATE attendance SET row = -row WHERE sheet = ? AND row < 0", (sheet,))
+            self._touch(sheet, row_delta=-1)
+
+    def _has_sheet(self, sheet):
+        return self._conn.execute("SELECT 1 FROM sheet_sync WHERE sheet = ?", (sheet,)).fetchone() is not None
+
+    def _touch(self, sheet, row_delta=0):
+        # Our own write changed the sheet, so its digest no longer matches; the next sync re-reads it
+        self._conn.execute(
+            "UPDATE sheet_sync SET row_count = row_count + ?, digest = NULL WHERE sheet = ?", (row_delta, sheet))
+
+
+class LocalStoreSync:
+    """Background thread reconciling the mirror with the spreadsheet."""
+
+    def __init__(self, store, get_spreadsheet, sync_interval=SYNC_INTERVAL, full_sync_interval=FULL_SYNC_INTERVAL):
+        self.store = store
+        self._get_spreadsheet = get_spreadsheet
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self._last_full_sync = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sync(self, full=False):
+        """Re-reads recent weeks (or all of them) and replaces those that changed. Returns changed titles."""
+        spreadsheet = self._get_spreadsheet()
+        if spreadsheet is None:
+            return []
+
+        titles = sheet_service.list_weekly_sheets(spreadsheet, refresh=True)
+        known = set(self.store.synced_sheets())
+        if full:
+            wanted = titles
+        else:
+            wanted = list(dict.fromkeys(titles[:HOT_WEEKS] + [t for t in titles if t not in known]))
+
+        changed = []
+        for title, rows in sheet_service.batch_get_sheets(spreadsheet, wanted, use_cache=False).items():
+            if self.store.replace_sheet(title, rows):
+                changed.append(title)
+                sheet_service.invalidate_row_index(title)
+        for title in known - set(titles):
+            self.store.drop_sheet(title)
+
+        employees = spreadsheet.worksheet('Employees').get_all_records()
+        self.store.replace_employees(employees)
+
+        if full:
+            self._last_full_sync = time.monotonic()
+        return changed
+
+    def start(self, log=print):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            delay = 0 # First (full) sync right after startup
+            while not self._stop.wait(delay):
+                delay = self.sync_interval
+                full = time.monotonic() - self._last_full_sync > self.full_sync_interval
+                try:
+                    changed = self.sync(full=full)
+                    if changed:
+                        log(f"로컬 저장소 동기화: {', '.join(changed)}")
+                except Exception as e:
+                    log(f"로컬 저장소 동기화 실패: {e}")
+
+        self._thread = threading.Thread(target=run, name='local-store-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
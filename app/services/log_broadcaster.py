@@ -0,0 +1,135 @@
+"""Fan-out of log lines to Server-Sent Events clients.
+
+Each connected client gets a bounded asyncio.Queue and awaits it, so idle
+clients cost nothing until a line is published or a keep-alive is due.
+log() may be called from any thread (sheet work runs on executor threads);
+lines are handed to the event loop with call_soon_threadsafe. The last
+REPLAY_SIZE lines are kept in a ring buffer and replayed to new clients, or
+only the ones they missed when the browser reconnects with Last-Event-ID.
+
+With several workers, lines arrive through the cluster event bus with the
+bus sequence number as their id, so a client reconnecting to another worker
+resumes where it left off.
+"""
+import asyncio
+import threading
+from collections import deque
+
+REPLAY_SIZE = 200 # lines replayed to newly connected clients
+CLIENT_BUFFER = 256 # lines buffered per client before the oldest are dropped
+KEEPALIVE_INTERVAL = 15 # seconds between SSE comment pings on an idle stream
+
+
+def format_event(seq, message):
+    """Formats one SSE event; multi-line messages become several data: lines."""
+    data = ''.join(f"data: {line}\n" for line in str(message).split('\n'))
+    return f"id: {seq}\n{data}\n"
+
+
+class Subscriber:
+    __slots__ = ('queue', 'dropped', 'after')
+
+    def __init__(self, size):
+        self.queue = asyncio.Queue(maxsize=size)
+        self.dropped = 0
+        self.after = 0 # last seq already covered by the replay
+
+
+class LogBroadcaster:
+    """Thread-safe publisher with per-client bounded queues and a replay ring."""
+
+    def __init__(self, replay_size=REPLAY_SIZE, client_buffer=CLIENT_BUFFER,
+                 keepalive_interval=KEEPALIVE_INTERVAL, echo=print):
+        self.client_buffer = client_buffer
+        self.keepalive_interval = keepalive_interval
+        self.echo = echo
+        self._history = deque(maxlen=replay_size) # (seq, message)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._subscribers = set()
+        self.stats = {'published': 0, 'dropped': 0, 'connected_total': 0}
+
+    def bind_loop(self, loop=None):
+        """Attaches the event loop that owns the client queues (call from the loop, e.g. at startup)."""
+        self._loop = loop or asyncio.get_running_loop()
+
+    def log(self, message: str, seq=None, echo=True):
+        """Publishes a line; seq is given for lines relayed from the event bus (echo only by the worker that logged it)."""
+        if self.echo and echo:
+            self.echo(message) # Keep terminal output
+        with self._lock:
+            if seq is None:
+                self._seq += 1
+                seq = self._seq
+            else:
+                self._seq = max(self._seq, seq)
+            item = (seq, message)
+            self._history.append(item)
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._publish, item)
+        except RuntimeError:
+            # Loop closed between the check and the call (shutdown)
+            pass
+
+    def _publish(self, item):
+        # Runs on the event loop thread
+        self.stats['published'] += 1
+        for subscriber in self._subscribers:
+            if item[0] <= subscriber.after:
+                continue
+            if subscriber.queue.full():
+                # Slow client: drop its oldest line rather than grow without bound
+                subscriber.queue.get_nowait()
+                subscriber.dropped += 1
+                self.stats['dropped'] += 1
+            subscriber.queue.put_nowait(item)
+
+    def replay(self, last_event_id=None):
+        """Buffered lines newer than last_event_id (all of them when None)."""
+        with self._lock:
+            history = list(self._history)
+            # An id from before a server restart: the client missed everything we have
+            if last_event_id is not None and last_event_id > self._seq:
+                last_event_id = None
+        if last_event_id is None:
+            return history
+        return [item for item in history if item[0] > last_event_id]
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def snapshot(self):
+        return {'subscribers': len(self._subscribers), 'buffered': len(self._history), **self.stats}
+
+    async def stream(self, last_event_id=None):
+        """Async generator of SSE text for one client. Unsubscribes however the stream ends."""
+        if self._loop is None:
+            self.bind_loop()
+        subscriber = Subscriber(self.client_buffer)
+        # Register before taking the replay so no line falls in between
+        self._subscribers.add(subscriber)
+        self.stats['connected_total'] += 1
+        try:
+            backlog = self.replay(last_event_id)
+            subscriber.after = backlog[-1][0] if backlog else (last_event_id or 0)
+            for seq, message in backlog:
+                yield format_event(seq, message)
+
+            while True:
+                try:
+                    seq, message = await asyncio.wait_for(subscriber.queue.get(), self.keepalive_interval)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if seq <= subscriber.after:
+                    continue # Already sent as part of the replay
+                if subscriber.dropped:
+                    yield f": {subscriber.dropped} lines dropped\n\n"
+                    subscriber.dropped = 0
+                yield format_event(seq, message)
+        finally:
+            self._subscribers.discard(subscriber)
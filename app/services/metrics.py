@@ -0,0 +1,284 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms are plain dicts behind a lock: recording is a bisect
+and a few additions, so it can run on the event loop and inside the gspread
+HTTP client without measurable cost. With KADA_METRICS=0 nothing is recorded
+and the HTTP middleware is not installed.
+
+Recorded here:
+- every Google API call (GovernedHTTPClient): operation, sheet kind, lane,
+  status, attempts, latency and response bytes
+  (the fake backend records its calls under the same operation names)
+- rows read and written by sheet_service, per operation and sheet kind
+- per-route HTTP latency (MetricsMiddleware)
+Existing stats snapshots (governor lanes, caches, write queue, ...) are
+exported at scrape time through register_snapshot().
+
+Sheets are labelled by kind (weekly, archive, employees, other), not title:
+a new weekly sheet every week would otherwise add series without bound.
+"""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import unquote, urlsplit
+
+from app.services.week_archive import is_archive_sheet
+
+ENABLED = os.environ.get('KADA_METRICS', '1') != '0'
+
+# Seconds; Sheets calls usually take 0.1-1 s, local routes a few ms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WEEKLY_SHEET_PATTERN = re.compile(r'^\d{4}_\d{2}$') # as in sheet_service
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{escape_label(v)}"' for n, v in zip(names, values)) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {} # labels -> [bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        names = self.labelnames + ('le',)
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{format_labels(names, labels + (le,))} {cumulative}")
+            label_text = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named counters/histograms plus snapshot callbacks read at scrape time."""
+
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self._metrics = []
+        self._snapshots = [] # (prefix, help, callback, label)
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_snapshot(self, prefix, help_text, callback, label=None):
+        """Exports the numbers of a stats snapshot() dict as gauges named prefix_<key>.
+
+        With label set, the top-level keys become values of that label (e.g. lane).
+        """
+        self._snapshots.append((prefix, help_text, callback, label))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, help_text, callback, label in self._snapshots:
+            try:
+                snapshot = callback()
+            except Exception:
+                continue # A broken stats source must not break the scrape
+            lines.extend(render_snapshot(prefix, help_text, snapshot, label))
+        return '\n'.join(lines) + '\n'
+
+
+def render_snapshot(prefix, help_text, snapshot, label=None):
+    samples = {} # name -> [(labels, value)]
+    groups = snapshot.items() if label else [(None, snapshot)]
+    for group, values in groups:
+        if not isinstance(values, dict):
+            continue
+        for key, value in values.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if not isinstance(value, (int, float)):
+                continue
+            labels = format_labels((label,), (group,)) if label else ''
+            samples.setdefault(f"{prefix}_{key}", []).append((labels, value))
+    lines = []
+    for name, values in samples.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{name}{labels} {format_value(value)}" for labels, value in values)
+    return lines
+
+
+registry = MetricsRegistry()
+
+sheets_seconds = registry.histogram(
+    'kada_sheets_request_seconds', 'Google API call latency, including throttling and retries.',
+    ('operation', 'lane'))
+sheets_requests = registry.counter(
+    'kada_sheets_requests_total', 'Google API calls by operation, sheet kind and final status.',
+    ('operation', 'sheet_kind', 'status'))
+sheets_bytes = registry.counter(
+    'kada_sheets_response_bytes_total', 'Response body bytes received from Google APIs.',
+    ('operation', 'sheet_kind'))
+sheets_retries = registry.counter(
+    'kada_sheets_retries_total', 'Extra attempts made by the request governor.', ('operation',))
+sheets_rows = registry.counter(
+    'kada_sheets_rows_total', 'Rows read or written by sheet_service.', ('operation', 'sheet_kind'))
+http_seconds = registry.histogram(
+    'kada_http_request_seconds', 'HTTP request latency by route (streams: until the stream ends).',
+    ('method', 'route', 'status'))
+
+
+def api_operation(method, endpoint):
+    """(operation, range) for a Google API endpoint, e.g. ('values.append', "'2026_42'!A1")."""
+    path = urlsplit(endpoint).path
+    if '/drive/' in path:
+        return 'drive.' + method.lower(), ''
+    _, _, rest = path.partition('/spreadsheets/')
+    _, _, tail = rest.partition('/')
+    if not tail:
+        # /spreadsheets/{id} or /spreadsheets/{id}:batchUpdate
+        return ('batchUpdate' if rest.endswith(':batchUpdate') else 'spreadsheets.' + method.lower()), ''
+    if tail.startswith('values:'):
+        return 'values.' + tail.split(':', 1)[1], ''
+    if tail.startswith('values/'):
+        # The range is percent-encoded, so a ':' left in it starts the verb (':append', ':clear')
+        encoded_range, _, verb = tail[len('values/'):].partition(':')
+        return 'values.' + (verb or ('update' if method.upper() == 'PUT' else 'get')), unquote(encoded_range)
+    return method.lower() + ' ' + tail.split('/')[0], ''
+
+
+def sheet_of(range_name):
+    """Sheet title of an A1 range ('' for a bare cell range)."""
+    title = range_name.rsplit('!', 1)[0]
+    quoted = len(title) > 1 and title.startswith("'") and title.endswith("'")
+    if quoted:
+        return title[1:-1].replace("''", "'")
+    # A quoted name alone is a whole-sheet range (gspread.utils.absolute_range_name); 'A1:B2' names no sheet
+    return title if '!' in range_name else ''
+
+
+def sheet_kind(title):
+    """Bounded label for a sheet title: 'weekly', 'archive', 'employees', 'other' ('' for none)."""
+    if not title:
+        return ''
+    if WEEKLY_SHEET_PATTERN.match(title):
+        return 'weekly'
+    if is_archive_sheet(title):
+        return 'archive'
+    return 'employees' if title == 'Employees' else 'other'
+
+
+def request_sheet_kind(range_name, params, body=None):
+    if range_name:
+        return sheet_kind(sheet_of(range_name))
+    ranges = (params or {}).get('ranges')
+    if not ranges and isinstance(body, dict) and isinstance(body.get('data'), list):
+        ranges = [item.get('range', '') for item in body['data'] if isinstance(item, dict)]
+    if not ranges:
+        return ''
+    kinds = {sheet_kind(sheet_of(r)) for r in ([ranges] if isinstance(ranges, str) else ranges)}
+    return kinds.pop() if len(kinds) == 1 else 'multiple'
+
+
+def observe_sheets_call(method, endpoint, params, body, lane, seconds, attempts, status, response_bytes):
+    operation, range_name = api_operation(method, endpoint)
+    record_sheets_call(operation, request_sheet_kind(range_name, params, body), lane, seconds, attempts, status,
+                       response_bytes)
+
+
+def record_sheets_call(operation, kind, lane, seconds, attempts, status, response_bytes=0):
+    """Records one Sheets call already reduced to its operation and sheet kind."""
+    sheets_seconds.observe((operation, lane), seconds)
+    sheets_requests.inc((operation, kind, status))
+    if response_bytes:
+        sheets_bytes.inc((operation, kind), response_bytes)
+    if attempts > 1:
+        sheets_retries.inc((operation,), attempts - 1)
+
+
+def count_rows(operation, sheet, rows):
+    """Rows transferred by a sheet_service read ('read') or write ('append', 'update')."""
+    if registry.enabled and rows:
+        sheets_rows.inc((operation, sheet_kind(sheet)), rows)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            # Route templates, not raw paths, keep the label set bounded
+            path = getattr(route, 'path', None) or 'unmatched'
+            http_seconds.observe((scope['method'], path, str(status[0])), time.perf_counter() - started)
@@ -0,0 +1,136 @@
+"""Log of record changes made through the API, for delta history sync.
+
+Every successful check-in, check-out, edit and delete is appended with a
+sequence number. A version token '<epoch>.<seq>' names a point in the log:
+the web UI keeps the token of its last history load and asks for the
+changes since then instead of re-reading three weekly sheets. The epoch is
+new on every start, so tokens from an earlier process (or from before the
+oldest change still held) fall back to a full read.
+
+Writes whose content is not known here (bulk endpoints) are logged as
+"unknown" for the employee, which also forces a full read. Edits made
+directly in the spreadsheet are not seen; they show up on the next full
+load (login, reload).
+
+With several workers the log is attached to the cluster event bus: changes
+are published there and every worker applies them under the bus sequence
+number and epoch, so a token from one worker is valid on all of them.
+"""
+import threading
+import time
+from collections import deque
+
+CHANGE_LOG_SIZE = 10000 # Changes held; older tokens get a full read
+
+
+class RecordChangeLog:
+    """Bounded, thread-safe change log with version tokens."""
+
+    def __init__(self, capacity=CHANGE_LOG_SIZE):
+        self._lock = threading.Lock()
+        self._changes = deque(maxlen=capacity) # (seq, employee_id, change or None)
+        self._seq = 0
+        self._floor = 0 # seq of the newest change no longer held
+        self._bus = None
+        self.epoch = format(int(time.time() * 1000), 'x')
+
+    def attach(self, bus):
+        """Shares sequence numbers and epoch with the other workers through a cluster EventBus."""
+        with self._lock:
+            self._bus = bus
+            self.epoch = bus.epoch
+            self._seq = self._floor = bus.start_seq
+            self._changes.clear()
+        bus.subscribe('record_change', lambda seq, payload, own: self.apply(seq, payload['employee_id'], payload['change']))
+        bus.on_reset(self.reset)
+
+    def apply(self, seq, employee_id, change):
+        """Adds a change published on the event bus under its bus sequence number."""
+        with self._lock:
+            if seq <= self._seq:
+                return
+            if len(self._changes) == self._changes.maxlen:
+                self._floor = self._changes[0][0]
+            self._changes.append((seq, employee_id, change))
+            self._seq = seq
+
+    def reset(self):
+        """Forgets every held change (events were missed), so older tokens get a full read."""
+        with self._lock:
+            self._changes.clear()
+            self._floor = self._seq = max(self._seq, self._bus.last_seq if self._bus else self._seq)
+
+    def version(self):
+        with self._lock:
+            return f"{self.epoch}.{self._seq}"
+
+    def record(self, record, deleted=False):
+        """Logs a written record: a dict with date, employee_id and the fields that changed.
+
+        Returns the version after the change.
+        """
+        change = {'date': record.get('date'), 'deleted': deleted, 'record': None if deleted else dict(record)}
+        return self._append(str(record.get('employee_id')), change)
+
+    def invalidate(self, employee_id):
+        """Logs a change to the employee's records whose content is unknown. Returns the new version."""
+        return self._append(str(employee_id), None)
+
+    def since(self, token, employee_id):
+        """Changes to employee_id's records after token, oldest first.
+
+        Returns None when they cannot be listed (foreign or expired token, or an
+        unknown change), in which case the caller sends the full history.
+        """
+        seq = self._parse(token)
+        if seq is None:
+            return None
+        employee_id = str(employee_id)
+        with self._lock:
+            if seq > self._seq:
+                return None
+            # Changes after seq must not have been dropped from the front
+            if seq < self._floor:
+                return None
+            changes = []
+            for change_seq, change_employee, change in reversed(self._changes):
+                if change_seq <= seq:
+                    break
+                if change_employee != employee_id:
+                    continue
+                if change is None:
+                    return None
+                changes.append(change)
+        changes.reverse()
+        return changes
+
+    def snapshot(self):
+        with self._lock:
+            return {'version': f"{self.epoch}.{self._seq}", 'changes': len(self._changes)}
+
+    def _append(self, employee_id, change):
+        bus = self._bus
+        if bus:
+            # Applied here (with any earlier events) before publish() returns
+            seq = bus.publish('record_change', {'employee_id': employee_id, 'change': change}, wait=True)
+            if seq is not None:
+                return f"{self.epoch}.{seq}"
+        with self._lock:
+            self._seq += 1
+            if len(self._changes) == self._changes.maxlen:
+                self._floor = self._changes[0][0]
+            self._changes.append((self._seq, employee_id, change))
+            return f"{self.epoch}.{self._seq}"
+
+    def _parse(self, token):
+        # Accepts ETag forms too: "<token>" or W/"<token>"
+        token = (token or '').strip()
+        if token.startswith('W/'):
+            token = token[2:]
+        epoch, _, seq = token.strip('"').partition('.')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+
+change_log = RecordChangeLog()
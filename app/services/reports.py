@@ -0,0 +1,283 @@
+"""Worked-hours reports over the weekly YYYY_WW sheets.
+
+Each weekly sheet is loaded once into columnar arrays (array module: employee
+number, day ordinal, check-in and check-out seconds) and the per-row
+durations are derived from those columns in one pass. Aggregations then
+only walk compact integer arrays, so a year of data for a few hundred
+employees is summed in milliseconds. Closed (past) weeks are cached, along
+with their per-employee weekly totals; the current week is always re-read.
+"""
+import datetime
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+import app.services.sheet_service as sheet_service
+
+LATE_AFTER = '10:00:00' # Check-ins after this time count as late
+CLOSED_WEEK_TTL = 6 * 3600 # seconds; catches edits made directly in the spreadsheet
+CACHE_MAX_WEEKS = 160
+MISSING = -1
+DAY_SECONDS = 24 * 3600
+
+
+def parse_seconds(value):
+    """HH:MM[:SS] -> seconds since midnight, or MISSING."""
+    try:
+        parts = [int(p) for p in str(value).strip().split(':')]
+    except ValueError:
+        return MISSING
+    if len(parts) == 2:
+        parts.append(0)
+    if len(parts) != 3:
+        return MISSING
+    hours, minutes, seconds = parts
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def parse_ordinal(value):
+    date = sheet_service.parse_date(value)
+    return date.toordinal() if date else MISSING
+
+
+def duration(checkin, checkout):
+    if checkin == MISSING or checkout == MISSING:
+        return 0
+    # A check-out before the check-in went past midnight
+    return checkout - checkin if checkout >= checkin else checkout + DAY_SECONDS - checkin
+
+
+class WeekColumns:
+    """One weekly sheet as parallel integer columns."""
+
+    __slots__ = ('title', 'employee_ids', 'names', 'employee', 'day', 'checkin', 'checkout',
+                 'seconds', 'first_day', 'last_day', 'marker', 'loaded_at', '_totals')
+
+    def __init__(self, title):
+        self.title = title
+        self.employee_ids = [] # employee number -> employee_id
+        self.names = []
+        self.employee = array('i')
+        self.day = array('i')
+        self.checkin = array('i')
+        self.checkout = array('i')
+        self.seconds = array('i')
+        self.first_day = self.last_day = MISSING
+        self.marker = None # snapshot_cache revision marker when loaded
+        self.loaded_at = time.monotonic()
+        self._totals = {} # (late_after, first day, last day) -> per-employee totals
+
+    @classmethod
+    def from_rows(cls, title, rows):
+        """Builds the columns from a sheet's raw values (header first)."""
+        week = cls(title)
+        if not rows:
+            return week
+        headers = rows[0]
+        if not all(c in headers for c in ('date', 'employee_id', 'checkin_time', 'checkout_time')):
+            return week
+        date_idx, id_idx = headers.index('date'), headers.index('employee_id')
+        in_idx, out_idx = headers.index('checkin_time'), headers.index('checkout_time')
+        name_idx = headers.index('name') if 'name' in headers else None
+        width = max(date_idx, id_idx, in_idx, out_idx) + 1
+
+        numbers = {}
+        for row in rows[1:]:
+            if len(row) < width:
+                row = row + [''] * (width - len(row))
+            employee_id = str(row[id_idx])
+            day = parse_ordinal(row[date_idx])
+            if not employee_id or day == MISSING:
+                continue
+            number = numbers.get(employee_id)
+            if number is None:
+                number = numbers[employee_id] = len(week.employee_ids)
+                week.employee_ids.append(employee_id)
+                week.names.append(row[name_idx] if name_idx is not None and name_idx < len(row) else '')
+            week.employee.append(number)
+            week.day.append(day)
+            week.checkin.append(parse_seconds(row[in_idx]))
+            week.checkout.append(parse_seconds(row[out_idx]))
+        week.seconds = array('i', map(duration, week.checkin, week.checkout))
+        if week.day:
+            week.first_day, week.last_day = min(week.day), max(week.day)
+        return week
+
+    def segments(self, day_from, day_to):
+        """Splits the part of the range this week covers at month boundaries: [(YYYY-MM, first, last)]."""
+        first, last = max(day_from, self.first_day), min(day_to, self.last_day)
+        segments = []
+        while self.day and first <= last:
+            date = datetime.date.fromordinal(first)
+            next_month = (date.replace(day=28) + datetime.timedelta(days=4)).replace(day=1).toordinal()
+            end = min(last, next_month - 1)
+            segments.append((date.strftime("%Y-%m"), first, end))
+            first = end + 1
+        return segments
+
+    def totals(self, late_after, day_from, day_to):
+        """Per-employee [seconds, days, late, missing_checkouts] for rows in the day range (memoized)."""
+        key = (late_after, day_from, day_to)
+        totals = self._totals.get(key)
+        if totals is not None:
+            return totals
+
+        totals = [[0, 0, 0, 0] for _ in self.employee_ids]
+        for number, day, checkin, checkout, seconds in zip(
+                self.employee, self.day, self.checkin, self.checkout, self.seconds):
+            if day < day_from or day > day_to:
+                continue
+            entry = totals[number]
+            entry[0] += seconds
+            entry[1] += 1
+            if checkin > late_after:
+                entry[2] += 1
+            if checkin != MISSING and checkout == MISSING:
+                entry[3] += 1
+
+        if len(self._totals) >= 16:
+            self._totals.clear()
+        self._totals[key] = totals
+        return totals
+
+    def daily(self, number, late_after, day_from, day_to):
+        """Daily rows of one employee number in the day range."""
+        days = []
+        for i, employee in enumerate(self.employee):
+            day = self.day[i]
+            if employee != number or day < day_from or day > day_to:
+                continue
+            checkin, checkout = self.checkin[i], self.checkout[i]
+            days.append({
+                'date': datetime.date.fromordinal(day).strftime("%Y-%m-%d"),
+                'minutes': self.seconds[i] // 60,
+                'late': checkin > late_after,
+                'missing_checkout': checkin != MISSING and checkout == MISSING,
+            })
+        return days
+
+
+class ReportCache:
+    """Thread-safe LRU of WeekColumns for closed weeks."""
+
+    def __init__(self, ttl=CLOSED_WEEK_TTL, max_weeks=CACHE_MAX_WEEKS):
+        self.ttl = ttl
+        self.max_weeks = max_weeks
+        self._weeks = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, title, marker):
+        with self._lock:
+            week = self._weeks.get(title)
+            if week is None or week.marker != marker or time.monotonic() - week.loaded_at > self.ttl:
+                self._weeks.pop(title, None)
+                self.misses += 1
+                return None
+            self._weeks.move_to_end(title)
+            self.hits += 1
+            return week
+
+    def put(self, week):
+        with self._lock:
+            self._weeks[week.title] = week
+            self._weeks.move_to_end(week.title)
+            while len(self._weeks) > self.max_weeks:
+                self._weeks.popitem(last=False)
+
+    def invalidate(self, title=None):
+        with self._lock:
+            if title is None:
+                self._weeks.clear()
+            else:
+                self._weeks.pop(title, None)
+
+    def snapshot(self):
+        with self._lock:
+            return {'weeks': len(self._weeks), 'hits': self.hits, 'misses': self.misses}
+
+
+report_cache = ReportCache()
+sheet_service.add_change_listener(report_cache.invalidate)
+
+
+def load_weeks(repository, titles, refresh=False):
+    """WeekColumns for each title, reading the uncached ones with one batchGet per chunk."""
+    current = sheet_service.get_current_week_sheet_name()
+    weeks = {}
+    # Cached weeks are only reused while the store has no external edits since
+    marker = repository.revision()
+    if not refresh and marker is not None:
+        for title in titles:
+            if title < current:
+                week = report_cache.get(title, marker)
+                if week is not None:
+                    weeks[title] = week
+
+    missing = [t for t in titles if t not in weeks]
+    for title, rows in repository.week_rows(missing, use_cache=not refresh).items():
+        week = WeekColumns.from_rows(title, rows)
+        week.marker = marker
+        weeks[title] = week
+        if title < current:
+            report_cache.put(week)
+    return [weeks[t] for t in titles if t in weeks]
+
+
+def hours_report(repository, date_from, date_to, employee_id=None, late_after=LATE_AFTER,
+                 daily=False, refresh=False):
+    """Worked hours per employee between two dates (inclusive).
+
+    Returns {'from', 'to', 'late_after', 'employees': [...]}: each employee has
+    total_minutes, days_worked, late_days, missing_checkouts and per-week and
+    per-month minutes, plus daily rows when daily is set.
+    Returns None if the sheets could not be read.
+    """
+    late_seconds = parse_seconds(late_after)
+    try:
+        titles = repository.week_titles(date_from, date_to)
+        weeks = load_weeks(repository, titles, refresh)
+    except Exception as e:
+        sheet_service.report_error(e)
+        sheet_service.log(f"근무 시간 집계 실패: {e}")
+        return None
+
+    day_from, day_to = date_from.toordinal(), date_to.toordinal()
+    employees = {}
+    for week in weeks:
+        # Segments clipped to the week's own days, so whole-week totals of a cached week are reused
+        for month, first, last in week.segments(day_from, day_to):
+            for number, (seconds, days, late, missing) in enumerate(week.totals(late_seconds, first, last)):
+                if not days:
+                    continue
+                emp_id = week.employee_ids[number]
+                if employee_id is not None and emp_id != str(employee_id):
+                    continue
+                entry = employees.setdefault(emp_id, {
+                    'employee_id': emp_id,
+                    'name': week.names[number],
+                    'total_minutes': 0,
+                    'days_worked': 0,
+                    'late_days': 0,
+                    'missing_checkouts': 0,
+                    'weeks': {},
+                    'months': {},
+                })
+                entry['total_minutes'] += seconds // 60
+                entry['days_worked'] += days
+                entry['late_days'] += late
+                entry['missing_checkouts'] += missing
+                entry['weeks'][week.title] = entry['weeks'].get(week.title, 0) + seconds // 60
+                entry['months'][month] = entry['months'].get(month, 0) + seconds // 60
+                if daily:
+                    entry.setdefault('days', []).extend(week.daily(number, late_seconds, first, last))
+
+    return {
+        'from': date_from.strftime("%Y-%m-%d"),
+        'to': date_to.strftime("%Y-%m-%d"),
+        'late_after': late_after,
+        'employees': sorted(employees.values(), key=lambda e: e['employee_id']),
+    }
+
@@ -0,0 +1,123 @@
+"""Storage-independent access to employees and attendance records.
+
+Routes, reports and exports talk to an AttendanceRepository instead of passing
+a gspread spreadsheet around. Two implementations exist:
+
+- SheetsRepository: the Google spreadsheet via sheet_service (default)
+- SqliteRepository (sqlite_repository.py): an indexed SQLite database with
+  transactional updates, for headcounts the Sheets quota cannot carry
+
+KADA_STORAGE selects one ('sheets' or 'sqlite', with KADA_DB_PATH). Existing
+data is copied over with `python -m app.migrate`.
+"""
+import os
+from typing import Protocol, runtime_checkable
+
+import app.services.sheet_service as sheet_service
+from app.services.sheets_backend import get_connector
+from app.services.spreadsheet_pool import SpreadsheetPool
+from app.services.sqlite_repository import SqliteRepository
+
+
+class StorageUnavailable(Exception):
+    """The backing store could not be reached (e.g. no spreadsheet connection)."""
+
+
+@runtime_checkable
+class AttendanceRepository(Protocol):
+    # Employees
+    def find_employee(self, name): ...
+    def reload_employees(self): ...
+
+    # Single records; False on failure, with the reason logged. check_in returns the
+    # written record, check_out and update_record the changed fields with date and
+    # employee_id, delete_record True
+    def check_in(self, employee, specific_time=None, specific_date=None): ...
+    def check_out(self, employee, specific_time=None, specific_date=None): ...
+    def update_record(self, employee_id, date_str, checkin=None, checkout=None, record_id=None): ...
+    def delete_record(self, employee_id, date_str, record_id=None): ...
+
+    # Bulk writes; one result dict per entry (see sheet_service.bulk_results)
+    def bulk_check_in(self, entries): ...
+    def bulk_check_out(self, entries): ...
+    def bulk_upsert_records(self, entries): ...
+
+    # Reads
+    def employee_records(self, employee_id, date_from=None, date_to=None): ...
+    def week_titles(self, date_from, date_to): ...
+    def week_rows(self, titles, use_cache=True): ...
+    def revision(self): ...
+
+
+class SheetsRepository:
+    """AttendanceRepository over the Google spreadsheet."""
+
+    def __init__(self, get_spreadsheet):
+        self._get_spreadsheet = get_spreadsheet
+
+    @property
+    def spreadsheet(self):
+        spreadsheet = self._get_spreadsheet()
+        if spreadsheet is None:
+            raise StorageUnavailable("Database connection failed")
+        return spreadsheet
+
+    def find_employee(self, name):
+        return sheet_service.find_employee(self.spreadsheet, name)
+
+    def reload_employees(self):
+        return sheet_service.reload_employees(self.spreadsheet)
+
+    def check_in(self, employee, specific_time=None, specific_date=None):
+        return sheet_service.check_in(self.spreadsheet, employee, specific_time, specific_date)
+
+    def check_out(self, employee, specific_time=None, specific_date=None):
+        return sheet_service.check_out(self.spreadsheet, employee, specific_time, specific_date)
+
+    def update_record(self, employee_id, date_str, checkin=None, checkout=None, record_id=None):
+        return sheet_service.update_record(self.spreadsheet, employee_id, date_str, checkin, checkout, record_id)
+
+    def delete_record(self, employee_id, date_str, record_id=None):
+        return sheet_service.delete_record(self.spreadsheet, employee_id, date_str, record_id)
+
+    def bulk_check_in(self, entries):
+        return sheet_service.bulk_check_in(self.spreadsheet, entries)
+
+    def bulk_check_out(self, entries):
+        return sheet_service.bulk_check_out(self.spreadsheet, entries)
+
+    def bulk_upsert_records(self, entries):
+        return sheet_service.bulk_upsert_records(self.spreadsheet, entries)
+
+    def employee_records(self, employee_id, date_from=None, date_to=None):
+        return sheet_service.get_all_employee_records(self.spreadsheet, employee_id, date_from, date_to)
+
+    def week_titles(self, date_from, date_to):
+        """Existing weeks covering date_from..date_to (weekly sheets or archived), oldest first."""
+        spreadsheet = self.spreadsheet
+        wanted = sheet_service.week_sheet_names(date_from, date_to)
+        live = set(sheet_service.list_weekly_sheets(spreadsheet))
+        titles = [t for t in wanted if t in live]
+        titles += sheet_service.archived_weeks(spreadsheet, [t for t in wanted if t not in live])
+        return sorted(titles)
+
+    def week_rows(self, titles, use_cache=True):
+        """{title: raw rows (header first)}, archived weeks included; raises if the sheets could not be read."""
+        spreadsheet = self.spreadsheet
+        results = sheet_service.archived_weeks(spreadsheet, titles, use_cache)
+        results.update(sheet_service.batch_get_sheets(spreadsheet, [t for t in titles if t not in results], use_cache))
+        return results
+
+    def revision(self):
+        """Marker that changes when the data is edited outside this process (None if unknown)."""
+        return sheet_service.check_revision(self.spreadsheet)
+
+
+def open_repository(get_spreadsheet=None, storage=None):
+    """The repository selected by KADA_STORAGE ('sheets' by default)."""
+    storage = storage or os.environ.get('KADA_STORAGE', 'sheets')
+    if storage == 'sheets':
+        return SheetsRepository(get_spreadsheet or SpreadsheetPool(connect=get_connector()).get)
+    if storage == 'sqlite':
+        return SqliteRepository(os.environ.get('KADA_DB_PATH', 'attendance.db'))
+    raise ValueError(f"Unknown KADA_STORAGE: {storage}")
@@ -0,0 +1,337 @@
+"""Quota-aware rate limiting, retries and circuit breaking for Google API calls.
+
+Every request gspread sends goes through GovernedHTTPClient.request(), which
+hands it to the process-wide RequestGovernor:
+
+- Requests are split into a read lane and a write lane, each with a token
+  bucket sized to the Sheets per-minute quota, so bursts queue up locally
+  instead of turning into HTTP 429s.
+- 429s (and 403 usageLimits) pause the whole lane for Retry-After (or a
+  jittered exponential backoff) and are retried once the pause is over; the
+  retry waits out the pause in acquire() like every other call. 5xx and
+  transport errors are retried after the same backoff, but only for
+  requests that are safe to repeat (reads and value overwrites; never
+  appends or structural batchUpdates).
+- Retries are capped by a retry budget, so an outage does not multiply our
+  traffic, and repeated failures open a per-lane circuit breaker that fails
+  calls fast until a probe succeeds.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from app.services import metrics
+
+# The quota is per service account, so KADA_WORKERS processes each get an equal share of it
+WORKERS = max(1, int(os.environ.get('KADA_WORKERS', 1)))
+READS_PER_MINUTE = max(1, int(os.environ.get('KADA_SHEETS_READS_PER_MINUTE', 60)) // WORKERS) # Sheets per-user read quota
+WRITES_PER_MINUTE = max(1, int(os.environ.get('KADA_SHEETS_WRITES_PER_MINUTE', 60)) // WORKERS) # Sheets per-user write quota
+ACQUIRE_TIMEOUT = 20 # seconds a call may wait for a token before giving up
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+RETRY_BUDGET_RATIO = 0.2 # retries allowed per request in the window
+RETRY_BUDGET_MIN = 3 # retries always allowed in the window
+RETRY_BUDGET_WINDOW = 10 # seconds
+
+BREAKER_THRESHOLD = 5 # consecutive failures that open the circuit
+BREAKER_COOLDOWN = 30 # seconds before a probe request is let through
+
+RETRYABLE_STATUS = {500, 502, 503, 504}
+# Write endpoints whose repeat has the same effect as one call
+IDEMPOTENT_WRITES = ('values:batchUpdate', 'values:batchClear', 'values:clear')
+
+
+class ThrottledError(Exception):
+    """No quota token became available within the acquire timeout."""
+
+
+class CircuitOpenError(Exception):
+    """The lane's circuit breaker is open; the call was not sent."""
+
+
+def is_rate_limited(error):
+    if not isinstance(error, APIError):
+        return False
+    if error.code == 429:
+        return True
+    # The Drive API reports quota exhaustion as 403 usageLimits
+    errors = error.error.get('errors') or [{}]
+    return error.code == 403 and errors[0].get('domain') == 'usageLimits'
+
+
+def is_transient(error):
+    if isinstance(error, APIError):
+        return error.code in RETRYABLE_STATUS
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def retry_after(error):
+    """Seconds from a Retry-After header, or None."""
+    try:
+        return float(error.response.headers.get('Retry-After'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket holding at most per_minute requests in any minute."""
+
+    def __init__(self, per_minute, burst=None):
+        self.burst = burst or max(1, per_minute // 6)
+        # burst + rate * 60 == per_minute, so a full minute never exceeds the quota
+        self.rate = max(per_minute - self.burst, 1) / 60
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=ACQUIRE_TIMEOUT):
+        """Takes one token, sleeping as needed. Returns the seconds waited."""
+        started = time.monotonic()
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            if now + wait - started > timeout:
+                raise ThrottledError(f"no quota token within {timeout}s")
+            time.sleep(wait)
+            waited = time.monotonic() - started
+
+    def pause(self, seconds):
+        """Stops handing out tokens for a while (after a 429) and empties the bucket."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class RetryBudget:
+    """Allows retries up to a fraction of recent requests."""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, minimum=RETRY_BUDGET_MIN, window=RETRY_BUDGET_WINDOW):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_spend(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._retries) >= self.minimum + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> half-open after `cooldown`."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.cooldown else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True # Let exactly one probe through
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        """Returns True if this failure opened (or re-opened) the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self._probing or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                self._probing = False
+                return True
+            return False
+
+
+class Lane:
+    def __init__(self, name, per_minute):
+        self.name = name
+        self.bucket = TokenBucket(per_minute)
+        self.budget = RetryBudget()
+        self.breaker = CircuitBreaker()
+        self.stats = {
+            'requests': 0,
+            'throttled': 0, # calls that had to wait for a token
+            'throttle_wait_ms': 0.0,
+            'rate_limited': 0, # 429 / usageLimits responses
+            'retries': 0,
+            'retry_budget_exhausted': 0,
+            'failures': 0,
+            'circuit_opened': 0,
+            'rejected': 0, # calls refused by an open circuit or acquire timeout
+        }
+        self._lock = threading.Lock()
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, 'circuit': self.breaker.state}
+
+
+class RequestGovernor:
+    """Runs Google API calls through per-lane quota, retry and breaker policies."""
+
+    def __init__(self, reads_per_minute=READS_PER_MINUTE, writes_per_minute=WRITES_PER_MINUTE,
+                 max_attempts=MAX_ATTEMPTS, sleep=time.sleep):
+        self.lanes = {'read': Lane('read', reads_per_minute), 'write': Lane('write', writes_per_minute)}
+        self.max_attempts = max_attempts
+        self._sleep = sleep
+
+    def execute(self, lane_name, send, idempotent=True):
+        """Calls send() under the lane's policies and returns its result, or raises the last error."""
+        lane = self.lanes[lane_name]
+        attempt = 0
+        timeout = ACQUIRE_TIMEOUT
+        while True:
+            attempt += 1
+            if not lane.breaker.allow():
+                lane.count('rejected')
+                raise CircuitOpenError(f"Google Sheets {lane_name} circuit is open")
+            try:
+                waited = lane.bucket.acquire(timeout)
+            except ThrottledError:
+                lane.count('rejected')
+                raise
+            if waited > 0:
+                lane.count('throttled')
+                lane.count('throttle_wait_ms', waited * 1000)
+
+            lane.count('requests')
+            lane.budget.record_request()
+            try:
+                result = send()
+            except Exception as e:
+                rate_limited = is_rate_limited(e)
+                delay = retry_after(e) or self._backoff(attempt)
+                if rate_limited:
+                    lane.count('rate_limited')
+                    lane.bucket.pause(delay)
+                retryable = rate_limited or (idempotent and is_transient(e))
+                if not (rate_limited or is_transient(e)):
+                    # A client error (400, 404, ...) says nothing about Google's health
+                    lane.breaker.record_success()
+                    raise
+                if retryable and attempt < self.max_attempts:
+                    if lane.budget.try_spend():
+                        lane.count('retries')
+                        if rate_limited:
+                            # The retry's acquire() waits out the pause; sleeping as well would wait twice
+                            timeout = ACQUIRE_TIMEOUT + delay
+                        else:
+                            self._sleep(delay)
+                        continue
+                    lane.count('retry_budget_exhausted')
+                lane.count('failures')
+                if lane.breaker.record_failure():
+                    lane.count('circuit_opened')
+                raise
+            lane.breaker.record_success()
+            return result
+
+    def _backoff(self, attempt):
+        # Full jitter: spreads out the retries of calls that failed together
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    def snapshot(self):
+        return {name: lane.snapshot() for name, lane in self.lanes.items()}
+
+
+def classify(method, endpoint):
+    """Returns (lane, idempotent) for a Google API request."""
+    if method.upper() == 'GET' or endpoint.endswith('values:batchGet'):
+        return 'read', True
+    return 'write', endpoint.endswith(IDEMPOTENT_WRITES) or method.upper() == 'PUT'
+
+
+# Process-wide governor shared by every gspread client
+governor = RequestGovernor()
+
+
+class GovernedHTTPClient(HTTPClient):
+    """gspread HTTP client that sends every request through the governor."""
+
+    governor = governor
+
+    def request(self, method, endpoint, *args, **kwargs):
+        lane, idempotent = classify(method, endpoint)
+        send = lambda: super(GovernedHTTPClient, self).request(method, endpoint, *args, **kwargs)
+        if not metrics.registry.enabled:
+            return self.governor.execute(lane, send, idempotent)
+
+        attempts = 0
+
+        def counted_send():
+            nonlocal attempts
+            attempts += 1
+            return send()
+
+        started = time.perf_counter()
+        response, status = None, 'error'
+        try:
+            response = self.governor.execute(lane, counted_send, idempotent)
+            status = str(getattr(response, 'status_code', 200))
+            return response
+        except APIError as e:
+            status = str(e.code)
+            raise
+        except (CircuitOpenError, ThrottledError):
+            status = 'rejected'
+            raise
+        finally:
+            metrics.observe_sheets_call(
+                method, endpoint, kwargs.get('params'), kwargs.get('json'), lane, time.perf_counter() - started,
+                attempts, status, len(getattr(response, 'content', None) or b''))
@@ -0,0 +1,249 @@
+"""(date, employee_id) -> row number index for the weekly YYYY_WW sheets.
+
+Built from one read of the date, employee_id and record_id columns (or a full
+get_all_values() when the headers moved) and then kept in step with our own
+appends and deletes, so finding a record for check-out/update/delete does not need a
+full-sheet download. Deletes blank the row instead of removing it (a
+tombstone), so no other row moves and the index update is O(1); tombstones of
+closed weeks are removed later by compaction, which rebuilds the index. A
+tombstone keeps a TOMBSTONE_PREFIX marker in one cell: a fully blank row
+would end the table for the Sheets API's table detection, and the next
+append would be written into the gap, over the rows below it.
+
+An index is trusted for VERIFY_INTERVAL seconds after it was built or last
+verified; after that its last row is re-checked against the sheet (a
+three-cell read) before use.
+
+RecordLocks serializes the find-then-append of new records per (sheet, date,
+employee_id), so two check-ins racing for the same key cannot both see "no
+row" and both append. Updates and deletes hold the same lock from finding a
+row to writing it, and compaction holds every lock (hold_sheet), so no
+write lands on a row number that compaction has just moved.
+"""
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import gspread
+
+VERIFY_INTERVAL = 30  # seconds
+LOCK_STRIPES = 256 # record keys share this many locks
+TOMBSTONE_PREFIX = 'deleted:' # marker cell of a deleted row (followed by its record_id)
+
+
+def is_blank_row(row):
+    """True for an empty row or a tombstone (nothing but the deleted marker)."""
+    return not any(cell for cell in row if not str(cell).startswith(TOMBSTONE_PREFIX))
+
+
+def is_record_id(value):
+    """True for a record_id cell value (not empty, not a tombstone's marker)."""
+    return bool(value) and not str(value).startswith(TOMBSTONE_PREFIX)
+
+
+def appended_row_number(response):
+    """Extracts the first 1-based row from an append_row(s)() response, or None."""
+    try:
+        updated_range = response['updates']['updatedRange']
+        start = updated_range.split('!')[-1].split(':')[0]
+        return gspread.utils.a1_to_rowcol(start)[0]
+    except (KeyError, TypeError, IndexError, gspread.exceptions.IncorrectCellLabel):
+        return None
+
+
+class WeekRowIndex:
+    """Row positions of one weekly sheet."""
+
+    def __init__(self, title, date_idx, id_idx):
+        self.title = title
+        self.date_idx = date_idx
+        self.id_idx = id_idx
+        self.rows = {}
+        self.row_records = {} # row -> record_id
+        self.row_count = 0
+        self.last_key = ('', '') # (date, employee_id) of row row_count, which verify() checks
+        self.verified_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, title, rows, date_idx, id_idx, record_idx=None):
+        """Builds the index from a full get_all_values() result (header included)."""
+        index = cls(title, date_idx, id_idx)
+        for i, row in enumerate(rows[1:], start=2):
+            if record_idx is not None and len(row) > record_idx and is_record_id(row[record_idx]):
+                index.row_records[i] = row[record_idx]
+            if len(row) <= max(date_idx, id_idx) or not (row[date_idx] or row[id_idx]):
+                continue
+            # Keep the first match, as the linear scans did
+            index.rows.setdefault((row[date_idx], str(row[id_idx])), i)
+        index.row_count = len(rows)
+        if len(rows) > 1:
+            last = rows[-1]
+            index.last_key = (last[date_idx] if len(last) > date_idx else '',
+                              str(last[id_idx]) if len(last) > id_idx else '')
+        index.verified_at = time.monotonic()
+        return index
+
+    @classmethod
+    def from_columns(cls, title, date_idx, id_idx, dates, ids, record_ids=None):
+        """Builds the index from just the date, employee_id and record_id columns (header first)."""
+        index = cls(title, date_idx, id_idx)
+        for i in range(1, max(len(dates), len(ids))):
+            date_str = dates[i] if i < len(dates) else ''
+            employee_id = ids[i] if i < len(ids) else ''
+            if date_str or employee_id:
+                index.rows.setdefault((date_str, str(employee_id)), i + 1)
+        for i, record_id in enumerate(record_ids or [], start=1):
+            if i > 1 and is_record_id(record_id):
+                index.row_records[i] = record_id
+        # Last row with a date, which verify() checks
+        index.row_count = len(dates)
+        if len(dates) > 1:
+            index.last_key = (dates[-1], str(ids[len(dates) - 1]) if len(ids) >= len(dates) else '')
+        index.verified_at = time.monotonic()
+        return index
+
+    @classmethod
+    def from_entries(cls, title, date_idx, id_idx, row_count, entries):
+        """Builds an unverified index from (row, date, employee_id, record_id) tuples, e.g. from the local store."""
+        index = cls(title, date_idx, id_idx)
+        for row, date_str, employee_id, record_id in entries:
+            if date_str or employee_id:
+                index.rows.setdefault((date_str, str(employee_id)), row)
+            if is_record_id(record_id):
+                index.row_records[row] = record_id
+            if row == row_count:
+                index.last_key = (date_str, str(employee_id))
+        index.row_count = row_count
+        return index
+
+    def find(self, date_str, employee_id):
+        with self._lock:
+            return self.rows.get((date_str, str(employee_id)), -1)
+
+    def record_at(self, row):
+        """record_id of a row, or None if the row has none or the index did not read it."""
+        with self._lock:
+            return self.row_records.get(row)
+
+    def is_fresh(self):
+        return time.monotonic() - self.verified_at < VERIFY_INTERVAL
+
+    def verify(self, worksheet):
+        """Cheap consistency check that reads three cells, however long the sheet is.
+
+        The last row we know of must hold the key we think it does (last_key,
+        kept in step with appends and deletes), and the row after it must be
+        empty (nobody else appended).
+        """
+        with self._lock:
+            last = self.row_count
+            expected = self.last_key
+        date_col = gspread.utils.rowcol_to_a1(1, self.date_idx + 1).rstrip('0123456789')
+        id_col = gspread.utils.rowcol_to_a1(1, self.id_idx + 1).rstrip('0123456789')
+        response = worksheet.spreadsheet.values_batch_get([
+            gspread.utils.absolute_range_name(self.title, f"{date_col}{last}:{date_col}{last + 1}"),
+            gspread.utils.absolute_range_name(self.title, f"{id_col}{last}"),
+        ])
+        dates, ids = [value_range.get('values', []) for value_range in response.get('valueRanges', [])]
+        tail = [row[0] if row else '' for row in dates]
+        last_key = (tail[0] if tail else '', str(ids[0][0]) if ids and ids[0] else '')
+        if len(tail) > 1 and tail[1]:
+            return False
+        if last > 1 and last_key != expected:
+            return False
+        with self._lock:
+            if self.row_count != last:
+                return False
+            self.verified_at = time.monotonic()
+            return True
+
+    def record_append(self, first_row, keys, record_ids=()):
+        """Applies our own append of rows keyed (date, employee_id), starting at first_row.
+
+        record_ids, if given, are the appended rows' record_id values.
+        Returns False if someone else appended in between.
+        """
+        with self._lock:
+            if first_row != self.row_count + 1:
+                return False
+            for offset, (date_str, employee_id) in enumerate(keys):
+                self.rows.setdefault((date_str, str(employee_id)), first_row + offset)
+            for offset, record_id in enumerate(record_ids):
+                if record_id:
+                    self.row_records[first_row + offset] = record_id
+            self.row_count = first_row + len(keys) - 1
+            if keys:
+                self.last_key = (keys[-1][0], str(keys[-1][1]))
+            return True
+
+    def record_clear(self, row_number, key):
+        """Applies our own tombstoning of row_number, which held key.
+
+        The tombstone is not blank, so it stays part of the table and row_count does not change.
+        """
+        with self._lock:
+            if self.rows.get((key[0], str(key[1]))) == row_number:
+                del self.rows[(key[0], str(key[1]))]
+            self.row_records.pop(row_number, None)
+            if row_number == self.row_count:
+                # A tombstone's date and employee_id cells read back blank
+                self.last_key = ('', '')
+
+
+class RowIndexCache:
+    """Thread-safe registry of WeekRowIndex keyed by sheet title."""
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, title):
+        with self._lock:
+            return self._indexes.get(title)
+
+    def put(self, index):
+        with self._lock:
+            self._indexes[index.title] = index
+
+    def invalidate(self, title=None):
+        with self._lock:
+            if title is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(title, None)
+
+
+class RecordLocks:
+    """Striped locks over (sheet, date, employee_id) keys.
+
+    Stripes come from a stable hash (not hash(), which differs per process) so a
+    subclass can map them onto locks shared with other processes.
+    """
+
+    def __init__(self, stripes=LOCK_STRIPES):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def stripes(self, sheet_name, keys):
+        """Sorted stripe numbers of the keys (a fixed order, so holders cannot deadlock)."""
+        return sorted({zlib.crc32('\x1f'.join((sheet_name, *map(str, key))).encode('utf-8')) % len(self._locks)
+                       for key in keys})
+
+    def hold(self, sheet_name, keys):
+        """Holds the locks of every (date, employee_id) key of sheet_name."""
+        return self.hold_stripes(self.stripes(sheet_name, keys))
+
+    def hold_sheet(self, sheet_name):
+        """Holds every stripe, so no record of the sheet is found or written meanwhile (other sheets wait too)."""
+        return self.hold_stripes(range(len(self._locks)))
+
+    @contextmanager
+    def hold_stripes(self, stripes):
+        for stripe in stripes:
+            self._locks[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self._locks[stripe].release()
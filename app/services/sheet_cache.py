@@ -0,0 +1,99 @@
+"""Cache of worksheet handles and their resolved header columns.
+
+spreadsheet.worksheet(name) fetches the spreadsheet metadata and every write
+path used to re-read row 1 to find its columns. A SheetInfo keeps both for a
+sheet title so those round-trips happen once per TTL instead of per request.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+# Columns the attendance code addresses by name
+ATTENDANCE_COLUMNS = ('date', 'employee_id', 'checkin_time', 'checkout_time', 'reason', 'record_id')
+
+DEFAULT_TTL = 600  # seconds
+DEFAULT_MAX_SIZE = 64
+
+
+@dataclass
+class SheetInfo:
+    """A worksheet handle, its gid and the 0-based index of each header."""
+    worksheet: object
+    gid: int
+    headers: list
+    columns: dict = field(default_factory=dict)
+    spreadsheet: object = None
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def build(cls, spreadsheet, worksheet, headers):
+        columns = {name: headers.index(name) for name in ATTENDANCE_COLUMNS if name in headers}
+        return cls(worksheet, worksheet.id, list(headers), columns, spreadsheet)
+
+    @property
+    def title(self):
+        return self.worksheet.title
+
+    def has_columns(self, *names):
+        return all(name in self.columns for name in names)
+
+    def matches_headers(self, headers):
+        return list(headers) == self.headers
+
+
+class WorksheetCache:
+    """Thread-safe LRU of SheetInfo keyed by sheet title, with TTL expiry."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._titles = None # (spreadsheet, loaded_at, [titles])
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, spreadsheet, title):
+        """Returns the cached SheetInfo, or None if missing, expired or from another connection."""
+        with self._lock:
+            info = self._entries.get(title)
+            if info is None or info.spreadsheet is not spreadsheet \
+                    or time.monotonic() - info.loaded_at > self.ttl:
+                self._entries.pop(title, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(title)
+            self.hits += 1
+            return info
+
+    def put(self, info):
+        with self._lock:
+            self._entries[info.title] = info
+            self._entries.move_to_end(info.title)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_titles(self, spreadsheet):
+        """Returns the cached list of worksheet titles, or None."""
+        with self._lock:
+            if self._titles is None:
+                return None
+            owner, loaded_at, titles = self._titles
+            if owner is not spreadsheet or time.monotonic() - loaded_at > self.ttl:
+                self._titles = None
+                return None
+            return list(titles)
+
+    def put_titles(self, spreadsheet, titles):
+        with self._lock:
+            self._titles = (spreadsheet, time.monotonic(), list(titles))
+
+    def invalidate(self, title=None):
+        """Drops one title, or everything when title is None. The title list is dropped either way."""
+        with self._lock:
+            self._titles = None
+            if title is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(title, None)
@@ -0,0 +1,116 @@
+"""Creates upcoming weekly sheets ahead of time and keeps the current week warm.
+
+check_in used to fail until someone added the week's YYYY_WW tab by hand, and
+the first requests of each week paid for the metadata, header and row-index
+reads. The provisioner creates the current and the next WEEKS_AHEAD weekly
+sheets with the standard header row, and loads the current week's handle,
+headers and row index at startup and right after each Monday 00:00. Each run
+also compacts closed weeks that deletes left blank rows in.
+"""
+import datetime
+import threading
+
+import app.services.sheet_service as sheet_service
+
+WEEKS_AHEAD = 1
+PROVISION_INTERVAL = 3600 # seconds between checks
+WEEK_START_DELAY = 5 # seconds after Monday 00:00 before warming the new week
+
+
+def seconds_until_next_week(now):
+    monday = (now - datetime.timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (monday + datetime.timedelta(weeks=1) - now).total_seconds()
+
+
+class WeeklySheetProvisioner:
+    """Background thread provisioning weekly sheets."""
+
+    def __init__(self, get_spreadsheet, weeks_ahead=WEEKS_AHEAD, interval=PROVISION_INTERVAL):
+        self._get_spreadsheet = get_spreadsheet
+        self.weeks_ahead = weeks_ahead
+        self.interval = interval
+        self.warmed_week = None
+        self.stats = {'runs': 0, 'created': [], 'compacted_rows': 0, 'failures': 0, 'last_run': None}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def upcoming_titles(self, today=None):
+        """The current week's sheet name followed by the next weeks_ahead."""
+        today = today or datetime.date.today()
+        return [sheet_service.get_sheet_name_from_date(today + datetime.timedelta(weeks=i))
+                for i in range(self.weeks_ahead + 1)]
+
+    def run_once(self):
+        """Creates missing upcoming sheets and warms the current week. Returns the titles created."""
+        spreadsheet = self._get_spreadsheet()
+        if spreadsheet is None:
+            return []
+
+        titles = self.upcoming_titles()
+        existing = set(sheet_service.list_weekly_sheets(spreadsheet, refresh=True))
+        created, failed = [], False
+        for title in titles:
+            if title in existing:
+                continue
+            if sheet_service.provision_weekly_sheet(spreadsheet, title, exists=False):
+                created.append(title)
+            else:
+                failed = True
+
+        current = titles[0]
+        if self.warmed_week != current:
+            if sheet_service.warm_week(spreadsheet, current):
+                self.warmed_week = current
+            else:
+                failed = True
+
+        compacted = sheet_service.compact_closed_weeks(spreadsheet)
+
+        with self._lock:
+            self.stats['runs'] += 1
+            self.stats['created'].extend(created)
+            self.stats['compacted_rows'] += compacted
+            self.stats['failures'] += failed
+            self.stats['last_run'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return created
+
+    def start(self, log=print):
+        """Starts the background thread; call run_once() first to provision before serving."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.next_delay()):
+                try:
+                    created = self.run_once()
+                    if created:
+                        log(f"주차 시트 미리 생성: {', '.join(created)}")
+                except Exception as e:
+                    log(f"주차 시트 준비 실패: {e}")
+
+        self._thread = threading.Thread(target=run, name='sheet-provisioner', daemon=True)
+        self._thread.start()
+
+    def next_delay(self):
+        # Wake up just after the week rolls over so the new week is warm before Monday's first check-in
+        return min(self.interval, seconds_until_next_week(datetime.datetime.now()) + WEEK_START_DELAY)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'weeks_ahead': self.weeks_ahead,
+                'warmed_week': self.warmed_week,
+                'runs': self.stats['runs'],
+                'created': list(self.stats['created'][-10:]),
+                'compacted_rows': self.stats['compacted_rows'],
+                'failures': self.stats['failures'],
+                'last_run': self.stats['last_run'],
+            }
@@ -1,6 +1,18 @@
 import gspread
 from google.oauth2.service_account import Credentials
 import datetime
+import itertools
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app.services.sheet_cache import SheetInfo, WorksheetCache
+from app.services.row_index import RecordLocks, RowIndexCache, TOMBSTONE_PREFIX, WeekRowIndex, appended_row_number, is_blank_row
+from app.services.employee_directory import EmployeeDirectory
+from app.services.request_governor import GovernedHTTPClient
+from app.services.snapshot_cache import SnapshotCache
+from app.services.week_archive import ArchiveCache, ARCHIVE_KEEP_WEEKS, archive_title, archive_values, is_archive_sheet
+from app.services.metrics import count_rows
 
 # Configuration
 SERVICE_ACCOUNT_FILE = 'kada-admin.json'
@@ -11,6 +23,7 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive'
 ]
 SHEET_NAME = 'kada_attendance' 
+HTTP_TIMEOUT = 15 # seconds per Google API request
 
 # Logging callback
 log_callback = print
@@ -23,18 +36,100 @@ def log(message):
     if log_callback:
         log_callback(message)
 
+# Error callback (e.g. SpreadsheetPool.report_error) notified of swallowed API errors
+error_callback = None
+
+def set_error_callback(callback):
+    global error_callback
+    error_callback = callback
+
+def report_error(error):
+    if error_callback:
+        error_callback(error)
+
+# Listeners notified with a sheet title (None = every sheet) after we change its contents
+change_listeners = []
+
+def add_change_listener(callback):
+    change_listeners.append(callback)
+
+def sheet_changed(worksheet_name=None):
+    snapshot_cache.record_write(worksheet_name)
+    for callback in change_listeners:
+        callback(worksheet_name)
+    publish_event('sheet_changed', title=worksheet_name)
+
+# Cluster mode (app.services.cluster): cache changes the other worker processes apply too
+event_publisher = None
+
+def set_event_publisher(publish):
+    global event_publisher
+    event_publisher = publish
+
+def publish_event(topic, **payload):
+    if event_publisher:
+        event_publisher(topic, payload)
+
+# Topics apply_event() handles
+CACHE_EVENTS = ('sheet_changed', 'sheet_invalidated', 'index_invalidated', 'rows_appended', 'row_cleared',
+                'employees_reloaded', 'own_revision')
+
+def apply_event(topic, payload):
+    """Applies a cache change published by another worker process (see publish_event calls)."""
+    title = payload.get('title')
+    if topic == 'sheet_changed':
+        sheet_changed(title)
+    elif topic == 'sheet_invalidated':
+        worksheet_cache.invalidate(title)
+        row_index_cache.invalidate(title)
+    elif topic == 'index_invalidated':
+        row_index_cache.invalidate(title)
+    elif topic == 'rows_appended':
+        index = row_index_cache.get(title)
+        keys = [tuple(key) for key in payload['keys']]
+        if index and not index.record_append(payload['first_row'], keys, payload['record_ids']):
+            row_index_cache.invalidate(title)
+    elif topic == 'employees_reloaded':
+        employee_directory.load_records(payload['records'])
+    elif topic == 'row_cleared':
+        index = row_index_cache.get(title)
+        if index:
+            index.record_clear(payload['row'], tuple(payload['key']))
+        tombstoned_weeks.add(title)
+    elif topic == 'own_revision':
+        snapshot_cache.record_own_revision(payload['modified'])
+
+# Snapshots of closed weekly sheets (memory only until set_snapshot_cache() adds a disk tier)
+snapshot_cache = SnapshotCache()
+
+def set_snapshot_cache(cache):
+    global snapshot_cache
+    snapshot_cache = cache
+
+# Optional local SQLite mirror (app.services.local_store.LocalStore) serving reads
+local_store = None
+
+def set_local_store(store):
+    global local_store
+    local_store = store
+
+def load_credentials():
+    """Loads the service account credentials."""
+    # Check standard path then Render secret path
+    filename = SERVICE_ACCOUNT_FILE
+    if not os.path.exists(filename) and os.path.exists(RENDER_SECRET_PATH):
+        filename = RENDER_SECRET_PATH
+
+    return Credentials.from_service_account_file(
+        filename, scopes=SCOPES)
+
 def connect_to_spreadsheet():
     """Connects to Google Sheets using the service account."""
     try:
-        # Check standard path then Render secret path
-        import os
-        filename = SERVICE_ACCOUNT_FILE
-        if not os.path.exists(filename) and os.path.exists(RENDER_SECRET_PATH):
-            filename = RENDER_SECRET_PATH
-
-        creds = Credentials.from_service_account_file(
-            filename, scopes=SCOPES)
-        client = gspread.authorize(creds)
+        creds = load_credentials()
+        # Every request goes through the quota/retry governor
+        client = gspread.authorize(creds, http_client=GovernedHTTPClient)
+        client.set_timeout(HTTP_TIMEOUT)
         # Open the spreadsheet
         try:
             spreadsheet = client.open(SHEET_NAME)
@@ -48,14 +143,177 @@ def connect_to_spreadsheet():
         log(f"Authentication Error: {e}")
         return None
 
-def get_worksheet(spreadsheet, worksheet_name):
-    """Helper to get a specific worksheet."""
+# Worksheet handles and header columns, keyed by sheet title
+worksheet_cache = WorksheetCache()
+
+def get_sheet_info(spreadsheet, worksheet_name):
+    """Returns the cached SheetInfo (worksheet, gid, columns), loading it on a miss."""
+    info = worksheet_cache.get(spreadsheet, worksheet_name)
+    if info:
+        return info
+
     try:
-        return spreadsheet.worksheet(worksheet_name)
+        sheet = spreadsheet.worksheet(worksheet_name)
     except gspread.exceptions.WorksheetNotFound:
         log(f"Error: Worksheet '{worksheet_name}' not found.")
         return None
 
+    info = SheetInfo.build(spreadsheet, sheet, sheet.row_values(1))
+    if info.headers:
+        worksheet_cache.put(info)
+    return info
+
+def refresh_sheet_info(info, headers):
+    """Re-resolves columns if the header row read back differs from the cached one."""
+    if info.matches_headers(headers):
+        return info
+    log(f"'{info.title}' 시트의 헤더가 변경되어 캐시를 갱신합니다.")
+    info = SheetInfo.build(info.spreadsheet, info.worksheet, headers)
+    worksheet_cache.put(info)
+    row_index_cache.invalidate(info.title)
+    return info
+
+def invalidate_sheet(worksheet_name=None):
+    """Drops cached state for a sheet (or all sheets) after a structural change."""
+    worksheet_cache.invalidate(worksheet_name)
+    row_index_cache.invalidate(worksheet_name)
+    publish_event('sheet_invalidated', title=worksheet_name)
+    sheet_changed(worksheet_name)
+
+def invalidate_row_index(worksheet_name):
+    """Drops a week's row index here and in the other worker processes."""
+    row_index_cache.invalidate(worksheet_name)
+    publish_event('index_invalidated', title=worksheet_name)
+
+# (date, employee_id) -> row positions of the weekly sheets
+row_index_cache = RowIndexCache()
+
+# Held from the "no row yet" check to the append of a new record (cluster mode swaps in cross-process locks)
+record_locks = RecordLocks()
+
+def set_record_locks(locks):
+    global record_locks
+    record_locks = locks
+
+def get_row_index(info):
+    """Returns (info, WeekRowIndex) for a weekly sheet, rebuilding the index from one bulk read if it can't be trusted."""
+    index = row_index_cache.get(info.title)
+    if index and (index.is_fresh() or index.verify(info.worksheet)):
+        return info, index
+
+    # Seed from the local mirror; trusted only if the sheet still has the same row count
+    if local_store and info.has_columns('date', 'employee_id'):
+        row_count, entries = local_store.sheet_rows(info.title)
+        if row_count is not None:
+            index = WeekRowIndex.from_entries(
+                info.title, info.columns['date'], info.columns['employee_id'], row_count, entries)
+            if index.verify(info.worksheet):
+                row_index_cache.put(index)
+                return info, index
+
+    # Only the two key columns: the bytes read no longer include every other column of every row
+    info, columns = read_key_columns(info)
+    if columns:
+        index = WeekRowIndex.from_columns(info.title, info.columns['date'], info.columns['employee_id'], *columns)
+        row_index_cache.put(index)
+        return info, index
+
+    rows = info.worksheet.get_all_values()
+    count_rows('read', info.title, len(rows))
+    if not rows:
+        log("시트가 비어있습니다.")
+        return info, None
+
+    info = refresh_sheet_info(info, rows[0])
+    if not info.has_columns('date', 'employee_id'):
+        log("필수 컬럼(date, employee_id)이 누락되었습니다.")
+        return info, None
+
+    index = WeekRowIndex.build(info.title, rows, info.columns['date'], info.columns['employee_id'],
+                               info.columns.get('record_id'))
+    row_index_cache.put(index)
+    return info, index
+
+def column_range(title, col_idx):
+    """A1 range of a whole column, e.g. 'Sheet'!F:F, for a 0-based column index."""
+    letter = cell_address(1, col_idx).rstrip('0123456789')
+    return gspread.utils.absolute_range_name(title, f"{letter}:{letter}")
+
+def read_key_columns(info):
+    """Reads the header row plus the date, employee_id and (if present) record_id columns with one values.batchGet.
+
+    Returns (info, (dates, ids, record_ids)); the columns are None if the header moved them,
+    in which case info is refreshed and the caller falls back to a full read.
+    """
+    if not info.has_columns('date', 'employee_id'):
+        return info, None
+    key_columns = ('date', 'employee_id', 'record_id') if info.has_columns('record_id') else ('date', 'employee_id')
+    ranges = [gspread.utils.absolute_range_name(info.title, '1:1')]
+    ranges += [column_range(info.title, info.columns[column]) for column in key_columns]
+    response = info.spreadsheet.values_batch_get(ranges, params={'majorDimension': 'COLUMNS'})
+    header, *columns = [value_range.get('values', []) for value_range in response.get('valueRanges', [])]
+    count_rows('read_keys', info.title, len(columns[0][0]) if columns[0] else 0)
+    # Other columns (checkout_time, reason, ...) may have moved too
+    old_columns = dict(info.columns)
+    info = refresh_sheet_info(info, [column[0] if column else '' for column in header])
+    if any(info.columns.get(column) != old_columns.get(column) for column in key_columns):
+        return info, None
+    dates, ids, *record_ids = [(column or [[]])[0] for column in columns]
+    return info, (dates, ids, record_ids[0] if record_ids else None)
+
+def find_record_row(info, date_str, employee_id, record_id=None):
+    """Returns (info, 1-based row) of the employee's record on date_str; row is -1 if not found.
+
+    With record_id, a row known to hold a different record is not returned, so a
+    client holding a deleted record cannot change the record written after it.
+    """
+    info, index = get_row_index(info)
+    if index is None:
+        return info, -1
+    row = index.find(date_str, employee_id)
+    if record_id and row != -1 and index.record_at(row) not in (None, record_id):
+        return info, -1
+    return info, row
+
+def cell_address(row_idx, col_idx):
+    """Returns the A1 address for a 1-based row and a 0-based column index (works past column Z)."""
+    return gspread.utils.rowcol_to_a1(row_idx, col_idx + 1)
+
+def write_cells(info, cells):
+    """Writes [(row_idx, col_idx, value), ...] to the sheet in a single values.batchUpdate call."""
+    data = [{'range': cell_address(row_idx, col_idx), 'values': [[value]]} for row_idx, col_idx, value in cells]
+    if not data:
+        return
+    # Use USER_ENTERED to ensure correct data types (Time, String)
+    info.worksheet.batch_update(data, value_input_option='USER_ENTERED')
+    sheet_changed(info.title)
+    confirm_own_write(info.spreadsheet)
+    count_rows('update', info.title, len({row_idx for row_idx, _, _ in cells}))
+
+    if local_store:
+        by_row = {}
+        for row_idx, col_idx, value in cells:
+            by_row.setdefault(row_idx, {})[info.headers[col_idx]] = value
+        for row_idx, values in by_row.items():
+            local_store.record_update(info.title, row_idx, values)
+
+def confirm_own_write(spreadsheet):
+    """Remembers the modifiedTime our write produced, so the next revision check keeps the snapshots."""
+    if not snapshot_cache.wants_own_revision():
+        return
+    try:
+        modified = spreadsheet.get_lastUpdateTime()
+    except Exception as e:
+        report_error(e)
+        return # The next revision check retires the snapshots instead
+    snapshot_cache.record_own_revision(modified)
+    publish_event('own_revision', modified=modified)
+
+def get_worksheet(spreadsheet, worksheet_name):
+    """Helper to get a specific worksheet."""
+    info = get_sheet_info(spreadsheet, worksheet_name)
+    return info.worksheet if info else None
+
 def read_data(spreadsheet, worksheet_name):
     """Reads and prints all data from the specified worksheet."""
     sheet = get_worksheet(spreadsheet, worksheet_name)
@@ -71,60 +329,91 @@ def read_data(spreadsheet, worksheet_name):
             for i, row in enumerate(data, start=2): # 1 is header
                 log(f"Row {i}: {row}")
     except Exception as e:
+        report_error(e)
         log(f"Error reading data: {e}")
 
 def add_data(spreadsheet, worksheet_name, data_dict):
-    """Adds a new row to the specified worksheet."""
-    sheet = get_worksheet(spreadsheet, worksheet_name)
-    if not sheet:
-        return
+    """Adds a new row to the specified worksheet. Returns True once the row is written."""
+    info = get_sheet_info(spreadsheet, worksheet_name)
+    if not info:
+        return False
 
     log(f"\n--- Adding Data to {worksheet_name} ---")
     try:
-        # Check if headers exist (simple check)
-        if not sheet.row_values(1):
-            log("Warning: Sheet appears to be empty (no headers).")
-
-        # Prepare row data based on worksheet type
-        # This is a simple implementation; ideally, we map keys to columns dynamically
-        # For now, we assume the dict keys match the order or we just append values if we know the order.
-        # But `append_row` takes a list.
-        
-        # To be safe, let's just append the values from the dict in a specific order if known,
-        # or just append the values if the dict is ordered (Python 3.7+).
-        # Better: Read headers and map.
-        
-        headers = sheet.row_values(1)
-        if not headers:
+        # Map the dict onto the cached header row
+        if not info.headers:
              log("Error: Cannot add data to a sheet without headers.")
-             return
+             return False
 
-        row = []
-        for header in headers:
-            row.append(data_dict.get(header, ''))
-        
-        sheet.append_row(row, value_input_option='USER_ENTERED')
-        log(f"Added row: {row}")
+        rows = append_records(info, [data_dict])
+        log(f"Added row: {rows[0]}")
+        return True
     except Exception as e:
+        invalidate_sheet(worksheet_name)
+        report_error(e)
         log(f"Error adding data: {e}")
+        return False
 
-def find_employee(spreadsheet, name):
-    """Finds an employee by name in the 'Employees' sheet."""
-    sheet = get_worksheet(spreadsheet, 'Employees')
-    if not sheet:
-        return None
-    
+def append_records(info, records):
+    """Appends record dicts (mapped onto the header row) with one append_rows call and returns the rows written."""
+    rows = [[record.get(header, '') for header in info.headers] for record in records]
+    response = info.worksheet.append_rows(rows, value_input_option='USER_ENTERED')
+    sheet_changed(info.title)
+    confirm_own_write(info.spreadsheet)
+    count_rows('append', info.title, len(rows))
+
+    # Keep the week's row index (and the local mirror) in step with our own append
+    first_row = appended_row_number(response)
+    index = row_index_cache.get(info.title)
+    if index:
+        keys = [(record.get('date', ''), record.get('employee_id', '')) for record in records]
+        record_ids = [record.get('record_id') for record in records] if info.has_columns('record_id') else ()
+        if first_row is None or not index.record_append(first_row, keys, record_ids):
+            invalidate_row_index(info.title)
+        else:
+            publish_event('rows_appended', title=info.title, first_row=first_row, keys=keys, record_ids=record_ids)
+    if local_store and first_row is not None:
+        local_store.record_append(info.title, first_row, records)
+    return rows
+
+# Name/id index of the 'Employees' sheet
+employee_directory = EmployeeDirectory()
+
+def reload_employees(spreadsheet):
+    """Re-reads the 'Employees' sheet into the directory. Returns the employee count, or None on failure."""
     try:
-        # Get all records
-        records = sheet.get_all_records()
-        for record in records:
-            if record.get('name') == name:
-                return record
+        count = employee_directory.load(spreadsheet)
+        if event_publisher:
+            publish_event('employees_reloaded', records=employee_directory.records())
+        log(f"직원 목록을 불러왔습니다. ({count}명)")
+        return count
+    except gspread.exceptions.WorksheetNotFound:
+        log("Error: Worksheet 'Employees' not found.")
         return None
     except Exception as e:
-        log(f"Error finding employee: {e}")
+        report_error(e)
+        log(f"Error loading employees: {e}")
+        # Fall back to the local mirror while Google is unavailable
+        if local_store and not employee_directory.loaded:
+            records = local_store.employees()
+            if records:
+                log("로컬 저장소의 직원 목록을 사용합니다.")
+                return employee_directory.load_records(records)
         return None
 
+def find_employee(spreadsheet, name):
+    """Finds an employee by name in the 'Employees' sheet."""
+    if not employee_directory.loaded:
+        if reload_employees(spreadsheet) is None:
+            return None
+
+    employee = employee_directory.by_name(name)
+    if employee is None and employee_directory.should_reload_on_miss():
+        # Maybe someone was added to the sheet since the last refresh
+        reload_employees(spreadsheet)
+        employee = employee_directory.by_name(name)
+    return employee.to_dict() if employee else None
+
 import random
 
 def get_current_week_sheet_name():
@@ -134,145 +423,134 @@ def get_current_week_sheet_name():
     week = today.isocalendar()[1]
     return f"{year}_{week:02d}"
 
-def check_in(spreadsheet, employee, specific_time=None, specific_date=None):
-    """Handles the check-in process. Supports past dates."""
+def resolve_date(specific_date=None):
+    """Returns (date_str, sheet_name) for a YYYY-MM-DD date or today, or None if the date is invalid."""
     if specific_date:
-        today_str = specific_date
         # Determine sheet name based on the specific date
-        try:
-            date_obj = datetime.datetime.strptime(specific_date, "%Y-%m-%d").date()
-            sheet_name = get_sheet_name_from_date(date_obj)
-        except ValueError:
+        sheet_name = get_sheet_name_from_date_str(specific_date)
+        if not sheet_name:
             log("Invalid date format.")
-            return False
-    else:
-        today_str = datetime.datetime.now().strftime("%Y-%m-%d")
-        sheet_name = get_current_week_sheet_name()
-
-    sheet = get_worksheet(spreadsheet, sheet_name)
-    
-    if not sheet:
-        log(f"이번 주차 시트 없음 ({sheet_name})")
-        return False
+            return None
+        return specific_date, sheet_name
+    return datetime.datetime.now().strftime("%Y-%m-%d"), get_current_week_sheet_name()
 
+def make_record_time(specific_time, hour):
+    """Returns HH:MM:SS for a manual time, or a random time within the given hour."""
     if specific_time:
         # If input is HH:MM (len 5), add random seconds (00-59) to make it look natural
         if len(specific_time) == 5:
             random_second = random.randint(0, 59)
-            checkin_time_str = f"{specific_time}:{random_second:02d}"
-        else:
-            checkin_time_str = specific_time
-    else:
-        # Generate random time between 09:00 and 10:00
-        now = datetime.datetime.now()
-        random_minute = random.randint(0, 59)
-        random_second = random.randint(0, 59)
-        checkin_dt = now.replace(hour=9, minute=random_minute, second=random_second)
-        checkin_time_str = checkin_dt.strftime("%H:%M:%S")
-    
-    today_str = today_str # Use the determined date (today or specific_date)
-    
-    # Prepare data based on schema: 
-    # ['date', 'name', 'location', 'checkin_time', 'checkout_time', 'employee_id', 'reason']
-    data = {
-        'date': today_str,
+            return f"{specific_time}:{random_second:02d}"
+        return specific_time
+
+    now = datetime.datetime.now()
+    random_minute = random.randint(0, 59)
+    random_second = random.randint(0, 59)
+    return now.replace(hour=hour, minute=random_minute, second=random_second).strftime("%H:%M:%S")
+
+def make_checkin_time(specific_time=None):
+    # Generate random time between 09:00 and 10:00
+    return make_record_time(specific_time, 9)
+
+def make_checkout_time(specific_time=None):
+    # Generate random time 21:00 ~ 22:00
+    return make_record_time(specific_time, 21)
+
+def new_record_id():
+    """Unique id written to a record's record_id column; it never changes, unlike the row number."""
+    return uuid.uuid4().hex[:16]
+
+def build_checkin_record(employee, date_str, checkin_time_str):
+    """Prepares a check-in row dict based on the weekly sheet schema."""
+    # ['date', 'name', 'location', 'checkin_time', 'checkout_time', 'employee_id', 'reason', 'record_id']
+    return {
+        'date': date_str,
         'name': employee.get('name'),
         'location': employee.get('location'),
         'checkin_time': checkin_time_str,
         'checkout_time': '',
         'employee_id': employee.get('id'),
-        'reason': '-'
+        'reason': '-',
+        'record_id': new_record_id(),
     }
+
+def check_in(spreadsheet, employee, specific_time=None, specific_date=None):
+    """Handles the check-in process. Supports past dates.
+
+    Returns the written record, or False on failure.
+    """
+    resolved = resolve_date(specific_date)
+    if not resolved:
+        return False
+    today_str, sheet_name = resolved
+
+    info = get_week_sheet_info(spreadsheet, sheet_name)
     
-    add_data(spreadsheet, sheet_name, data)
+    if not info:
+        log(f"이번 주차 시트 없음 ({sheet_name})")
+        return False
+
+    checkin_time_str = make_checkin_time(specific_time)
+    data = build_checkin_record(employee, today_str, checkin_time_str)
+
+    # A repeated check-in must not append a second row; the week's row index
+    # (kept warm by the provisioner and our own appends) answers from memory.
+    # The lock keeps a concurrent check-in from passing the same check before we append.
+    with record_locks.hold(sheet_name, [record_key(data)]):
+        info, index = get_row_index(info)
+        if index and index.find(*record_key(data)) != -1:
+            log("이미 출근 기록이 있습니다.")
+            return False
+
+        if not add_data(spreadsheet, sheet_name, data):
+            log("출근 기록을 저장하지 못했습니다. 다시 시도해 주세요.")
+            return False
     log(f"출근 처리가 완료되었습니다. 시간: {checkin_time_str}, 사유: -")
-    return True
+    return data
 
 def check_out(spreadsheet, employee, specific_time=None, specific_date=None):
-    """Handles the check-out process. Supports past dates."""
-    if specific_date:
-        today_str = specific_date
-        # Determine sheet name based on the specific date
-        try:
-            date_obj = datetime.datetime.strptime(specific_date, "%Y-%m-%d").date()
-            sheet_name = get_sheet_name_from_date(date_obj)
-        except ValueError:
-            log("Invalid date format.")
-            return False
-    else:
-        today_str = datetime.datetime.now().strftime("%Y-%m-%d")
-        sheet_name = get_current_week_sheet_name()
+    """Handles the check-out process. Supports past dates.
 
-    sheet = get_worksheet(spreadsheet, sheet_name)
+    Returns the changed fields with date and employee_id, or False on failure.
+    """
+    resolved = resolve_date(specific_date)
+    if not resolved:
+        return False
+    today_str, sheet_name = resolved
+
+    info = get_sheet_info(spreadsheet, sheet_name)
     
-    if not sheet:
+    if not info:
         log(f"이번 주차 시트 없음 ({sheet_name})")
         return False
 
-    today_str = today_str 
     emp_id = str(employee.get('id'))
 
-    # Get all values to find the row
-    rows = sheet.get_all_values()
-    if not rows:
-        log("시트가 비어있습니다.")
-        return False
+    # Held from finding the row to writing it, so compaction cannot move the row in between
+    with record_locks.hold(sheet_name, [(today_str, emp_id)]):
+        # Find the row through the week's row index
+        info, target_row_idx = find_record_row(info, today_str, emp_id)
+        sheet = info.worksheet
+        if not info.has_columns('date', 'employee_id', 'checkout_time', 'reason'):
+            log("필수 컬럼(date, employee_id, checkout_time, reason)이 누락되었습니다.")
+            return False
+        checkout_idx = info.columns['checkout_time']
+        reason_idx = info.columns['reason']
 
-    headers = rows[0]
-    try:
-        date_idx = headers.index('date')
-        id_idx = headers.index('employee_id')
-        checkout_idx = headers.index('checkout_time')
-        reason_idx = headers.index('reason')
-    except ValueError:
-        log("필수 컬럼(date, employee_id, checkout_time, reason)이 누락되었습니다.")
-        return False
+        if target_row_idx == -1:
+            log("오늘 날짜의 출근 기록이 없습니다.")
+            return False
 
-    target_row_idx = -1
-    for i, row in enumerate(rows[1:], start=2): # start=2 because row 1 is header
-        # Check bounds
-        if len(row) <= max(date_idx, id_idx): 
-            continue
-            
-        # Compare date and employee_id
-        if row[date_idx] == today_str and str(row[id_idx]) == emp_id:
-            target_row_idx = i
-            break
-    
-    if target_row_idx == -1:
-        log("오늘 날짜의 출근 기록이 없습니다.")
-        return False
+        checkout_time_str = make_checkout_time(specific_time)
 
-    if specific_time:
-        if len(specific_time) == 5:
-             random_second = random.randint(0, 59)
-             checkout_time_str = f"{specific_time}:{random_second:02d}"
-        else:
-            checkout_time_str = specific_time
-    else:
-        # Generate random time 21:00 ~ 22:00
-        now = datetime.datetime.now()
-        random_minute = random.randint(0, 59)
-        random_second = random.randint(0, 59)
-        checkout_dt = now.replace(hour=21, minute=random_minute, second=random_second)
-        checkout_time_str = checkout_dt.strftime("%H:%M:%S")
-
-    # Update checkout_time and reason
-    # Use USER_ENTERED to ensure correct data types (Time, String)
-    
-    # Helper to convert col index (0-based) to letter (A, B, C...)
-    # Assuming cols < 26 for simplicity
-    checkout_col_letter = chr(64 + checkout_idx + 1)
-    reason_col_letter = chr(64 + reason_idx + 1)
-    
-    checkout_cell = f"{checkout_col_letter}{target_row_idx}"
-    reason_cell = f"{reason_col_letter}{target_row_idx}"
-    
-    sheet.update(checkout_cell, [[checkout_time_str]], value_input_option='USER_ENTERED')
-    sheet.update(reason_cell, [["-"]], value_input_option='USER_ENTERED')
+        # Update checkout_time and reason in one request
+        write_cells(info, [
+            (target_row_idx, checkout_idx, checkout_time_str),
+            (target_row_idx, reason_idx, "-"),
+        ])
     
     log(f"퇴근 처리가 완료되었습니다. 시간: {checkout_time_str}, 사유: -")
-    return True
+    return {'date': today_str, 'employee_id': emp_id, 'checkout_time': checkout_time_str, 'reason': '-'}
 
 def get_sheet_name_from_date(date_obj):
     """Returns the sheet name for a given date in YYYY_WW format."""
@@ -288,158 +566,744 @@ def get_sheet_name_from_date_str(date_str):
     except ValueError:
         return None
 
-def get_all_employee_records(spreadsheet, employee_id):
-    """Retrieves all attendance records for a specific employee across all weekly sheets."""
+# Weekly sheet provisioning
+WEEKLY_SHEET_HEADERS = ['date', 'name', 'location', 'checkin_time', 'checkout_time', 'employee_id', 'reason', 'record_id']
+WEEKLY_SHEET_ROWS = 1000 # Initial grid size; append_rows grows it as needed
+
+def provision_weekly_sheet(spreadsheet, sheet_name, exists=None):
+    """Makes sure a weekly sheet exists and has the header row. Returns its SheetInfo, or None on failure."""
+    try:
+        if exists is None:
+            exists = sheet_name in list_weekly_sheets(spreadsheet, refresh=True)
+        headers = None
+        if not exists:
+            try:
+                sheet = spreadsheet.add_worksheet(sheet_name, rows=WEEKLY_SHEET_ROWS, cols=len(WEEKLY_SHEET_HEADERS))
+                headers = []
+                log(f"주차 시트를 생성했습니다 ({sheet_name})")
+            except gspread.exceptions.APIError:
+                # Created meanwhile by hand or by another worker
+                sheet = spreadsheet.worksheet(sheet_name)
+        else:
+            sheet = spreadsheet.worksheet(sheet_name)
+        if headers is None:
+            headers = sheet.row_values(1)
+        if not headers:
+            sheet.update(values=[WEEKLY_SHEET_HEADERS], range_name='A1', value_input_option='RAW')
+            headers = list(WEEKLY_SHEET_HEADERS)
+    except Exception as e:
+        report_error(e)
+        log(f"주차 시트 준비 실패 ({sheet_name}): {e}")
+        return None
+
+    invalidate_sheet(sheet_name)
+    info = SheetInfo.build(spreadsheet, sheet, headers)
+    worksheet_cache.put(info)
+    return info
+
+def get_week_sheet_info(spreadsheet, sheet_name):
+    """get_sheet_info() for writes: the current week's sheet is created if it does not exist yet,
+    and a sheet from before record ids gets a record_id column."""
+    if sheet_name == get_current_week_sheet_name() and not worksheet_cache.get(spreadsheet, sheet_name) \
+            and sheet_name not in list_weekly_sheets(spreadsheet):
+        return provision_weekly_sheet(spreadsheet, sheet_name, exists=False)
+    info = get_sheet_info(spreadsheet, sheet_name)
+    if info and not info.has_columns('record_id'):
+        info = add_record_id_column(info)
+    return info
+
+def add_record_id_column(info):
+    """Adds the record_id header after the last column. Returns the updated SheetInfo (unchanged on failure)."""
+    try:
+        sheet = info.worksheet
+        if sheet.col_count <= len(info.headers):
+            sheet.add_cols(1)
+        sheet.update(values=[['record_id']], range_name=cell_address(1, len(info.headers)), value_input_option='RAW')
+    except Exception as e:
+        report_error(e)
+        log(f"record_id 열 추가 실패 ({info.title}): {e}")
+        return info
+    log(f"'{info.title}' 시트에 record_id 열을 추가했습니다.")
+    info = SheetInfo.build(info.spreadsheet, info.worksheet, info.headers + ['record_id'])
+    worksheet_cache.put(info)
+    row_index_cache.invalidate(info.title)
+    publish_event('sheet_invalidated', title=info.title)
+    return info
+
+def warm_week(spreadsheet, sheet_name):
+    """Loads a weekly sheet's handle, headers and row index so its first request needs no extra reads."""
+    info = get_sheet_info(spreadsheet, sheet_name)
+    if not info:
+        return False
+    info, index = get_row_index(info)
+    return index is not None
+
+# History reads
+HISTORY_DEFAULT_WEEKS = 3 # Weeks returned when no date range is given
+BATCH_GET_MAX_RANGES = 13 # Weekly sheets per values.batchGet call (a quarter)
+BATCH_GET_WORKERS = 4 # batchGet calls run in parallel
+
+WEEKLY_SHEET_PATTERN = re.compile(r'^\d{4}_\d{2}$')
+
+def is_weekly_sheet(title):
+    """True for weekly sheet titles (format YYYY_WW)."""
+    return bool(WEEKLY_SHEET_PATTERN.match(title))
+
+def parse_date(date_str):
+    """Parses YYYY-MM-DD into a date, or returns None."""
+    try:
+        return datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+def week_sheet_names(date_from, date_to):
+    """Returns the YYYY_WW sheet names covering date_from..date_to (inclusive), oldest first."""
+    names = []
+    day = date_from - datetime.timedelta(days=date_from.weekday())
+    while day <= date_to:
+        names.append(get_sheet_name_from_date(day))
+        day += datetime.timedelta(days=7)
+    return names
+
+def list_sheet_titles(spreadsheet, refresh=False):
+    """Returns the titles of every worksheet (one metadata call per cache TTL)."""
+    titles = None if refresh else worksheet_cache.get_titles(spreadsheet)
+    if titles is None:
+        titles = [ws.title for ws in spreadsheet.worksheets()]
+        worksheet_cache.put_titles(spreadsheet, titles)
+    return titles
+
+def list_weekly_sheets(spreadsheet, refresh=False):
+    """Returns the titles of existing weekly sheets, newest first."""
+    return sorted((t for t in list_sheet_titles(spreadsheet, refresh) if is_weekly_sheet(t)), reverse=True)
+
+def check_revision(spreadsheet):
+    """Current snapshot revision marker (see snapshot_cache), or None if it could not be checked."""
+    try:
+        return snapshot_cache.check_revision(spreadsheet)
+    except Exception as e:
+        report_error(e)
+        log(f"스프레드시트 수정 시각 확인 실패: {e}")
+        return None
+
+def batch_get_sheets(spreadsheet, titles, use_cache=True):
+    """Returns {title: rows} for the given sheets.
+
+    Closed weeks come from the snapshot cache when it holds them under the
+    spreadsheet's current revision; the rest are read with fetch_sheets() and
+    the closed ones among them are cached. use_cache=False always reads Google.
+    """
+    results = {}
+    tokens = {}
+    if use_cache:
+        current = get_current_week_sheet_name()
+        closed = [t for t in titles if is_weekly_sheet(t) and t < current]
+        if closed and check_revision(spreadsheet) is None:
+            # Without a revision we can't trust the snapshots; read everything
+            closed = []
+        for title in closed:
+            rows = snapshot_cache.get(title)
+            if rows is not None:
+                results[title] = rows
+            else:
+                tokens[title] = snapshot_cache.token(title)
+
+    fetched = fetch_sheets(spreadsheet, [t for t in titles if t not in results])
+    for title, rows in fetched.items():
+        if title in tokens:
+            snapshot_cache.put(title, rows, tokens[title])
+    results.update(fetched)
+    return results
+
+def fetch_sheets(spreadsheet, titles):
+    """Reads whole sheets with values.batchGet, BATCH_GET_MAX_RANGES per call, calls in parallel.
+
+    Returns {title: rows}. If any chunk fails (after the governor's retries) the
+    error is raised rather than returning a partial result.
+    """
+    chunks = [titles[i:i + BATCH_GET_MAX_RANGES] for i in range(0, len(titles), BATCH_GET_MAX_RANGES)]
+
+    def fetch(chunk):
+        response = spreadsheet.values_batch_get([gspread.utils.absolute_range_name(t) for t in chunk])
+        return {title: value_range.get('values', [])
+                for title, value_range in zip(chunk, response.get('valueRanges', []))}
+
+    results = {}
+    if len(chunks) <= 1:
+        fetched = [fetch(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(BATCH_GET_WORKERS, len(chunks))) as pool:
+            futures = [pool.submit(fetch, chunk) for chunk in chunks]
+            fetched = []
+            for chunk, future in zip(chunks, futures):
+                try:
+                    fetched.append(future.result())
+                except Exception as e:
+                    log(f"시트 읽기 실패 ({chunk[0]}~{chunk[-1]}): {e}")
+                    raise
+    for part in fetched:
+        results.update(part)
+    for title, rows in results.items():
+        count_rows('read', title, len(rows))
+    return results
+
+def iter_employee_rows(rows, emp_id_str, date_from=None, date_to=None):
+    """Yields record dicts for one employee (every employee if emp_id_str is None) from a sheet's raw rows (header first)."""
+    if not rows:
+        return
+    headers = rows[0]
+    if 'employee_id' not in headers:
+        return
+    id_idx = headers.index('employee_id')
+    date_idx = headers.index('date') if 'date' in headers else None
+    width = len(headers)
+    from_str = date_from.strftime("%Y-%m-%d") if date_from else None
+    to_str = date_to.strftime("%Y-%m-%d") if date_to else None
+
+    for row in rows[1:]:
+        if emp_id_str is not None and (len(row) <= id_idx or row[id_idx] != emp_id_str):
+            continue
+        if is_blank_row(row):
+            continue
+        if date_idx is not None and (from_str or to_str):
+            day = row[date_idx] if len(row) > date_idx else ''
+            if (from_str and day < from_str) or (to_str and day > to_str):
+                continue
+        yield dict(zip(headers, row + [''] * (width - len(row))))
+
+# Yearly archive tabs (see week_archive)
+archive_cache = ArchiveCache()
+
+def list_archive_sheets(spreadsheet, refresh=False):
+    """Returns the titles of the archive_YYYY tabs."""
+    return sorted(t for t in list_sheet_titles(spreadsheet, refresh) if is_archive_sheet(t))
+
+def load_archive(spreadsheet, title, use_cache=True):
+    """Returns the ArchiveTab of an archive sheet, read whole and kept in the snapshot cache like a closed week."""
+    rows = token = None
+    if use_cache and check_revision(spreadsheet) is not None:
+        rows = snapshot_cache.get(title)
+        if rows is None:
+            token = snapshot_cache.token(title)
+    if rows is None:
+        rows = fetch_sheets(spreadsheet, [title]).get(title) or []
+        if token is not None:
+            snapshot_cache.put(title, rows, token)
+    return archive_cache.get(title, rows, WEEKLY_SHEET_HEADERS)
+
+def archived_weeks(spreadsheet, weeks, use_cache=True):
+    """Returns {week: rows in weekly-sheet layout (header first)} for those of weeks held in an archive tab
+    rather than a weekly sheet."""
+    live = set(list_weekly_sheets(spreadsheet))
+    candidates = [week for week in weeks if week not in live]
+    archives = set(list_archive_sheets(spreadsheet)) if candidates else set()
+    results = {}
+    for title, year_weeks in itertools.groupby(sorted(candidates), key=archive_title):
+        if title not in archives:
+            continue
+        tab = load_archive(spreadsheet, title, use_cache)
+        for week in year_weeks:
+            rows = tab.week_rows(week)
+            if rows:
+                results[week] = rows
+    return results
+
+def archived_employee_records(spreadsheet, emp_id_str, date_from, date_to, live):
+    """One employee's records between date_from and date_to from the archive tabs, skipping weeks in live.
+
+    Newest week first, like get_all_employee_records().
+    """
+    weeks = {week for week in week_sheet_names(date_from, date_to) if week not in live}
+    archives = set(list_archive_sheets(spreadsheet)) if weeks else set()
+    records = []
+    for title in sorted({archive_title(week) for week in weeks} & archives, reverse=True):
+        records.extend(load_archive(spreadsheet, title).employee_records(
+            emp_id_str, weeks, date_from.strftime("%Y-%m-%d"), date_to.strftime("%Y-%m-%d")))
+    return records
+
+def archive_old_weeks(spreadsheet, keep_weeks=ARCHIVE_KEEP_WEEKS):
+    """Moves the weekly sheets older than keep_weeks weeks into their year's archive tab, then deletes them.
+
+    A year's weekly sheets are deleted only after its archive tab is written, and
+    re-running is safe (weeks already in the archive are replaced). Blank rows
+    left by deletes are dropped on the way. Returns {'weeks': titles archived,
+    'records': count}, or None on failure.
+    """
+    cutoff = get_sheet_name_from_date(datetime.date.today() - datetime.timedelta(weeks=keep_weeks))
+    archived = []
+    records = 0
+    try:
+        worksheets = {ws.title: ws for ws in spreadsheet.worksheets()}
+        weeks = sorted(t for t in worksheets if is_weekly_sheet(t) and t < cutoff)
+        for title, year_weeks in itertools.groupby(weeks, key=archive_title):
+            year_weeks = list(year_weeks)
+            sheet_rows = fetch_sheets(spreadsheet, year_weeks)
+            new_weeks = {week: list(iter_employee_rows(sheet_rows.get(week), None)) for week in year_weeks}
+            existing = load_archive(spreadsheet, title, use_cache=False) if title in worksheets else None
+            write_archive_sheet(spreadsheet, worksheets.get(title), title, existing,
+                                archive_values(existing, new_weeks, WEEKLY_SHEET_HEADERS))
+            spreadsheet.batch_update({'requests': [
+                {'deleteSheet': {'sheetId': worksheets[week].id}} for week in year_weeks]})
+            archived += year_weeks
+            records += sum(len(week_records) for week_records in new_weeks.values())
+            log(f"{year_weeks[0]}~{year_weeks[-1]} 주차 시트 {len(year_weeks)}개를 '{title}' 시트로 옮겼습니다.")
+    except Exception as e:
+        report_error(e)
+        log(f"주차 시트 보관 실패: {e}")
+        return None
+    finally:
+        for title in {archive_title(week) for week in archived}:
+            archive_cache.invalidate(title)
+            invalidate_sheet(title)
+        for week in archived:
+            invalidate_sheet(week)
+            tombstoned_weeks.discard(week)
+            if local_store:
+                local_store.drop_sheet(week)
+        worksheet_cache.invalidate()
+    return {'weeks': archived, 'records': records}
+
+def write_archive_sheet(spreadsheet, worksheet, title, existing, values):
+    """Writes values over an archive tab (created when worksheet is None), sized to fit.
+
+    The grid only shrinks after the new values are written, so a failed write
+    never cuts off archived rows.
+    """
+    old_rows = len(existing.records) + 1 if existing else 0
+    if worksheet is None:
+        worksheet = spreadsheet.add_worksheet(title=title, rows=len(values), cols=len(values[0]))
+    elif len(values) >= old_rows:
+        worksheet.resize(rows=len(values), cols=len(values[0]))
+    worksheet.update(values=values, range_name='A1', value_input_option='RAW')
+    count_rows('update', title, len(values))
+    if len(values) < old_rows:
+        worksheet.resize(rows=len(values))
+
+def get_all_employee_records(spreadsheet, employee_id, date_from=None, date_to=None):
+    """Retrieves attendance records for a specific employee across the weekly sheets.
+
+    With date_from/date_to (dates) every week in the range is read; otherwise the
+    newest HISTORY_DEFAULT_WEEKS weeks. Records come back newest week first.
+    Returns None if the sheets could not be read.
+    """
     records = []
     emp_id_str = str(employee_id)
     
     try:
-        # Get all worksheets
-        worksheets = spreadsheet.worksheets()
-        
-        # Filter for weekly sheets (format YYYY_WW)
-        weekly_sheets = [ws for ws in worksheets if len(ws.title) == 7 and '_' in ws.title]
-        
-        # Sort sheets to show recent data (reverse chronological)
-        weekly_sheets.sort(key=lambda x: x.title, reverse=True)
-        
-        # Limit to recent 3 weeks to avoid API quota limits
-        weekly_sheets = weekly_sheets[:3]
+        # Served from the local mirror when it has synced, without any Google call
+        weekly_sheets = local_store.synced_sheets() if local_store else []
+        use_store = bool(weekly_sheets)
+        if not use_store:
+            weekly_sheets = list_weekly_sheets(spreadsheet)
 
-        for sheet in weekly_sheets:
-            try:
-                rows = sheet.get_all_records()
-                for row in rows:
-                    if str(row.get('employee_id')) == emp_id_str:
-                        records.append(row)
-            except Exception as e:
-                # Skipping sheet silently or logging
-                continue
+        if date_from or date_to:
+            date_to = date_to or datetime.date.today()
+            date_from = date_from or date_to - datetime.timedelta(weeks=HISTORY_DEFAULT_WEEKS)
+            wanted = set(week_sheet_names(date_from, date_to))
+            weekly_sheets = [t for t in weekly_sheets if t in wanted]
+        else:
+            weekly_sheets = weekly_sheets[:HISTORY_DEFAULT_WEEKS]
+
+        if use_store:
+            records = local_store.employee_records(emp_id_str, weekly_sheets, date_from, date_to)
+        else:
+            sheet_rows = batch_get_sheets(spreadsheet, weekly_sheets)
+            for title in weekly_sheets:
+                records.extend(iter_employee_rows(sheet_rows.get(title), emp_id_str, date_from, date_to))
+
+        # Weeks in range that are no longer weekly sheets come from the yearly archive tabs
+        if date_from:
+            records.extend(archived_employee_records(spreadsheet, emp_id_str, date_from, date_to, set(weekly_sheets)))
                 
     except Exception as e:
+        report_error(e)
         log(f"Error retrieving all records: {e}")
+        return None
         
     return records
 
-def delete_record(spreadsheet, employee_id, date_str):
-    """Deletes a record for the employee on a specific date."""
+def delete_record(spreadsheet, employee_id, date_str, record_id=None):
+    """Deletes a record for the employee on a specific date (and record_id, if given).
+
+    The row is turned into a tombstone rather than removed, so no other row
+    moves; tombstones of closed weeks are removed later by compact_week().
+    """
     sheet_name = get_sheet_name_from_date_str(date_str)
     if not sheet_name:
         log("잘못된 날짜 형식입니다. (YYYY-MM-DD)")
         return False
 
-    sheet = get_worksheet(spreadsheet, sheet_name)
-    if not sheet:
+    info = get_sheet_info(spreadsheet, sheet_name)
+    if not info:
         log(f"해당 날짜({date_str})가 포함된 주차의 기록이 없습니다.")
         return False
         
     emp_id_str = str(employee_id)
+    if not info.has_columns('record_id'):
+        info = add_record_id_column(info) # Where the tombstone keeps its marker
     
     try:
-        rows = sheet.get_all_values()
-        if not rows:
-            log("시트가 비어있습니다.")
-            return False
+        with record_locks.hold(sheet_name, [(date_str, emp_id_str)]):
+            # Find row to delete
+            info, target_row_idx = find_record_row(info, date_str, emp_id_str, record_id)
             
-        headers = rows[0]
-        try:
-            date_idx = headers.index('date')
-            id_idx = headers.index('employee_id')
-        except ValueError:
-            log("필수 컬럼이 누락되었습니다.")
-            return False
-            
-        target_row_idx = -1
-        # Find row to delete
-        for i, row in enumerate(rows[1:], start=2):
-             if len(row) <= max(date_idx, id_idx): continue
-             
-             if row[date_idx] == date_str and str(row[id_idx]) == emp_id_str:
-                 target_row_idx = i
-                 break
-        
-        if target_row_idx != -1:
-            sheet.delete_rows(target_row_idx)
-            log(f"{date_str} 기록이 삭제되었습니다.")
-            return True
-        else:
-            log(f"{date_str}에 해당 직원의 기록을 찾을 수 없습니다.")
-            return False
+            if target_row_idx != -1:
+                # Tombstone: one batch_update blanking every cell of the row but the marker
+                index = row_index_cache.get(sheet_name)
+                write_cells(info, tombstone_cells(info, target_row_idx, index.record_at(target_row_idx) if index else None))
+                index = row_index_cache.get(sheet_name)
+                if index:
+                    index.record_clear(target_row_idx, (date_str, emp_id_str))
+                tombstoned_weeks.add(sheet_name)
+                publish_event('row_cleared', title=sheet_name, row=target_row_idx, key=(date_str, emp_id_str))
+                log(f"{date_str} 기록이 삭제되었습니다.")
+                return True
+            else:
+                log(f"{date_str}에 해당 직원의 기록을 찾을 수 없습니다.")
+                return False
             
     except Exception as e:
+        invalidate_sheet(sheet_name)
+        report_error(e)
         log(f"삭제 중 오류 발생: {e}")
         return False
 
-def update_record(spreadsheet, employee_id, date_str, checkin=None, checkout=None):
-    """Updates an attendance record for the employee on a specific date."""
+def tombstone_cells(info, row_idx, record_id=None):
+    """Cells that blank a row except for a TOMBSTONE_PREFIX marker, which keeps the row inside the table."""
+    marker_idx = info.columns.get('record_id', info.columns.get('reason', 0))
+    return [(row_idx, col_idx, f"{TOMBSTONE_PREFIX}{record_id or ''}" if col_idx == marker_idx else '')
+            for col_idx in range(len(info.headers))]
+
+# Weeks with rows tombstoned by delete_record() in this process
+tombstoned_weeks = set()
+
+def compact_week(spreadsheet, sheet_name):
+    """Removes the blank rows and tombstones of a weekly sheet. Returns the number removed, or None on failure.
+
+    The rows below each removed one move up, so the week's row index is rebuilt
+    afterwards; meant for closed weeks, which no longer take check-ins. Every
+    record lock is held meanwhile, so an update or delete of a past record
+    cannot write to a row number that moved.
+    """
+    with record_locks.hold_sheet(sheet_name):
+        return compact_locked_week(spreadsheet, sheet_name)
+
+def compact_locked_week(spreadsheet, sheet_name):
+    # compact_week() once every record lock is held
+    info = get_sheet_info(spreadsheet, sheet_name)
+    if not info:
+        return None
+    try:
+        rows = info.worksheet.get_all_values()
+        count_rows('read', sheet_name, len(rows))
+        blank = [i for i, row in enumerate(rows[1:], start=2) if is_blank_row(row)]
+        runs = []
+        for row in blank:
+            if runs and runs[-1][1] == row - 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+        # Bottom-up, so the row numbers of the runs above stay valid
+        for start, end in reversed(runs):
+            info.worksheet.delete_rows(start, end)
+            if local_store:
+                for row in range(end, start - 1, -1):
+                    local_store.record_delete(sheet_name, row)
+    except Exception as e:
+        report_error(e)
+        log(f"빈 행 정리 실패 ({sheet_name}): {e}")
+        return None
+    finally:
+        invalidate_sheet(sheet_name)
+    tombstoned_weeks.discard(sheet_name)
+    if blank:
+        log(f"'{sheet_name}' 시트의 빈 행 {len(blank)}개를 정리했습니다.")
+    return len(blank)
+
+def compact_closed_weeks(spreadsheet):
+    """compact_week() for each closed week this process left blank rows in. Returns the rows removed."""
+    current = get_current_week_sheet_name()
+    removed = 0
+    for sheet_name in sorted(tombstoned_weeks):
+        if sheet_name < current:
+            removed += compact_week(spreadsheet, sheet_name) or 0
+    return removed
+
+def update_record(spreadsheet, employee_id, date_str, checkin=None, checkout=None, record_id=None):
+    """Updates an attendance record for the employee on a specific date (and record_id, if given).
+
+    Returns the changed fields with date and employee_id, or False on failure.
+    """
     sheet_name = get_sheet_name_from_date_str(date_str)
     if not sheet_name:
         log("잘못된 날짜 형식입니다. (YYYY-MM-DD)")
         return False
 
-    sheet = get_worksheet(spreadsheet, sheet_name)
-    if not sheet:
+    info = get_sheet_info(spreadsheet, sheet_name)
+    if not info:
         # log(f"해당 날짜({date_str})가 포함된 주차의 기록이 없습니다.")
         # Updating might fail if the sheet doesn't exist, which implies no record.
         return False
         
+    sheet = info.worksheet
     emp_id_str = str(employee_id)
     
     try:
-        rows = sheet.get_all_values()
-        if not rows:
-            return False
-            
-        headers = rows[0]
-        try:
-            date_idx = headers.index('date')
-            id_idx = headers.index('employee_id')
-            checkin_idx = headers.index('checkin_time')
-            checkout_idx = headers.index('checkout_time')
-        except ValueError:
-            log("필수 컬럼이 누락되었습니다.")
-            return False
-            
-        target_row_idx = -1
-        for i, row in enumerate(rows[1:], start=2):
-             if len(row) <= max(date_idx, id_idx): continue
-             
-             if row[date_idx] == date_str and str(row[id_idx]) == emp_id_str:
-                 target_row_idx = i
-                 break
+        with record_locks.hold(sheet_name, [(date_str, emp_id_str)]):
+            info, target_row_idx = find_record_row(info, date_str, emp_id_str, record_id)
+            if not info.has_columns('date', 'employee_id', 'checkin_time', 'checkout_time'):
+                log("필수 컬럼이 누락되었습니다.")
+                return False
+            checkin_idx = info.columns['checkin_time']
+            checkout_idx = info.columns['checkout_time']
         
-        if target_row_idx == -1:
-            log(f"{date_str}에 해당 직원의 기록을 찾을 수 없습니다.")
-            return False
+            if target_row_idx == -1:
+                log(f"{date_str}에 해당 직원의 기록을 찾을 수 없습니다.")
+                return False
+
+            # Collect the changed cells and send them in one request
+            cells = []
+            changed = {'date': date_str, 'employee_id': emp_id_str}
+            if checkin is not None:
+                cells.append((target_row_idx, checkin_idx, checkin))
+                changed['checkin_time'] = checkin
+
+            if checkout is not None:
+                cells.append((target_row_idx, checkout_idx, checkout))
+                changed['checkout_time'] = checkout
+            
+                # Reset reason to '-' when checkout is updated
+                # (reason column might not exist, ignore)
+                if info.has_columns('reason'):
+                    cells.append((target_row_idx, info.columns['reason'], "-"))
+                    changed['reason'] = "-"
 
-        # Helper to get cell address
-        def get_cell_address(row_idx, col_idx):
-            return f"{chr(64 + col_idx + 1)}{row_idx}"
+            write_cells(info, cells)
 
         if checkin is not None:
-            cell = get_cell_address(target_row_idx, checkin_idx)
-            sheet.update(cell, [[checkin]], value_input_option='USER_ENTERED')
             log(f"출근 시간이 '{checkin}'(으)로 수정되었습니다.")
-
         if checkout is not None:
-            cell = get_cell_address(target_row_idx, checkout_idx)
-            sheet.update(cell, [[checkout]], value_input_option='USER_ENTERED')
             log(f"퇴근 시간이 '{checkout}'(으)로 수정되었습니다.")
             
-            # Reset reason to '-' when checkout is updated
-            try:
-                reason_idx = headers.index('reason')
-                reason_cell = get_cell_address(target_row_idx, reason_idx)
-                sheet.update(reason_cell, [["-"]], value_input_option='USER_ENTERED')
-            except ValueError:
-                pass # reason column might not exist, ignore
-            
-        return True
+        return changed
 
     except Exception as e:
+        invalidate_sheet(sheet_name)
+        report_error(e)
         log(f"수정 중 오류 발생: {e}")
         return False
 
+def record_key(record):
+    """(date, employee_id) identifying a record in its weekly sheet."""
+    return record.get('date', ''), str(record.get('employee_id', ''))
+
+def apply_week_batch(spreadsheet, sheet_name, appends=(), updates=(), upserts=()):
+    """Applies many writes to one weekly sheet: at most one append_rows and one batch_update.
+
+    appends: record dicts to add. Records whose (date, employee_id) already exist
+    (in the sheet or earlier in the batch) are skipped, so replaying a batch does
+    not duplicate rows.
+    updates: [(date_str, employee_id, {column: value}), ...] for existing records.
+    upserts: record dicts written over the existing record, or appended if there is none.
+    Returns {'created': [...], 'existing': [...], 'updated': [...], 'missing': [...]} of
+    (date_str, employee_id) keys. API errors are raised so the caller can retry.
+    """
+    appends, upserts = list(appends), list(upserts)
+    info = get_week_sheet_info(spreadsheet, sheet_name) if (appends or upserts) else get_sheet_info(spreadsheet, sheet_name)
+    if not info:
+        raise LookupError(f"이번 주차 시트 없음 ({sheet_name})")
+
+    # New keys are checked against the index and appended under their record locks (see check_in);
+    # updated keys are held too, so compaction cannot move their rows before the write
+    updates = list(updates)
+    keys = [record_key(r) for r in appends + upserts] + [(date_str, str(employee_id)) for date_str, employee_id, _ in updates]
+    with record_locks.hold(sheet_name, keys):
+        return apply_locked_week_batch(info, sheet_name, appends, updates, upserts)
+
+def apply_locked_week_batch(info, sheet_name, appends, updates, upserts):
+    # apply_week_batch() once the record locks are held
+    try:
+        info, index = get_row_index(info)
+        if index is None:
+            raise LookupError(f"'{sheet_name}' 시트의 행 색인을 만들 수 없습니다.")
+
+        result = {'created': [], 'existing': [], 'updated': [], 'missing': []}
+        updates = list(updates)
+        new_records = []
+        new_keys = set()
+        for record in appends:
+            key = record_key(record)
+            if key in new_keys or index.find(*key) != -1:
+                result['existing'].append(key)
+                continue
+            new_keys.add(key)
+            new_records.append(record)
+        for record in upserts:
+            key = record_key(record)
+            if key in new_keys or index.find(*key) != -1:
+                values = {k: v for k, v in record.items() if k not in ('date', 'employee_id') and v is not None}
+                updates.append((key[0], key[1], values))
+                continue
+            new_keys.add(key)
+            new_records.append({'record_id': new_record_id(), **{k: ('' if v is None else v) for k, v in record.items()}})
+
+        if new_records:
+            append_records(info, new_records)
+            result['created'] = [record_key(r) for r in new_records]
+            index = row_index_cache.get(sheet_name) or get_row_index(info)[1]
+
+        cells = []
+        for date_str, employee_id, values in updates:
+            row_idx = index.find(date_str, employee_id)
+            if row_idx == -1:
+                result['missing'].append((date_str, str(employee_id)))
+                continue
+            result['updated'].append((date_str, str(employee_id)))
+            for column, value in values.items():
+                if info.has_columns(column):
+                    cells.append((row_idx, info.columns[column], value))
+        write_cells(info, cells)
+        return result
+    except Exception as e:
+        invalidate_sheet(sheet_name)
+        report_error(e)
+        raise
+
+def write_week_batch(spreadsheet, sheet_name, appends=(), updates=()):
+    """apply_week_batch() for the write-behind queue.
+
+    Returns (existing, missing): the keys of appends skipped because the record
+    already existed, and of updates whose record was not found.
+    """
+    result = apply_week_batch(spreadsheet, sheet_name, appends, updates)
+    return result['existing'], result['missing']
+
+# Bulk operations (kiosk, batch imports)
+def run_bulk(spreadsheet, items, apply_batch=None):
+    """Groups prepared bulk items by weekly sheet and writes each group with apply_week_batch().
+
+    items: dicts with 'index', 'sheet', 'key', 'op' ('append', 'update' or 'upsert')
+    and 'record' (a record dict, or the {column: value} changes for 'update').
+    apply_batch(sheet_name, appends, updates, upserts) replaces apply_week_batch for
+    other storage backends. Returns {index: (status, message)}.
+    """
+    if apply_batch is None:
+        apply_batch = lambda *args: apply_week_batch(spreadsheet, *args)
+    groups = {}
+    for item in items:
+        groups.setdefault(item['sheet'], []).append(item)
+
+    results = {}
+    for sheet_name, group in groups.items():
+        appends = [item['record'] for item in group if item['op'] == 'append']
+        updates = [(*item['key'], item['record']) for item in group if item['op'] == 'update']
+        upserts = [item['record'] for item in group if item['op'] == 'upsert']
+        try:
+            outcome = apply_batch(sheet_name, appends, updates, upserts)
+        except Exception as e:
+            log(f"일괄 기록 실패 ({sheet_name}): {e}")
+            for item in group:
+                results[item['index']] = ('error', str(e))
+            continue
+
+        # A key appended by this batch belongs to the first item that asked for it
+        created = set(outcome['created'])
+        missing = set(outcome['missing'])
+        for item in group:
+            key = item['key']
+            if item['op'] == 'update':
+                results[item['index']] = ('not_found', "출근 기록이 없습니다.") if key in missing else ('updated', None)
+            elif key in created:
+                created.discard(key)
+                results[item['index']] = ('created', None)
+            elif item['op'] == 'upsert':
+                results[item['index']] = ('updated', None)
+            else:
+                results[item['index']] = ('exists', "이미 출근 기록이 있습니다.")
+    return results
+
+def bulk_results(entries, prepared, errors, results):
+    """Per-entry result dicts in input order, plus a log line with the totals."""
+    output = []
+    for index in range(len(entries)):
+        if index in errors:
+            status, message = 'error', errors[index]
+        else:
+            status, message = results.get(index, ('error', "처리되지 않았습니다."))
+        item = prepared.get(index, {})
+        output.append({
+            'index': index,
+            'status': status,
+            'date': item.get('key', ('', ''))[0] or None,
+            'employee_id': item.get('key', ('', ''))[1] or None,
+            'message': message,
+        })
+    counts = {}
+    for entry in output:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    log(f"일괄 처리 결과: {', '.join(f'{k} {v}건' for k, v in counts.items())}")
+    return output
+
+def prepare_bulk(entries, build):
+    """Resolves each entry's date and weekly sheet; build(entry, date_str) returns (op, record)."""
+    prepared, errors = {}, {}
+    for index, entry in enumerate(entries):
+        resolved = resolve_date(entry.get('date'))
+        if not resolved:
+            errors[index] = "잘못된 날짜 형식입니다. (YYYY-MM-DD)"
+            continue
+        date_str, sheet_name = resolved
+        op, record = build(entry, date_str)
+        prepared[index] = {
+            'index': index,
+            'sheet': sheet_name,
+            'key': (date_str, str(entry.get('id') or entry.get('employee_id', ''))),
+            'op': op,
+            'record': record,
+        }
+    return prepared, errors
+
+def bulk_check_in(spreadsheet, entries, apply_batch=None):
+    """Checks in many employees. entries: dicts with id, name, location and optional time/date.
+
+    Returns one {'index', 'status', 'date', 'employee_id', 'message'} per entry;
+    status is 'created', 'exists' or 'error'.
+    """
+    def build(entry, date_str):
+        return 'append', build_checkin_record(entry, date_str, make_checkin_time(entry.get('time')))
+
+    prepared, errors = prepare_bulk(entries, build)
+    results = run_bulk(spreadsheet, prepared.values(), apply_batch)
+    return bulk_results(entries, prepared, errors, results)
+
+def bulk_check_out(spreadsheet, entries, apply_batch=None):
+    """Checks out many employees. entries: dicts with id and optional time/date.
+
+    status is 'updated', 'not_found' or 'error'.
+    """
+    def build(entry, date_str):
+        return 'update', {'checkout_time': make_checkout_time(entry.get('time')), 'reason': '-'}
+
+    prepared, errors = prepare_bulk(entries, build)
+    results = run_bulk(spreadsheet, prepared.values(), apply_batch)
+    return bulk_results(entries, prepared, errors, results)
+
+def bulk_upsert_records(spreadsheet, entries, apply_batch=None):
+    """Writes full records (reconciliation imports): existing (date, employee_id) rows are
+    updated with the given fields, the rest are appended.
+
+    entries: dicts with employee_id, date and any of name, location, checkin_time,
+    checkout_time, reason. status is 'created', 'updated' or 'error'.
+    """
+    def build(entry, date_str):
+        record = {k: entry.get(k) for k in ('name', 'location', 'checkin_time', 'checkout_time', 'reason')}
+        record.update({'date': date_str, 'employee_id': str(entry.get('employee_id'))})
+        return 'upsert', record
+
+    prepared, errors = prepare_bulk(entries, build)
+    results = run_bulk(spreadsheet, prepared.values(), apply_batch)
+    return bulk_results(entries, prepared, errors, results)
+
 if __name__ == "__main__":
     spreadsheet = connect_to_spreadsheet()
     
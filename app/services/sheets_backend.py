@@ -0,0 +1,73 @@
+"""The storage backend sheet_service runs on, and how to pick one.
+
+sheet_service never imports gspread's Spreadsheet or Worksheet types; it
+calls methods on whatever object SpreadsheetPool's connect() returned. The
+protocols below spell out exactly which calls those are, so an alternative
+backend (like the in-memory fake) knows what to implement.
+
+KADA_BACKEND selects the backend for the web app:
+- google (default): the real spreadsheet through gspread
+- fake: an in-memory FakeSpreadsheet filled with demo data, for running the
+  app and the benchmarks offline. KADA_FAKE_EMPLOYEES, KADA_FAKE_LATENCY
+  (seconds per call) and KADA_FAKE_QUOTA (calls per minute per lane) tune it.
+  Its calls go through the request governor like the real client's.
+"""
+import os
+from typing import Protocol, runtime_checkable
+
+import app.services.sheet_service as sheet_service
+from app.services.fake_sheets import make_demo_spreadsheet
+from app.services.request_governor import governor
+
+
+@runtime_checkable
+class WorksheetBackend(Protocol):
+    title: str
+    id: int
+    col_count: int
+
+    def get_all_values(self, **kwargs): ...
+    def get_all_records(self, **kwargs): ...
+    def row_values(self, row, **kwargs): ...
+    def col_values(self, col, **kwargs): ...
+    def append_row(self, values, value_input_option=None, **kwargs): ...
+    def append_rows(self, values, value_input_option=None, **kwargs): ...
+    def update(self, values=None, range_name=None, value_input_option=None, **kwargs): ...
+    def batch_update(self, data, value_input_option=None, **kwargs): ...
+    def add_cols(self, cols): ...
+    def resize(self, rows=None, cols=None): ...
+    def delete_rows(self, start_index, end_index=None): ...
+
+
+@runtime_checkable
+class SpreadsheetBackend(Protocol):
+    title: str
+    id: str
+
+    def worksheet(self, title): ...
+    def worksheets(self, exclude_hidden=False): ...
+    def add_worksheet(self, title, rows, cols, index=None): ...
+    def batch_update(self, body): ...
+    def values_batch_get(self, ranges, params=None): ...
+    def get_lastUpdateTime(self): ...
+
+
+def fake_connector():
+    """connect() for the fake backend: one shared FakeSpreadsheet, so reconnects keep its data."""
+    quota = os.environ.get('KADA_FAKE_QUOTA')
+    spreadsheet = make_demo_spreadsheet(
+        employees=int(os.environ.get('KADA_FAKE_EMPLOYEES', 50)),
+        latency=float(os.environ.get('KADA_FAKE_LATENCY', 0)),
+        quota_per_minute=int(quota) if quota else None,
+        governor=governor)
+    return lambda: spreadsheet
+
+
+def get_connector(name=None):
+    """connect() function for a backend name (default: KADA_BACKEND, else 'google')."""
+    name = name or os.environ.get('KADA_BACKEND', 'google')
+    if name == 'google':
+        return sheet_service.connect_to_spreadsheet
+    if name == 'fake':
+        return fake_connector()
+    raise ValueError(f"Unknown KADA_BACKEND: {name}")
@@ -0,0 +1,208 @@
+"""Two-tier cache of closed weekly sheets (memory LRU + gzip files on disk).
+
+Past YYYY_WW sheets almost never change, yet every history read, export or
+report used to download them again. A snapshot is the raw values of one
+closed week, stored with the revision marker that was current when it was
+taken; it is served only while that marker is still current.
+
+The Sheets API has no per-sheet revision, only the spreadsheet's Drive
+modifiedTime, which also moves on every check-in we write. So the marker is
+the modifiedTime of the last change we did not make ourselves. After each of
+our writes the modifiedTime it produced is read back (record_own_revision);
+a revision check that finds a value which is neither the last one seen nor
+one of ours means someone edited the spreadsheet directly, and every
+snapshot is retired. Our own writes drop just the week they touched.
+modifiedTime is checked at most once per REVISION_CHECK_INTERVAL.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+REVISION_CHECK_INTERVAL = 60 # seconds between Drive modifiedTime checks
+OWN_REVISIONS = 256 # modifiedTimes of our own writes remembered between checks
+MAX_AGE = 24 * 3600 # seconds; snapshots are re-read at least daily regardless
+MEMORY_MAX_SHEETS = 64
+META_FILE = 'meta.json'
+
+
+class SnapshotCache:
+    """Thread-safe title -> rows cache for closed weeks, with an optional on-disk tier."""
+
+    def __init__(self, directory=None, memory_max=MEMORY_MAX_SHEETS, check_interval=REVISION_CHECK_INTERVAL):
+        self.directory = directory
+        self.memory_max = memory_max
+        self.check_interval = check_interval
+        self._memory = OrderedDict() # title -> (marker, saved_at, rows)
+        self._lock = threading.Lock()
+        self.marker = '' # modifiedTime of the last external change seen
+        self.seen = '' # modifiedTime at the last check
+        self._own_revisions = deque(maxlen=OWN_REVISIONS) # modifiedTimes read right after our writes
+        self._writes = {} # title -> number of our own writes, to spot reads that raced one
+        self._checked_at = 0.0
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stale': 0, 'revision_changes': 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_meta()
+
+    # Revision marker
+    def check_revision(self, spreadsheet, force=False):
+        """Refreshes the marker from Drive's modifiedTime (rate-limited). Returns the current marker."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return self.marker
+        self._checked_at = now
+        modified = spreadsheet.get_lastUpdateTime()
+        with self._lock:
+            if modified != self.seen:
+                # Neither the value we saw last nor one our own writes produced: an outside edit
+                if modified not in self._own_revisions and modified != self.marker:
+                    self.marker = modified
+                    self.stats['revision_changes'] += 1
+                    self._memory.clear()
+                self.seen = modified
+                self._save_meta()
+            self._own_revisions.clear()
+            return self.marker
+
+    def wants_own_revision(self):
+        """True if our writes should read back their modifiedTime (there are snapshots to keep)."""
+        return bool(self.directory) or bool(self._memory)
+
+    def record_own_revision(self, modified):
+        """A modifiedTime read right after one of our writes; the next check does not count it as external."""
+        with self._lock:
+            self._own_revisions.append(modified)
+
+    def record_write(self, title=None):
+        """Called after our own write to a sheet (None = unknown sheet): drops its snapshot."""
+        with self._lock:
+            self._writes[title] = self._writes.get(title, 0) + 1
+            if title is None:
+                self._memory.clear()
+                self.marker = f"local-{time.time()}"
+                self._save_meta()
+            else:
+                self._memory.pop(title, None)
+                self._remove_file(title)
+
+    # Snapshots
+    def get(self, title):
+        """Cached rows of a closed week under the current marker, or None."""
+        with self._lock:
+            entry = self._memory.get(title)
+            if entry is not None:
+                if self._valid(entry):
+                    self._memory.move_to_end(title)
+                    self.stats['memory_hits'] += 1
+                    return entry[2]
+                self._memory.pop(title, None)
+                self.stats['stale'] += 1
+
+            entry = self._read_file(title)
+            if entry is not None and self._valid(entry):
+                self._remember(title, entry)
+                self.stats['disk_hits'] += 1
+                return entry[2]
+            if entry is not None:
+                self.stats['stale'] += 1
+            self.stats['misses'] += 1
+            return None
+
+    def token(self, title):
+        """Taken before reading a sheet; put() only accepts the rows if nothing changed meanwhile."""
+        with self._lock:
+            return self.marker, self._writes.get(title, 0), self._writes.get(None, 0)
+
+    def put(self, title, rows, token):
+        """Stores a closed week's rows, read after token(title) was taken."""
+        with self._lock:
+            if token != (self.marker, self._writes.get(title, 0), self._writes.get(None, 0)):
+                return # The sheet changed while we were reading it
+            entry = (self.marker, time.time(), rows)
+            self._remember(title, entry)
+            self._write_file(title, entry)
+
+    def invalidate(self, title=None):
+        with self._lock:
+            if title is None:
+                for name in list(self._memory):
+                    self._remove_file(name)
+                self._memory.clear()
+            else:
+                self._memory.pop(title, None)
+                self._remove_file(title)
+
+    def snapshot(self):
+        with self._lock:
+            hits = self.stats['memory_hits'] + self.stats['disk_hits']
+            lookups = hits + self.stats['misses']
+            return {
+                'sheets_in_memory': len(self._memory),
+                'hit_ratio': round(hits / lookups, 3) if lookups else None,
+                'marker': self.marker,
+                **self.stats,
+            }
+
+    def _valid(self, entry):
+        marker, saved_at, _ = entry
+        return marker == self.marker and time.time() - saved_at < MAX_AGE
+
+    def _remember(self, title, entry):
+        self._memory[title] = entry
+        self._memory.move_to_end(title)
+        while len(self._memory) > self.memory_max:
+            self._memory.popitem(last=False)
+
+    # Disk tier
+    def _path(self, title):
+        return os.path.join(self.directory, f"{title}.json.gz")
+
+    def _read_file(self, title):
+        if not self.directory:
+            return None
+        try:
+            with gzip.open(self._path(title), 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            return data['marker'], data['saved_at'], data['rows']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_file(self, title, entry):
+        if not self.directory:
+            return
+        marker, saved_at, rows = entry
+        tmp_path = f"{self._path(title)}.{os.getpid()}.tmp" # Workers may share the directory
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump({'title': title, 'marker': marker, 'saved_at': saved_at, 'rows': rows}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(title))
+        except OSError:
+            pass # The disk tier is best effort
+
+    def _remove_file(self, title):
+        if self.directory:
+            try:
+                os.remove(self._path(title))
+            except OSError:
+                pass
+
+    def _load_meta(self):
+        try:
+            with open(os.path.join(self.directory, META_FILE), encoding='utf-8') as f:
+                meta = json.load(f)
+            self.marker = meta.get('marker', '')
+            self.seen = meta.get('seen', '')
+        except (OSError, ValueError):
+            pass
+
+    def _save_meta(self):
+        if not self.directory:
+            return
+        try:
+            with open(os.path.join(self.directory, META_FILE), 'w', encoding='utf-8') as f:
+                json.dump({'marker': self.marker, 'seen': self.seen}, f)
+        except OSError:
+            pass
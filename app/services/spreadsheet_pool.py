@@ -0,0 +1,78 @@
+"""Process-wide holder for the authorized gspread spreadsheet.
+
+connect_to_spreadsheet() re-reads the service-account file, authorizes and
+runs a Drive lookup for SHEET_NAME. The pool does that once and hands the
+same spreadsheet object to every request until an auth or transport error
+is reported, at which point the next get() reconnects.
+"""
+import threading
+
+import gspread
+import requests
+from google.auth.exceptions import GoogleAuthError, TransportError
+from google.auth.transport.requests import Request
+
+import app.services.sheet_service as sheet_service
+
+# API status codes that mean our credentials or session are no longer usable
+RECONNECT_STATUS_CODES = {401, 403}
+
+
+def is_connection_error(error):
+    """Returns True if the error means the client has to be rebuilt."""
+    if isinstance(error, (GoogleAuthError, TransportError, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.code in RECONNECT_STATUS_CODES
+    return False
+
+
+class SpreadsheetPool:
+    """Thread-safe, lazily (re)connecting spreadsheet holder."""
+
+    def __init__(self, connect=None):
+        self._connect = connect or sheet_service.connect_to_spreadsheet
+        self._lock = threading.Lock()
+        self._spreadsheet = None
+        self.connect_count = 0
+
+    def get(self):
+        """Returns the shared spreadsheet, connecting if needed. None on failure."""
+        spreadsheet = self._spreadsheet
+        if spreadsheet is not None and self._refresh_token(spreadsheet):
+            return spreadsheet
+
+        with self._lock:
+            if self._spreadsheet is None:
+                self._spreadsheet = self._connect()
+                if self._spreadsheet is not None:
+                    self.connect_count += 1
+            return self._spreadsheet
+
+    def invalidate(self):
+        """Drops the current spreadsheet so the next get() reconnects."""
+        with self._lock:
+            self._spreadsheet = None
+
+    def report_error(self, error):
+        """Error callback for sheet_service; reconnects on auth/transport errors."""
+        if is_connection_error(error):
+            sheet_service.log(f"연결 오류 감지, 재연결합니다: {error}")
+            self.invalidate()
+
+    def _refresh_token(self, spreadsheet):
+        # AuthorizedSession refreshes on 401 by itself, but refreshing ahead of
+        # expiry keeps that extra round-trip off the request path.
+        creds = getattr(getattr(spreadsheet, 'client', None), 'auth', None)
+        if creds is None or creds.valid:
+            return True
+        with self._lock:
+            if creds.valid:
+                return True
+            try:
+                creds.refresh(Request())
+                return True
+            except Exception as e:
+                sheet_service.log(f"Token refresh failed: {e}")
+                self._spreadsheet = None
+                return False
@@ -0,0 +1,273 @@
+"""Attendance storage in SQLite, for headcounts past the Sheets quota.
+
+One row per (date, employee_id), indexed by employee and by week, so history
+lookups are index range scans instead of downloads of whole weekly sheets, and
+check-out is a single transactional UPDATE instead of a find-then-write pair.
+Reads return the same record dicts and raw week rows as the Sheets backend,
+so reports, exports and the bulk endpoints work unchanged. The schema sticks
+to portable SQL; a PostgreSQL backend would mostly swap the driver and the
+'?' placeholders.
+"""
+import datetime
+import sqlite3
+import threading
+
+import app.services.sheet_service as sheet_service
+from app.services.local_store import EMPLOYEE_FIELDS
+
+RECORD_FIELDS = tuple(sheet_service.WEEKLY_SHEET_HEADERS)
+UPDATABLE_FIELDS = ('name', 'location', 'checkin_time', 'checkout_time', 'reason')
+# A record_id given by the client must match, unless the row has none (migrated legacy rows)
+KEY_CLAUSE = "date = ? AND employee_id = ? AND (? IS NULL OR COALESCE(record_id, '') IN ('', ?))"
+
+
+def key_params(date_str, employee_id, record_id=None):
+    return (date_str, str(employee_id), record_id, record_id)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    location TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS employees_name ON employees (name);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    week TEXT NOT NULL,
+    date TEXT NOT NULL,
+    employee_id TEXT NOT NULL,
+    name TEXT,
+    location TEXT,
+    checkin_time TEXT,
+    checkout_time TEXT,
+    reason TEXT,
+    record_id TEXT,
+    PRIMARY KEY (date, employee_id)
+);
+CREATE INDEX IF NOT EXISTS attendance_employee_date ON attendance (employee_id, date);
+CREATE INDEX IF NOT EXISTS attendance_week ON attendance (week);
+"""
+
+# Applied to databases created before the column existed
+MIGRATIONS = {
+    'record_id': "ALTER TABLE attendance ADD COLUMN record_id TEXT",
+}
+
+
+class SqliteRepository:
+    """AttendanceRepository on one SQLite connection (WAL mode)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(attendance)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(statement)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Employees
+    def find_employee(self, name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, name, location, created_at FROM employees WHERE name = ? ORDER BY rowid LIMIT 1",
+                (name,)).fetchone()
+        return dict(row) if row else None
+
+    def reload_employees(self):
+        """Nothing is cached; returns the employee count."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM employees").fetchone()[0]
+
+    def replace_employees(self, records):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM employees")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO employees (id, name, location, created_at) VALUES (?, ?, ?, ?)",
+                [tuple(str(r.get(f, '')) for f in EMPLOYEE_FIELDS) for r in records])
+
+    # Single records
+    def check_in(self, employee, specific_time=None, specific_date=None):
+        resolved = sheet_service.resolve_date(specific_date)
+        if not resolved:
+            return False
+        date_str, week = resolved
+        checkin_time_str = sheet_service.make_checkin_time(specific_time)
+        record = sheet_service.build_checkin_record(employee, date_str, checkin_time_str)
+        with self._lock, self._conn:
+            inserted = self._insert(week, record)
+        if not inserted:
+            sheet_service.log("이미 출근 기록이 있습니다.")
+            return False
+        sheet_service.sheet_changed(week)
+        sheet_service.log(f"출근 처리가 완료되었습니다. 시간: {checkin_time_str}, 사유: -")
+        return record
+
+    def check_out(self, employee, specific_time=None, specific_date=None):
+        resolved = sheet_service.resolve_date(specific_date)
+        if not resolved:
+            return False
+        date_str, week = resolved
+        values = {'checkout_time': sheet_service.make_checkout_time(specific_time), 'reason': '-'}
+        if not self._update(week, date_str, employee.get('id'), values):
+            sheet_service.log("오늘 날짜의 출근 기록이 없습니다.")
+            return False
+        sheet_service.log(f"퇴근 처리가 완료되었습니다. 시간: {values['checkout_time']}, 사유: -")
+        return {'date': date_str, 'employee_id': str(employee.get('id')), **values}
+
+    def update_record(self, employee_id, date_str, checkin=None, checkout=None, record_id=None):
+        week = sheet_service.get_sheet_name_from_date_str(date_str)
+        if not week:
+            sheet_service.log("잘못된 날짜 형식입니다. (YYYY-MM-DD)")
+            return False
+        values = {}
+        if checkin is not None:
+            values['checkin_time'] = checkin
+        if checkout is not None:
+            values.update({'checkout_time': checkout, 'reason': '-'})
+        if not self._update(week, date_str, employee_id, values, record_id):
+            sheet_service.log(f"{date_str}에 해당 직원의 기록을 찾을 수 없습니다.")
+            return False
+        if checkin is not None:
+            sheet_service.log(f"출근 시간이 '{checkin}'(으)로 수정되었습니다.")
+        if checkout is not None:
+            sheet_service.log(f"퇴근 시간이 '{checkout}'(으)로 수정되었습니다.")
+        return {'date': date_str, 'employee_id': str(employee_id), **values}
+
+    def delete_record(self, employee_id, date_str, record_id=None):
+        week = sheet_service.get_sheet_name_from_date_str(date_str)
+        if not week:
+            sheet_service.log("잘못된 날짜 형식입니다. (YYYY-MM-DD)")
+            return False
+        with self._lock, self._conn:
+            deleted = self._conn.execute(
+                f"DELETE FROM attendance WHERE {KEY_CLAUSE}", key_params(date_str, employee_id, record_id)).rowcount
+        if not deleted:
+            sheet_service.log(f"{date_str}에 해당 직원의 기록을 찾을 수 없습니다.")
+            return False
+        sheet_service.sheet_changed(week)
+        sheet_service.log(f"{date_str} 기록이 삭제되었습니다.")
+        return True
+
+    # Bulk writes
+    def apply_week_batch(self, week, appends=(), updates=(), upserts=()):
+        """sheet_service.apply_week_batch() semantics, in one transaction."""
+        result = {'created': [], 'existing': [], 'updated': [], 'missing': []}
+        with self._lock, self._conn:
+            for record in appends:
+                key = sheet_service.record_key(record)
+                result['created' if self._insert(week, record) else 'existing'].append(key)
+            for record in upserts:
+                key = sheet_service.record_key(record)
+                if self._insert(week, {'record_id': sheet_service.new_record_id(), **record}):
+                    result['created'].append(key)
+                    continue
+                values = {k: v for k, v in record.items() if k in UPDATABLE_FIELDS and v is not None}
+                self._set(key[0], key[1], values)
+                result['updated'].append(key)
+            for date_str, employee_id, values in updates:
+                key = (date_str, str(employee_id))
+                result['updated' if self._set(date_str, employee_id, values) else 'missing'].append(key)
+        sheet_service.sheet_changed(week)
+        return result
+
+    def bulk_check_in(self, entries):
+        return sheet_service.bulk_check_in(None, entries, apply_batch=self.apply_week_batch)
+
+    def bulk_check_out(self, entries):
+        return sheet_service.bulk_check_out(None, entries, apply_batch=self.apply_week_batch)
+
+    def bulk_upsert_records(self, entries):
+        return sheet_service.bulk_upsert_records(None, entries, apply_batch=self.apply_week_batch)
+
+    # Reads
+    def employee_records(self, employee_id, date_from=None, date_to=None):
+        """Same selection as sheet_service.get_all_employee_records(): a date range, or the newest weeks."""
+        query = f"SELECT {', '.join(RECORD_FIELDS)} FROM attendance WHERE employee_id = ?"
+        params = [str(employee_id)]
+        with self._lock:
+            if date_from or date_to:
+                date_to = date_to or datetime.date.today()
+                date_from = date_from or date_to - datetime.timedelta(weeks=sheet_service.HISTORY_DEFAULT_WEEKS)
+                query += " AND date >= ? AND date <= ?"
+                params += [date_from.strftime("%Y-%m-%d"), date_to.strftime("%Y-%m-%d")]
+            else:
+                weeks = [r[0] for r in self._conn.execute(
+                    "SELECT DISTINCT week FROM attendance ORDER BY week DESC LIMIT ?",
+                    (sheet_service.HISTORY_DEFAULT_WEEKS,))]
+                query += f" AND week IN ({', '.join('?' * len(weeks))})"
+                params += weeks
+            rows = self._conn.execute(query + " ORDER BY week DESC, rowid", params).fetchall()
+        # Rows migrated before record_id existed have NULL there; the sheets give ''
+        return [{k: ('' if v is None else v) for k, v in dict(r).items()} for r in rows]
+
+    def week_titles(self, date_from, date_to):
+        """Weeks with records between date_from and date_to, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT week FROM attendance WHERE date >= ? AND date <= ? ORDER BY week",
+                (date_from.strftime("%Y-%m-%d"), date_to.strftime("%Y-%m-%d"))).fetchall()
+        return [r[0] for r in rows]
+
+    def week_rows(self, titles, use_cache=True):
+        """{week: rows} shaped like a weekly sheet's raw values (header first)."""
+        result = {}
+        with self._lock:
+            for title in titles:
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(RECORD_FIELDS)} FROM attendance WHERE week = ? ORDER BY rowid",
+                    (title,)).fetchall()
+                result[title] = [list(RECORD_FIELDS)] + [['' if v is None else v for v in row] for row in rows]
+        return result
+
+    def revision(self):
+        """Changes whenever another connection (another worker, the migration) commits."""
+        with self._lock:
+            return f"sqlite-{self._conn.execute('PRAGMA data_version').fetchone()[0]}"
+
+    def replace_week(self, week, rows):
+        """Replaces a week with a weekly sheet's raw values (migration). Returns (loaded, skipped duplicates)."""
+        records = list(sheet_service.iter_employee_rows(rows, None))
+        loaded = 0
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM attendance WHERE week = ?", (week,))
+            for record in records:
+                if record.get('date') and record.get('employee_id'):
+                    loaded += self._insert(week, record)
+        sheet_service.sheet_changed(week)
+        return loaded, len(records) - loaded
+
+    # Helpers; callers hold the lock
+    def _insert(self, week, record):
+        """Inserts a record unless its (date, employee_id) exists. Returns True if inserted."""
+        values = [str(record.get(f) if record.get(f) is not None else '') for f in RECORD_FIELDS]
+        return self._conn.execute(
+            f"INSERT OR IGNORE INTO attendance (week, {', '.join(RECORD_FIELDS)}) "
+            f"VALUES (?, {', '.join('?' * len(RECORD_FIELDS))})", (week, *values)).rowcount == 1
+
+    def _set(self, date_str, employee_id, values, record_id=None):
+        values = {k: v for k, v in values.items() if k in UPDATABLE_FIELDS}
+        key = key_params(date_str, employee_id, record_id)
+        if not values:
+            return self._conn.execute(f"SELECT 1 FROM attendance WHERE {KEY_CLAUSE}", key).fetchone() is not None
+        assignments = ', '.join(f"{k} = ?" for k in values)
+        return self._conn.execute(
+            f"UPDATE attendance SET {assignments} WHERE {KEY_CLAUSE}",
+            (*map(str, values.values()), *key)).rowcount == 1
+
+    def _update(self, week, date_str, employee_id, values, record_id=None):
+        with self._lock, self._conn:
+            updated = self._set(date_str, employee_id, values, record_id)
+        if updated:
+            sheet_service.sheet_changed(week)
+        return updated
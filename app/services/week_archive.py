@@ -0,0 +1,113 @@
+"""Yearly archive tabs for old weekly sheets.
+
+Every week adds a YYYY_WW tab, and the spreadsheet metadata behind
+worksheets() and every worksheet() lookup grows with it. archive_old_weeks()
+in sheet_service moves weeks older than a cutoff into one 'archive_YYYY' tab
+per (ISO) year and then deletes the weekly tabs. An archive tab holds the
+weekly columns plus 'week', sorted by employee_id then date, so one
+employee's history is a contiguous block.
+
+Archive tabs are read whole, kept in the snapshot cache like closed weeks, and
+indexed in memory here by week and by (employee_id, date). History, report and
+export reads of archived weeks are served from that index. Archived weeks
+are read-only.
+"""
+import bisect
+import re
+import threading
+
+ARCHIVE_PREFIX = 'archive_'
+ARCHIVE_PATTERN = re.compile(r'^archive_\d{4}$')
+ARCHIVE_KEEP_WEEKS = 13 # Weeks (a quarter) kept as live weekly sheets by default
+
+
+def archive_title(week):
+    """Archive tab holding a YYYY_WW week."""
+    return f"{ARCHIVE_PREFIX}{week[:4]}"
+
+
+def is_archive_sheet(title):
+    return bool(ARCHIVE_PATTERN.match(title))
+
+
+class ArchiveTab:
+    """One archive tab's records, indexed by week and by (employee_id, date)."""
+
+    def __init__(self, rows, headers):
+        """rows: the tab's raw values (header first); headers: the weekly layout records are returned in."""
+        self.headers = list(headers)
+        header = rows[0] if rows else []
+        columns = {name: i for i, name in enumerate(header)}
+        week_idx = columns.get('week')
+        id_idx, date_idx = self.headers.index('employee_id'), self.headers.index('date')
+        records = [] # (employee_id, date, week, values in `headers` order)
+        for row in rows[1:]:
+            if week_idx is None or not any(row):
+                continue
+            row = row + [''] * (len(header) - len(row))
+            values = [row[columns[h]] if h in columns else '' for h in self.headers]
+            records.append((values[id_idx], values[date_idx], row[week_idx], values))
+        records.sort(key=lambda record: record[:3])
+        self.records = records
+        self._keys = [record[:2] for record in records]
+        self.weeks = {}
+        for record in records:
+            self.weeks.setdefault(record[2], []).append(record[3])
+
+    def week_rows(self, week):
+        """The week in weekly-sheet layout (header first), or None if the tab does not hold it."""
+        rows = self.weeks.get(week)
+        return None if rows is None else [list(self.headers)] + [list(row) for row in rows]
+
+    def employee_records(self, employee_id, weeks, from_str=None, to_str=None):
+        """Record dicts of one employee in the given weeks and date range, newest week first."""
+        found = []
+        i = bisect.bisect_left(self._keys, (employee_id, from_str or ''))
+        while i < len(self.records):
+            record_employee, day, week, values = self.records[i]
+            if record_employee != employee_id or (to_str and day > to_str):
+                break
+            if week in weeks:
+                found.append((week, dict(zip(self.headers, values))))
+            i += 1
+        # Dates ascend within a week, as rows do in a weekly sheet
+        found.sort(key=lambda item: item[0], reverse=True)
+        return [record for _, record in found]
+
+
+def archive_values(existing, new_weeks, headers):
+    """Values (header first) for an archive tab: the records of `existing` (an ArchiveTab or
+    None) outside new_weeks, plus new_weeks ({week: record dicts}), by employee_id and date."""
+    rows = []
+    if existing:
+        rows += [[week] + list(values) for _, _, week, values in existing.records if week not in new_weeks]
+    for week, records in new_weeks.items():
+        rows += [[week] + [str(record.get(h, '')) for h in headers] for record in records]
+    id_idx, date_idx = headers.index('employee_id') + 1, headers.index('date') + 1
+    rows.sort(key=lambda row: (row[id_idx], row[date_idx], row[0]))
+    return [['week'] + list(headers)] + rows
+
+
+class ArchiveCache:
+    """Parsed ArchiveTabs, re-parsed only when the snapshot cache hands back different rows."""
+
+    def __init__(self):
+        self._tabs = {} # title -> (rows, ArchiveTab)
+        self._lock = threading.Lock()
+
+    def get(self, title, rows, headers):
+        with self._lock:
+            entry = self._tabs.get(title)
+            if entry and entry[0] is rows:
+                return entry[1]
+        tab = ArchiveTab(rows, headers)
+        with self._lock:
+            self._tabs[title] = (rows, tab)
+        return tab
+
+    def invalidate(self, title=None):
+        with self._lock:
+            if title is None:
+                self._tabs.clear()
+            else:
+                self._tabs.pop(title, None)
@@ -0,0 +1,310 @@
+"""Write-behind queue for check-in/check-out bursts.
+
+In write-behind mode a check-in or check-out is acknowledged as soon as it is
+appended (and fsynced) to a local journal. A background thread then drains
+the journal, coalesces the entries per weekly sheet and per (date,
+employee_id), and writes each sheet with at most one append_rows and one
+batch_update. Failed batches stay in the journal and are retried with
+jittered exponential backoff; pending entries survive a restart.
+
+Like the synchronous check-in, a queued one is refused when the employee
+already has a record for the date, in the queue or in the sheet's row index.
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import app.services.sheet_service as sheet_service
+
+JOURNAL_PATH = 'write_journal.jsonl'
+FLUSH_INTERVAL = 1.0 # seconds to gather a burst before writing
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+class WriteJournal:
+    """Append-only JSON-lines file holding the entries not yet written to Sheets."""
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write; the request was never acknowledged
+                    continue
+        return entries
+
+    def append(self, entry):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def rewrite(self, entries):
+        """Atomically replaces the journal with the given (still pending) entries."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def coalesce(entries):
+    """Groups journal entries into ({sheet: (appends, updates)}, dropped), preserving per-key order.
+
+    A check-out that follows a queued check-in for the same (date, employee_id)
+    is folded into the appended row. A check-out queued before the check-in is
+    folded into the appended row too, and also kept as an update (applied after
+    the append), so it still lands if the record turns out to exist already.
+    Repeated check-ins for a key are dropped and returned in `dropped`.
+    """
+    sheets = OrderedDict()
+    dropped = []
+    for entry in entries:
+        slots = sheets.setdefault(entry['sheet'], OrderedDict())
+        slot = slots.setdefault((entry['date'], entry['employee_id']), {'append': None, 'update': {}})
+        if entry['op'] == 'check_in':
+            if slot['append'] is None:
+                slot['append'] = {**entry['values'], **slot['update']}
+            else:
+                dropped.append(entry)
+            continue
+        if slot['append'] is not None:
+            slot['append'].update(entry['values'])
+        if slot['append'] is None or slot['update']:
+            slot['update'].update(entry['values'])
+
+    batches = OrderedDict()
+    for sheet_name, slots in sheets.items():
+        appends = [slot['append'] for slot in slots.values() if slot['append'] is not None]
+        updates = [(date_str, employee_id, slot['update'])
+                   for (date_str, employee_id), slot in slots.items() if slot['update']]
+        batches[sheet_name] = (appends, updates)
+    return batches, dropped
+
+
+class WriteBehindQueue:
+    """Journal-backed queue flushed to Sheets by a background thread."""
+
+    def __init__(self, get_spreadsheet, journal=None, flush_interval=FLUSH_INTERVAL):
+        self._get_spreadsheet = get_spreadsheet
+        self.journal = journal or WriteJournal()
+        self.flush_interval = flush_interval
+        self._cond = threading.Condition()
+        self._pending = self.journal.load()
+        self._seq = max((e['seq'] for e in self._pending), default=0)
+        self._thread = None
+        self._stopping = False
+        self._failures = 0
+        self.stats = {
+            'enqueued': 0,
+            'flushed': 0,
+            'batches': 0,
+            'retries': 0,
+            'dropped': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'last_queue_delay_ms': 0.0,
+        }
+
+    # Producer side
+    def submit_check_in(self, employee, specific_time=None, specific_date=None):
+        """Journals a check-in; returns the acknowledged record, None for an invalid date,
+        or False if the employee already has a record (queued or written) for the date."""
+        resolved = sheet_service.resolve_date(specific_date)
+        if not resolved:
+            return None
+        date_str, sheet_name = resolved
+        key = (date_str, str(employee.get('id')))
+        # The record lock is the one flushes append under, so a queued check-in is either
+        # still pending here or already in the row index when we look
+        with sheet_service.record_locks.hold(sheet_name, [key]):
+            if self._queued_check_in(sheet_name, key):
+                sheet_service.log("이미 출근 기록이 있습니다.")
+                return False
+            recorded = self._recorded(sheet_name, key)
+            if recorded is None:
+                sheet_service.log("출근 기록을 확인하지 못했습니다. 다시 시도해 주세요.")
+                return False
+            if recorded:
+                sheet_service.log("이미 출근 기록이 있습니다.")
+                return False
+            record = sheet_service.build_checkin_record(
+                employee, date_str, sheet_service.make_checkin_time(specific_time))
+            self._enqueue('check_in', sheet_name, date_str, employee.get('id'), record)
+        return record
+
+    def submit_check_out(self, employee, specific_time=None, specific_date=None):
+        """Journals a check-out; returns the acknowledged values, or None for an invalid date."""
+        resolved = sheet_service.resolve_date(specific_date)
+        if not resolved:
+            return None
+        date_str, sheet_name = resolved
+        values = {'checkout_time': sheet_service.make_checkout_time(specific_time), 'reason': '-'}
+        self._enqueue('check_out', sheet_name, date_str, employee.get('id'), values)
+        return {'date': date_str, 'employee_id': employee.get('id'), **values}
+
+    def _queued_check_in(self, sheet_name, key):
+        with self._cond:
+            return any(e['op'] == 'check_in' and e['sheet'] == sheet_name and (e['date'], e['employee_id']) == key
+                       for e in self._pending)
+
+    def _recorded(self, sheet_name, key):
+        """True if the weekly sheet holds a record for key (via its row index), None if that could not be read."""
+        spreadsheet = self._get_spreadsheet()
+        if spreadsheet is None:
+            return None
+        try:
+            info = sheet_service.get_sheet_info(spreadsheet, sheet_name)
+            if not info:
+                return False # The flush creates the week's sheet
+            info, index = sheet_service.get_row_index(info)
+        except Exception as e:
+            sheet_service.report_error(e)
+            return None
+        return index is not None and index.find(*key) != -1
+
+    def _enqueue(self, op, sheet_name, date_str, employee_id, values):
+        with self._cond:
+            self._seq += 1
+            entry = {
+                'seq': self._seq,
+                'op': op,
+                'sheet': sheet_name,
+                'date': date_str,
+                'employee_id': str(employee_id),
+                'values': values,
+                'queued_at': time.time(),
+            }
+            self.journal.append(entry)
+            self._pending.append(entry)
+            self.stats['enqueued'] += 1
+            self._cond.notify()
+
+    def depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def snapshot(self):
+        with self._cond:
+            return {'pending': len(self._pending), **self.stats}
+
+    # Worker side
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stops the worker after one last flush attempt."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if self._stopping and not self._pending:
+                    return
+                stopping = self._stopping
+            if not stopping:
+                # Let the rest of the burst arrive before writing
+                self._wait(self.flush_interval)
+            if not self.flush() and not stopping:
+                self._wait(self._backoff())
+            if stopping:
+                return
+
+    def _wait(self, seconds):
+        """Sleeps for the given time, waking early when stop() is called."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._stopping, timeout=seconds)
+
+    def _backoff(self):
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (self._failures - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def flush(self):
+        """Writes everything pending; returns False if any sheet failed and needs a retry."""
+        with self._cond:
+            entries = list(self._pending)
+        if not entries:
+            return True
+
+        spreadsheet = self._get_spreadsheet()
+        if spreadsheet is None:
+            self._failures += 1
+            self.stats['retries'] += 1
+            return False
+
+        started = time.perf_counter()
+        done = set()
+        ok = True
+        batches, dropped = coalesce(entries)
+        for sheet_name, (appends, updates) in batches.items():
+            try:
+                existing, missing = sheet_service.write_week_batch(spreadsheet, sheet_name, appends, updates)
+            except LookupError as e:
+                # The weekly sheet (or its columns) is missing; retrying will not help
+                sheet_service.log(f"대기열 기록 실패, 폐기합니다: {e}")
+                self.stats['dropped'] += sum(1 for entry in entries if entry['sheet'] == sheet_name)
+                done.add(sheet_name)
+                continue
+            except Exception as e:
+                sheet_service.log(f"대기열 기록 실패 ({sheet_name}), 재시도 예정: {e}")
+                ok = False
+                continue
+            for date_str, employee_id in existing:
+                sheet_service.log(f"{date_str} {employee_id} 출근 기록이 이미 있어 대기열의 출근 처리를 폐기합니다.")
+            for date_str, employee_id in missing:
+                sheet_service.log(f"{date_str} {employee_id} 출근 기록이 없어 퇴근 처리를 폐기합니다.")
+            self.stats['dropped'] += len(existing) + len(missing)
+            self.stats['batches'] += 1
+            done.add(sheet_name)
+
+        # Repeated check-ins leave the journal with their sheet's batch
+        for entry in dropped:
+            if entry['sheet'] in done:
+                sheet_service.log(f"{entry['date']} {entry['employee_id']} 중복 출근 요청을 폐기합니다.")
+                self.stats['dropped'] += 1
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        written = [e for e in entries if e['sheet'] in done]
+        with self._cond:
+            written_seqs = {e['seq'] for e in written}
+            self._pending = [e for e in self._pending if e['seq'] not in written_seqs]
+            self.journal.rewrite(self._pending)
+            self.stats['flushed'] += len(written)
+            self.stats['last_flush_ms'] = elapsed_ms
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed_ms)
+            if written:
+                oldest = min(e.get('queued_at', time.time()) for e in written)
+                self.stats['last_queue_delay_ms'] = (time.time() - oldest) * 1000
+
+        if ok:
+            self._failures = 0
+        else:
+            self._failures += 1
+            self.stats['retries'] += 1
+        return ok
@@ -44,6 +44,15 @@ const editTypeRadios = document.getElementsByName('edit-type');
 // State for Edit
 let currentEditRecord = null;
 
+// Idempotency-Key per write action; kept after a network error so a retry of the
+// same request is answered with the first result instead of being applied twice
+const pendingWrites = {};
+const PENDING_WRITE_MS = 5 * 60 * 1000;
+
+// History shown in the modal (records by date) and the server version it reflects
+let historyRecords = null;
+let historyVersion = null;
+
 // Functions
 function addLog(message) {
     const line = document.createElement('div');
@@ -82,6 +91,25 @@ function showToast(message) {
     }, 3000);
 }
 
+function writeRequest(action, method, payload) {
+    const body = JSON.stringify(payload);
+    const pending = pendingWrites[action];
+    if (!pending || pending.body !== body || Date.now() - pending.at > PENDING_WRITE_MS) {
+        const key = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+        pendingWrites[action] = { key, body, at: Date.now() };
+    }
+    return {
+        method,
+        headers: { 'Content-Type': 'application/json', 'Idempotency-Key': pendingWrites[action].key },
+        body
+    };
+}
+
+// The server answered; the next write of this action is a new one
+function settleWrite(action) {
+    delete pendingWrites[action];
+}
+
 function updateTime() {
     const now = new Date();
     currentTimeDisplay.textContent = now.toLocaleTimeString('ko-KR', { hour12: false });
@@ -111,6 +139,7 @@ async function handleLogin() {
 
         const data = await res.json();
         currentUser = data;
+        resetHistory();
         
         // Update Dashboard
         userGreeting.textContent = `반갑습니다, ${currentUser.name}님`;
@@ -137,20 +166,18 @@ async function handleCheckIn() {
     }
 
     try {
-        const res = await fetch(`${API_URL}/check-in`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                name: currentUser.name,
-                location: currentUser.location,
-                employee_id: currentUser.id,
-                time: manualTime ? manualTime : null, // Send HH:MM, backend adds random seconds
-                date: isManual ? document.getElementById('manual-date-input').value : null
-            })
-        });
+        const res = await fetch(`${API_URL}/check-in`, writeRequest('check-in', 'POST', {
+            name: currentUser.name,
+            location: currentUser.location,
+            employee_id: currentUser.id,
+            time: manualTime ? manualTime : null, // Send HH:MM, backend adds random seconds
+            date: isManual ? document.getElementById('manual-date-input').value : null
+        }));
+        settleWrite('check-in');
 
         const data = await res.json();
         if (res.ok) {
+            applyChange(data.record);
             showToast("출근 처리가 완료되었습니다.");
         } else {
             showToast("출근 처리에 실패했습니다: " + data.detail);
@@ -176,19 +203,17 @@ async function handleCheckOut() {
     }
 
     try {
-        const res = await fetch(`${API_URL}/check-out`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                name: currentUser.name,
-                employee_id: currentUser.id,
-                time: manualTime ? manualTime : null,
-                date: isManual ? document.getElementById('manual-date-input').value : null
-            })
-        });
+        const res = await fetch(`${API_URL}/check-out`, writeRequest('check-out', 'POST', {
+            name: currentUser.name,
+            employee_id: currentUser.id,
+            time: manualTime ? manualTime : null,
+            date: isManual ? document.getElementById('manual-date-input').value : null
+        }));
+        settleWrite('check-out');
 
         const data = await res.json();
         if (res.ok) {
+            applyChange(data.record);
             showToast("퇴근 처리가 완료되었습니다.");
         } else {
             showToast("퇴근 처리에 실패했습니다: " + data.detail);
@@ -201,63 +226,103 @@ async function handleCheckOut() {
 }
 
 // History Functions
+function resetHistory() {
+    historyRecords = null;
+    historyVersion = null;
+}
+
+// Patches the loaded history with a record returned by a write (changed fields only)
+function applyChange(record, deleted = false) {
+    if (!historyRecords || !record) return;
+    if (deleted) {
+        historyRecords.delete(record.date);
+    } else {
+        historyRecords.set(record.date, { ...(historyRecords.get(record.date) || {}), ...record });
+    }
+    renderHistory();
+}
+
+// record_id of a loaded record; the server refuses the change if the row now holds another record
+function recordIdOf(date) {
+    const record = historyRecords && historyRecords.get(date);
+    return (record && record.record_id) || null;
+}
+
 async function loadHistory() {
     if (!currentUser) return;
-    historyTableBody.innerHTML = '<tr><td colspan="4">로딩 중...</td></tr>';
+    if (!historyRecords) {
+        historyTableBody.innerHTML = '<tr><td colspan="4">로딩 중...</td></tr>';
+    }
     
     try {
-        const res = await fetch(`${API_URL}/history/${currentUser.id}`);
-        const records = await res.json();
-        
-        historyTableBody.innerHTML = '';
-        if (records.length === 0) {
-            historyTableBody.innerHTML = '<tr><td colspan="4">기록이 없습니다.</td></tr>';
-            return;
-        }
-
-        records.forEach(record => {
-            const tr = document.createElement('tr');
-            tr.innerHTML = `
-                <td>${record.date}</td>
-                <td>${record.checkin_time || '-'}</td>
-                <td>${record.checkout_time || '-'}</td>
-                <td>
-                    <button class="action-icon-btn edit-rec-btn" data-date="${record.date}">✏️</button>
-                    <button class="action-icon-btn del-rec-btn" data-date="${record.date}">🗑️</button>
-                </td>
-            `;
-            historyTableBody.appendChild(tr);
-        });
-
-        // Add listeners to dynamic buttons
-        document.querySelectorAll('.edit-rec-btn').forEach(btn => {
-            btn.addEventListener('click', (e) => openEditModal(e.target.dataset.date));
-        });
-        document.querySelectorAll('.del-rec-btn').forEach(btn => {
-            btn.addEventListener('click', (e) => confirmDelete(e.target.dataset.date));
-        });
+        // Once loaded, only the changes since the last version are fetched
+        const query = historyRecords && historyVersion ? `?since=${encodeURIComponent(historyVersion)}` : '';
+        const res = await fetch(`${API_URL}/history/${currentUser.id}${query}`);
+        if (!res.ok) throw new Error(res.status);
+        const data = await res.json();
 
+        if (Array.isArray(data) || data.records) {
+            const records = Array.isArray(data) ? data : data.records;
+            historyRecords = new Map(records.map(record => [record.date, record]));
+        } else {
+            data.changes.forEach(change => applyChange(change.record || { date: change.date }, change.deleted));
+        }
+        historyVersion = Array.isArray(data) ? (res.headers.get('ETag') || '').replace(/"/g, '') : data.version;
+        renderHistory();
     } catch (err) {
+        resetHistory();
         historyTableBody.innerHTML = '<tr><td colspan="4">불러오기 실패</td></tr>';
     }
 }
 
+function renderHistory() {
+    if (!historyRecords) return;
+    const records = Array.from(historyRecords.values()).sort((a, b) => b.date.localeCompare(a.date));
+
+    historyTableBody.innerHTML = '';
+    if (records.length === 0) {
+        historyTableBody.innerHTML = '<tr><td colspan="4">기록이 없습니다.</td></tr>';
+        return;
+    }
+
+    records.forEach(record => {
+        const tr = document.createElement('tr');
+        tr.innerHTML = `
+            <td>${record.date}</td>
+            <td>${record.checkin_time || '-'}</td>
+            <td>${record.checkout_time || '-'}</td>
+            <td>
+                <button class="action-icon-btn edit-rec-btn" data-date="${record.date}">✏️</button>
+                <button class="action-icon-btn del-rec-btn" data-date="${record.date}">🗑️</button>
+            </td>
+        `;
+        historyTableBody.appendChild(tr);
+    });
+
+    // Add listeners to dynamic buttons
+    document.querySelectorAll('.edit-rec-btn').forEach(btn => {
+        btn.addEventListener('click', (e) => openEditModal(e.target.dataset.date));
+    });
+    document.querySelectorAll('.del-rec-btn').forEach(btn => {
+        btn.addEventListener('click', (e) => confirmDelete(e.target.dataset.date));
+    });
+}
+
 async function confirmDelete(date) {
     if (!confirm(`${date} 기록을 정말 삭제하시겠습니까?`)) return;
     
     try {
-        const res = await fetch(`${API_URL}/record`, {
-            method: 'DELETE',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                employee_id: currentUser.id,
-                date: date
-            })
-        });
+        const res = await fetch(`${API_URL}/record`, writeRequest('delete', 'DELETE', {
+            employee_id: currentUser.id,
+            date: date,
+            record_id: recordIdOf(date)
+        }));
+        settleWrite('delete');
         
         if (res.ok) {
+            const data = await res.json();
+            applyChange(data.record, true);
             showToast("삭제되었습니다.");
-            loadHistory();
         } else {
             showToast("삭제 실패");
         }
@@ -284,21 +349,20 @@ async function saveEdit() {
     }
 
     try {
-         const res = await fetch(`${API_URL}/record`, {
-            method: 'PUT',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                employee_id: currentUser.id,
-                date: currentEditRecord.date,
-                field: type,
-                value: timeVal.length === 5 ? timeVal + ":00" : timeVal // Only append :00 if HH:MM
-            })
-        });
+         const res = await fetch(`${API_URL}/record`, writeRequest('update', 'PUT', {
+            employee_id: currentUser.id,
+            date: currentEditRecord.date,
+            field: type,
+            value: timeVal.length === 5 ? timeVal + ":00" : timeVal, // Only append :00 if HH:MM
+            record_id: recordIdOf(currentEditRecord.date)
+        }));
+        settleWrite('update');
         
         if (res.ok) {
+            const data = await res.json();
+            applyChange(data.record);
             showToast("수정되었습니다.");
             editModal.classList.remove('active');
-            loadHistory();
         } else {
             showToast("수정 실패");
         }
@@ -351,6 +415,7 @@ employeeNameInput.addEventListener('keypress', (e) => {
 
 logoutBtn.addEventListener('click', () => {
     currentUser = null;
+    resetHistory();
     employeeNameInput.value = '';
     switchView('login');
 });
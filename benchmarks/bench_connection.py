@@ -0,0 +1,55 @@
+"""Per-request latency: connect-per-request vs. the pooled spreadsheet.
+
+Runs against the in-memory fake backend, so the numbers reflect the number
+of simulated round-trips rather than real Google latency.
+
+    python -m benchmarks.bench_connection [--requests 50] [--latency 0.02]
+"""
+import argparse
+import statistics
+import time
+
+import app.services.sheet_service as sheet_service
+from app.services.fake_sheets import FakeClient, make_demo_spreadsheet
+from app.services.spreadsheet_pool import SpreadsheetPool
+
+
+def run(label, get_spreadsheet, requests, employee_id):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        spreadsheet = get_spreadsheet()
+        sheet_service.get_all_employee_records(spreadsheet, employee_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<22} p50={statistics.median(timings):7.1f}ms  "
+          f"mean={statistics.fmean(timings):7.1f}ms  max={max(timings):7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds per simulated API call")
+    parser.add_argument('--auth-latency', type=float, default=0.05)
+    parser.add_argument('--open-latency', type=float, default=0.08)
+    args = parser.parse_args()
+
+    sheet_service.set_log_callback(None)
+    spreadsheet = make_demo_spreadsheet(latency=args.latency)
+    client = FakeClient(spreadsheet, args.auth_latency, args.open_latency)
+
+    def connect():
+        return client.authorize().open(spreadsheet.title)
+
+    run("connect per request", connect, args.requests, 'E00007')
+    before = dict(spreadsheet.api_calls)
+
+    pool = SpreadsheetPool(connect=connect)
+    run("pooled spreadsheet", pool.get, args.requests, 'E00007')
+    after = {k: v - before.get(k, 0) for k, v in spreadsheet.api_calls.items()}
+
+    print(f"api calls (per request): {before}")
+    print(f"api calls (pooled):      {after}")
+
+
+if __name__ == '__main__':
+    main()
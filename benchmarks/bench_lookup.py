@@ -0,0 +1,58 @@
+"""Cells transferred by a cold check-out (no warm row index) as the weekly sheet grows.
+
+Compares rebuilding the row index from the whole sheet (get_all_values) with
+reading only the header row and the date/employee_id columns, and shows the
+cells a later check-out reads to re-verify an expired index.
+
+    python -m benchmarks.bench_lookup [--sizes 100 1000 5000]
+"""
+import argparse
+import datetime
+
+import app.services.sheet_service as sheet_service
+from app.services.fake_sheets import make_demo_spreadsheet
+
+
+def cold_check_out(spreadsheet, employee_id, full_read):
+    sheet_service.invalidate_sheet()
+    title = sheet_service.get_current_week_sheet_name()
+    info = sheet_service.get_sheet_info(spreadsheet, title)
+    spreadsheet.api_calls.clear()
+    spreadsheet.cells_read = 0
+    if full_read:
+        sheet_service.WeekRowIndex.build(
+            title, info.worksheet.get_all_values(), info.columns['date'], info.columns['employee_id'])
+    else:
+        monday = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
+        assert sheet_service.check_out(spreadsheet, {'id': employee_id}, '21:00:00', monday.strftime("%Y-%m-%d"))
+    return spreadsheet.cells_read, sum(spreadsheet.api_calls.values())
+
+
+def verified_check_out(spreadsheet, employee_id):
+    """A check-out whose row index is cached but past VERIFY_INTERVAL."""
+    title = sheet_service.get_current_week_sheet_name()
+    sheet_service.row_index_cache.get(title).verified_at = 0.0
+    spreadsheet.cells_read = 0
+    monday = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
+    assert sheet_service.check_out(spreadsheet, {'id': employee_id}, '21:00:00', monday.strftime("%Y-%m-%d"))
+    return spreadsheet.cells_read
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000], help="employees per day")
+    args = parser.parse_args()
+
+    sheet_service.set_log_callback(None)
+    print(f"{'rows':>7}  {'full sheet cells':>16}  {'key columns cells':>17}  {'calls':>5}  {'re-verify cells':>15}")
+    for size in args.sizes:
+        spreadsheet = make_demo_spreadsheet(employees=size, weeks=1)
+        rows = len(spreadsheet.worksheet(sheet_service.get_current_week_sheet_name()).rows)
+        full, _ = cold_check_out(spreadsheet, 'E00001', True)
+        narrow, calls = cold_check_out(spreadsheet, 'E00001', False)
+        verify = verified_check_out(spreadsheet, 'E00002')
+        print(f"{rows:>7}  {full:>16}  {narrow:>17}  {calls:>5}  {verify:>15}")
+
+
+if __name__ == '__main__':
+    main()
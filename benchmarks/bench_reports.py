@@ -0,0 +1,54 @@
+"""Worked-hours report: cold load vs. aggregation over cached closed weeks.
+
+    python -m benchmarks.bench_reports [--employees 300] [--weeks 52] [--latency 0.05]
+"""
+import argparse
+import datetime
+import statistics
+import time
+
+import app.services.reports as reports
+import app.services.sheet_service as sheet_service
+from app.services.fake_sheets import make_demo_spreadsheet
+from app.services.repository import SheetsRepository
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=300)
+    parser.add_argument('--weeks', type=int, default=52)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per simulated API call")
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    sheet_service.set_log_callback(None)
+    spreadsheet = make_demo_spreadsheet(employees=args.employees, weeks=args.weeks, latency=args.latency)
+    repository = SheetsRepository(lambda: spreadsheet)
+    date_to = datetime.date.today()
+    date_from = date_to - datetime.timedelta(weeks=args.weeks)
+
+    report, cold_ms = timed(reports.hours_report, repository, date_from, date_to)
+    print(f"cold (read + aggregate): {cold_ms:8.1f}ms  employees={len(report['employees'])}  "
+          f"api calls={dict(spreadsheet.api_calls)}")
+
+    warm = [timed(reports.hours_report, repository, date_from, date_to)[1] for _ in range(args.runs)]
+    print(f"warm (closed weeks cached): p50={statistics.median(warm):7.1f}ms  "
+          f"(includes re-reading the current week)")
+
+    # Aggregation alone, over weeks already in memory
+    weeks = reports.load_weeks(repository, sorted(sheet_service.list_weekly_sheets(spreadsheet)))
+    rows = sum(len(w.day) for w in weeks)
+    first, last = date_from.toordinal(), date_to.toordinal()
+    aggregate = [timed(lambda: [w.totals(0, first, last + i) for w in weeks])[1] for i in range(1, args.runs + 1)]
+    print(f"aggregate only ({rows} rows): p50={statistics.median(aggregate):7.1f}ms")
+    print(f"cache: {reports.report_cache.snapshot()}")
+
+
+if __name__ == '__main__':
+    main()
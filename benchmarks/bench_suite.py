@@ -0,0 +1,100 @@
+"""Offline benchmark of the main sheet_service operations at several sheet sizes.
+
+Runs login, check-in, check-out, history, update and delete against the
+in-memory fake backend with rows-per-week of 100, 1k and 10k (3 weeks each)
+and reports, per operation, simulated API calls and cells read per call and
+the latency of the first (cold) call and of the rest (p50/p95).
+
+    python -m benchmarks.bench_suite [--sizes 100 1000 10000] [--repeat 20]
+                                     [--latency 0.02] [--quota 60]
+
+--latency is the simulated seconds per API call. --quota injects the Sheets
+per-minute quota: calls beyond it get HTTP 429, and a RequestGovernor with
+the same limits throttles and retries as it does in production.
+"""
+import argparse
+import datetime
+import statistics
+import time
+
+import app.services.sheet_service as sheet_service
+from app.services.fake_sheets import make_demo_spreadsheet
+from app.services.request_governor import RequestGovernor
+from app.services.snapshot_cache import SnapshotCache
+
+OPERATIONS = ('login', 'check-in', 'check-out', 'history', 'update', 'delete')
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def make_operations(spreadsheet, repeat, monday):
+    """{operation: [call, ...]}; each call returns True on success."""
+    date_str = monday.strftime("%Y-%m-%d")
+    # New employees for check-in/out and delete, existing ones for login, history and update
+    new = [{'id': f"B{i:05d}", 'name': f"신규{i}", 'location': '신공 506'} for i in range(repeat)]
+    staff = [f"E{i:05d}" for i in range(repeat)]
+    return {
+        'login': [lambda i=i: bool(sheet_service.find_employee(spreadsheet, f"직원{i}")) for i in range(repeat)],
+        'check-in': [lambda e=e: sheet_service.check_in(spreadsheet, e, '09:00', date_str) for e in new],
+        'check-out': [lambda e=e: sheet_service.check_out(spreadsheet, e, '21:00', date_str) for e in new],
+        'history': [lambda e=e: sheet_service.get_all_employee_records(spreadsheet, e) is not None for e in staff],
+        'update': [lambda e=e: sheet_service.update_record(spreadsheet, e, date_str, checkin='08:30:00')
+                   for e in staff],
+        'delete': [lambda e=e: sheet_service.delete_record(spreadsheet, e['id'], date_str) for e in new],
+    }
+
+
+def measure(spreadsheet, calls):
+    spreadsheet.api_calls.clear()
+    spreadsheet.cells_read = 0
+    timings = []
+    for call in calls:
+        start = time.perf_counter()
+        if not call():
+            raise RuntimeError("benchmark operation failed")
+        timings.append((time.perf_counter() - start) * 1000)
+    return sum(spreadsheet.api_calls.values()) / len(calls), spreadsheet.cells_read / len(calls), timings
+
+
+def run_size(rows_per_week, args):
+    governor = RequestGovernor(args.quota, args.quota) if args.quota else None
+    spreadsheet = make_demo_spreadsheet(
+        employees=max(rows_per_week // 5, args.repeat), weeks=3, latency=args.latency,
+        quota_per_minute=args.quota, governor=governor)
+    # Fresh process-wide caches, as after a restart
+    sheet_service.invalidate_sheet()
+    sheet_service.set_snapshot_cache(SnapshotCache())
+    sheet_service.reload_employees(spreadsheet)
+
+    monday = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
+    operations = make_operations(spreadsheet, args.repeat, monday)
+    for name in OPERATIONS:
+        calls, cells, timings = measure(spreadsheet, operations[name])
+        rest = timings[1:] or timings
+        print(f"{rows_per_week:>7}  {name:<10} {calls:>9.1f} {cells:>11.0f} {timings[0]:>10.1f} "
+              f"{statistics.median(rest):>8.1f} {percentile(rest, 95):>8.1f}")
+    if args.quota:
+        print(f"{'':>7}  429 responses: {spreadsheet.rate_limited}, governor: "
+              f"{ {lane: s['throttled'] for lane, s in governor.snapshot().items()} } throttled")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help="rows per weekly sheet")
+    parser.add_argument('--repeat', type=int, default=20, help="calls per operation")
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds per simulated API call")
+    parser.add_argument('--quota', type=int, default=None, help="API calls per minute per lane (429 beyond it)")
+    args = parser.parse_args()
+
+    sheet_service.set_log_callback(None)
+    print(f"{'rows':>7}  {'operation':<10} {'calls/op':>9} {'cells/op':>11} {'first ms':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+    for size in args.sizes:
+        run_size(size, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Throughput with 1, 2, 4... uvicorn worker processes (KADA_WORKERS).
+
+Starts `uvicorn app.main:app --workers N` on the fake backend for each N,
+warms the caches, then drives a read mix (ranged history and the hours
+report) from --clients client processes for --duration seconds and reports
+req/s, p50 and p95. Every worker builds its own in-memory fake spreadsheet,
+so the mix is read-only; writes would land in different copies. Scaling is
+bounded by the host's cores (shown in the output).
+
+    python -m benchmarks.bench_workers [--workers 1,2,4] [--clients 8] [--duration 10]
+"""
+import argparse
+import datetime
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def request_paths(employees):
+    date_to = datetime.date.today()
+    date_from = (date_to - datetime.timedelta(weeks=2)).strftime("%Y-%m-%d")
+    paths = [f"/api/reports/hours?from={date_from}"]
+    paths += [f"/api/history/E{i:05d}?from={date_from}" for i in range(0, employees, max(1, employees // 20))]
+    return paths
+
+
+def get(base, path):
+    with urllib.request.urlopen(base + path, timeout=30) as response:
+        response.read()
+        return response.status
+
+
+def start_server(workers, port, employees, cluster_dir):
+    env = dict(os.environ,
+               KADA_BACKEND='fake', KADA_FAKE_EMPLOYEES=str(employees), KADA_WORKERS=str(workers),
+               KADA_CLUSTER_DB=os.path.join(cluster_dir, f"cluster-{workers}.db"),
+               KADA_SNAPSHOT_DIR='', KADA_IDEMPOTENCY_DB='',
+               # The fake backend has no quota; don't let the governor's share throttle the warm-up
+               KADA_SHEETS_READS_PER_MINUTE='100000', KADA_SHEETS_WRITES_PER_MINUTE='100000')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        env=env, stdout=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            get(base, '/api/sheets-quota')
+            return process, base
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server with {workers} workers did not start")
+
+
+def client(base, paths, duration, threads, offset):
+    """One client process: `threads` threads looping over paths until the deadline. Returns latencies (ms)."""
+    timings, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def loop(n):
+        local = []
+        i = offset + n
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                get(base, paths[i % len(paths)])
+                local.append((time.perf_counter() - start) * 1000)
+            except OSError:
+                with lock:
+                    errors[0] += 1
+            i += 1
+        with lock:
+            timings.extend(local)
+
+    workers = [threading.Thread(target=loop, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return timings, errors[0]
+
+
+def run(workers, args, paths, cluster_dir):
+    port = free_port()
+    process, base = start_server(workers, port, args.employees, cluster_dir)
+    try:
+        # Every worker fills its own caches; hit each path enough times to reach all of them
+        for _ in range(workers * 3):
+            for path in paths:
+                get(base, path)
+        with ProcessPoolExecutor(max_workers=args.clients) as pool:
+            futures = [pool.submit(client, base, paths, args.duration, args.threads, i * 7)
+                       for i in range(args.clients)]
+            results = [future.result() for future in futures]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    timings = [t for result in results for t in result[0]]
+    errors = sum(result[1] for result in results)
+    return {'workers': workers, 'requests': len(timings), 'errors': errors,
+            'rps': len(timings) / args.duration,
+            'p50': statistics.median(timings) if timings else 0.0,
+            'p95': percentile(timings, 95) if timings else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help="comma-separated worker counts")
+    parser.add_argument('--clients', type=int, default=8, help="client processes")
+    parser.add_argument('--threads', type=int, default=4, help="threads per client process")
+    parser.add_argument('--duration', type=float, default=10, help="seconds of load per worker count")
+    parser.add_argument('--employees', type=int, default=300)
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    paths = request_paths(args.employees)
+    results = []
+    with tempfile.TemporaryDirectory() as cluster_dir:
+        for workers in (int(n) for n in args.workers.split(',')):
+            result = run(workers, args, paths, cluster_dir)
+            results.append(result)
+            if not args.json:
+                base_rps = results[0]['rps'] or 1
+                print(f"workers={workers:<3} {result['rps']:8.1f} req/s  x{result['rps'] / base_rps:4.2f}  "
+                      f"p50={result['p50']:7.1f}ms  p95={result['p95']:7.1f}ms  "
+                      f"requests={result['requests']}  errors={result['errors']}")
+    if args.json:
+        print(json.dumps({'cpus': os.cpu_count(), 'results': results}, indent=2))
+    else:
+        print(f"cpus={os.cpu_count()} (throughput stops scaling past the core count)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Load test: many concurrent /api/check-in calls against a local stub server.
+
+Starts the FastAPI app with uvicorn on a local port, backed by the in-memory
+fake spreadsheet (every API call sleeps --latency seconds), fires --clients
+simultaneous check-ins and reports p50/p99 latency. The first run uses a
+single sheet worker, which is what the blocking handlers amounted to; the
+second uses the default SheetExecutor.
+
+    python -m benchmarks.load_check_in [--clients 50] [--latency 0.05]
+"""
+import argparse
+import json
+import socket
+import statistics
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+
+import app.main as main
+import app.services.sheet_service as sheet_service
+from app.services.async_sheets import SheetExecutor
+from app.services.fake_sheets import make_demo_spreadsheet
+from app.services.spreadsheet_pool import SpreadsheetPool
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    config = uvicorn.Config(main.app, host='127.0.0.1', port=port, log_level='warning')
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def check_in(url, i, barrier):
+    # Ids are unique across runs: a second check-in on the same day is rejected
+    body = json.dumps({'name': f"직원{i}", 'location': '신공 506', 'employee_id': f"L{i:05d}"}).encode()
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    barrier.wait()
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return (time.perf_counter() - start) * 1000
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run(label, url, clients, first_id=0):
+    barrier = threading.Barrier(clients)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        timings = list(pool.map(lambda i: check_in(url, i, barrier), range(first_id, first_id + clients)))
+    wall = time.perf_counter() - start
+    print(f"{label:<26} p50={statistics.median(timings):8.1f}ms  p99={percentile(timings, 99):8.1f}ms  "
+          f"wall={wall:6.2f}s  throughput={clients / wall:6.1f} req/s")
+
+
+def run_load_test():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per simulated API call")
+    args = parser.parse_args()
+
+    spreadsheet = make_demo_spreadsheet(latency=args.latency)
+    main.spreadsheet_pool = SpreadsheetPool(connect=lambda: spreadsheet)
+    port = free_port()
+    server, thread = start_server(port)
+    sheet_service.set_log_callback(None)
+    url = f"http://127.0.0.1:{port}/api/check-in"
+
+    try:
+        main.sheet_executor = SheetExecutor(max_workers=1)
+        run("serialized (1 worker)", url, args.clients)
+        main.sheet_executor = SheetExecutor()
+        run(f"SheetExecutor ({main.sheet_executor.max_workers} workers)", url, args.clients, first_id=args.clients)
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == '__main__':
+    run_load_test()
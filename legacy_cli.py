@@ -1,13 +1,10 @@
-import app.services.sheet_service as google_client
+from app.services.repository import StorageUnavailable, open_repository
 
 def main():
     print("=== Kada Commute System ===")
     
-    # 1. Connect to Google Sheets
-    spreadsheet = google_client.connect_to_spreadsheet()
-    if not spreadsheet:
-        print("Failed to connect to Google Sheets. Exiting.")
-        return
+    # 1. Open the storage selected by KADA_STORAGE (Google Sheets by default)
+    repository = open_repository()
 
     # 2. Input Name
     name = input("이름을 입력하세요: ").strip()
@@ -17,7 +14,11 @@ def main():
 
     # 3. Find Employee
     print(f"'{name}' 님을 조회 중입니다...")
-    employee = google_client.find_employee(spreadsheet, name)
+    try:
+        employee = repository.find_employee(name)
+    except StorageUnavailable:
+        print("Failed to connect to Google Sheets. Exiting.")
+        return
 
     if employee:
         print(f"\n환영합니다, {employee.get('name')}님!")
@@ -26,7 +27,7 @@ def main():
         
         # Show all records
         print("\n[출퇴근 기록]")
-        records = google_client.get_all_employee_records(spreadsheet, employee.get('id'))
+        records = repository.employee_records(employee.get('id'))
         if records:
             print(f"{'날짜':<12} {'출근 시간':<10} {'퇴근 시간':<10} {'사유'}")
             print("-" * 50)
@@ -48,7 +49,7 @@ def main():
                 print("- 랜덤 생성: 그냥 엔터(Enter) 키를 누르세요")
                 time_input = input("입력: ").strip()
                 specific_time = time_input if time_input else None
-                google_client.check_in(spreadsheet, employee, specific_time)
+                repository.check_in(employee, specific_time)
                 break
             elif action == '2':
                 print("\n[시간 입력 안내]")
@@ -56,14 +57,14 @@ def main():
                 print("- 랜덤 생성: 그냥 엔터(Enter) 키를 누르세요")
                 time_input = input("입력: ").strip()
                 specific_time = time_input if time_input else None
-                google_client.check_out(spreadsheet, employee, specific_time)
+                repository.check_out(employee, specific_time)
                 break
             elif action == '3':
                 date_to_delete = input("삭제할 날짜를 입력하세요 (YYYY-MM-DD): ").strip()
                 if not date_to_delete:
                     print("날짜가 입력되지 않았습니다.")
                 else:
-                    google_client.delete_record(spreadsheet, employee.get('id'), date_to_delete)
+                    repository.delete_record(employee.get('id'), date_to_delete)
             elif action == '4':
                 date_to_edit = input("수정할 날짜를 입력하세요 (YYYY-MM-DD): ").strip()
                 if not date_to_edit:
@@ -81,9 +82,9 @@ def main():
                     continue
 
                 if edit_type == '1':
-                    google_client.update_record(spreadsheet, employee.get('id'), date_to_edit, checkin=new_time)
+                    repository.update_record(employee.get('id'), date_to_edit, checkin=new_time)
                 elif edit_type == '2':
-                    google_client.update_record(spreadsheet, employee.get('id'), date_to_edit, checkout=new_time)
+                    repository.update_record(employee.get('id'), date_to_edit, checkout=new_time)
                 else:
                     print("잘못된 선택입니다.")
             elif action.lower() == 'q':